@@ -5,6 +5,10 @@
 
 from .data_loader import DataLoader
 from .analyzer import MovieAnalyzer
-from .predictor import BoxOfficePredictor
+from .predictor import BoxOfficePredictor, ModelNotTrainedError
+from .model_registry import ModelRegistry
+from .training_jobs import TrainingJobManager
+from .search import HyperparameterSearch, SearchCache
 
-__all__ = ["DataLoader", "MovieAnalyzer", "BoxOfficePredictor"]
+__all__ = ["DataLoader", "MovieAnalyzer", "BoxOfficePredictor", "ModelNotTrainedError",
+           "ModelRegistry", "TrainingJobManager", "HyperparameterSearch", "SearchCache"]
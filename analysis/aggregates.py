@@ -0,0 +1,266 @@
+"""
+物化聚合模块
+按年份、月份、导演、预算区间和类型维护各数值列的计数 / 和 / 平方和，
+数据增量导入时只处理变化的行
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# 预算区间（左开右闭，与 pd.cut 相同）
+BUDGET_BINS = (0, 1e6, 10e6, 50e6, 100e6, 200e6, float('inf'))
+BUDGET_LABELS = ('<1M', '1-10M', '10-50M', '50-100M', '100-200M', '>200M')
+
+# 参与聚合的数值列
+VALUE_COLUMNS = ('budget', 'revenue', 'roi', 'vote_average', 'popularity', 'runtime')
+
+
+def budget_buckets(budget: np.ndarray) -> np.ndarray:
+    """预算 -> BUDGET_BINS 区间下标（不在任何区间内为 -1）"""
+    codes = np.searchsorted(BUDGET_BINS, budget, side='left') - 1
+    return np.where((budget > BUDGET_BINS[0]) & (budget <= BUDGET_BINS[-1]), codes, -1)
+
+
+class SortedValues:
+    """每组一个有序数组（只保存非缺失值），用于精确的中位数"""
+
+    def __init__(self):
+        self._buckets: dict = {}
+
+    def copy(self) -> 'SortedValues':
+        result = SortedValues()
+        result._buckets = dict(self._buckets)
+        return result
+
+    def add(self, groups: np.ndarray, values: np.ndarray, sign: int = 1):
+        """sign 为 1 时插入，为 -1 时删除（每个值删除一次）；修改的组换成新数组"""
+        keep = (groups >= 0) & ~np.isnan(values)
+        groups, values = groups[keep], values[keep]
+        order = np.lexsort((values, groups))
+        groups, values = groups[order], values[order]
+        bounds = np.flatnonzero(np.diff(groups)) + 1
+        empty = np.empty(0)
+        for chunk_groups, chunk in zip(np.split(groups, bounds), np.split(values, bounds)):
+            if len(chunk) == 0:
+                continue
+            group = int(chunk_groups[0])
+            bucket = self._buckets.get(group, empty)
+            if sign > 0:
+                bucket = np.insert(bucket, np.searchsorted(bucket, chunk), chunk)
+            else:
+                # 相同的值依次对应桶中相邻的位置
+                run_start = np.flatnonzero(np.r_[True, chunk[1:] != chunk[:-1]])
+                rank = np.arange(len(chunk)) - np.repeat(run_start, np.diff(np.r_[run_start, len(chunk)]))
+                bucket = np.delete(bucket, np.searchsorted(bucket, chunk) + rank)
+            self._buckets[group] = bucket
+
+    def median(self, group: int) -> float:
+        bucket = self._buckets.get(group)
+        if bucket is None or len(bucket) == 0:
+            return float('nan')
+        n = len(bucket)
+        return float((bucket[(n - 1) // 2] + bucket[n // 2]) / 2)
+
+
+class MomentTable:
+    """
+    分组矩统计
+
+    每组保存行数，以及每列的非缺失计数、和、平方和；均值和样本标准差
+    （ddof=1，与 pandas 相同）由它们直接算出，读取只与组数有关。
+    median_column 不为None时另外保存该列每组的有序值，用于中位数。
+    """
+
+    def __init__(self, columns=VALUE_COLUMNS, median_column: Optional[str] = None):
+        self.columns = tuple(columns)
+        self._position = {column: j for j, column in enumerate(self.columns)}
+        self.median_column = median_column
+        self.sorted_values = SortedValues() if median_column else None
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros((0, len(self.columns)), dtype=np.int64)
+        self.sum = np.zeros((0, len(self.columns)))
+        self.sumsq = np.zeros((0, len(self.columns)))
+
+    def copy(self) -> 'MomentTable':
+        result = MomentTable(self.columns, self.median_column)
+        result.rows, result.count = self.rows.copy(), self.count.copy()
+        result.sum, result.sumsq = self.sum.copy(), self.sumsq.copy()
+        if self.sorted_values is not None:
+            result.sorted_values = self.sorted_values.copy()
+        return result
+
+    def _grow(self, n_groups: int):
+        capacity = max(n_groups, 2 * len(self.rows))
+        extra = capacity - len(self.rows)
+        self.rows = np.concatenate([self.rows, np.zeros(extra, dtype=np.int64)])
+        self.count = np.vstack([self.count, np.zeros((extra, len(self.columns)), dtype=np.int64)])
+        self.sum = np.vstack([self.sum, np.zeros((extra, len(self.columns)))])
+        self.sumsq = np.vstack([self.sumsq, np.zeros((extra, len(self.columns)))])
+
+    def add(self, groups: np.ndarray, values: np.ndarray, sign: int = 1):
+        """
+        累加（sign=1）或扣除（sign=-1）一批行的贡献
+
+        groups 为每行的组号（负数表示不计入），values 为 (行, 列) 数值，NaN 不计入该列。
+        """
+        keep = groups >= 0
+        groups, values = groups[keep], values[keep]
+        if len(groups) == 0:
+            return
+        if groups.max() >= len(self.rows):
+            self._grow(int(groups.max()) + 1)
+
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        np.add.at(self.rows, groups, sign)
+        np.add.at(self.count, groups, sign * present.astype(np.int64))
+        np.add.at(self.sum, groups, sign * filled)
+        np.add.at(self.sumsq, groups, sign * filled ** 2)
+        if sign < 0:
+            # 清空的组归零，避免浮点残差
+            touched = np.unique(groups)
+            empty = self.count[touched] == 0
+            self.sum[touched] = np.where(empty, 0.0, self.sum[touched])
+            self.sumsq[touched] = np.where(empty, 0.0, self.sumsq[touched])
+        if self.sorted_values is not None:
+            self.sorted_values.add(groups, values[:, self._position[self.median_column]], sign)
+
+    # ==================== 读取 ====================
+
+    def groups(self) -> np.ndarray:
+        """非空的组号（升序）"""
+        return np.flatnonzero(self.rows > 0)
+
+    def counts(self, column: str, groups: np.ndarray) -> np.ndarray:
+        return self.count[groups, self._position[column]]
+
+    def total(self, column: str, groups: np.ndarray) -> np.ndarray:
+        return self.sum[groups, self._position[column]]
+
+    def mean(self, column: str, groups: np.ndarray) -> np.ndarray:
+        j = self._position[column]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum[groups, j] / self.count[groups, j]
+
+    def std(self, column: str, groups: np.ndarray) -> np.ndarray:
+        j = self._position[column]
+        n = self.count[groups, j].astype(np.float64)
+        total = self.sum[groups, j]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (self.sumsq[groups, j] - total * total / n) / (n - 1)
+        return np.where(n > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+    def median(self, groups: np.ndarray) -> np.ndarray:
+        return np.array([self.sorted_values.median(int(g)) for g in groups])
+
+
+class MovieAggregates:
+    """
+    电影数据的物化聚合
+
+    - year / year_financial    按上映年份（全部电影 / 有财务数据的电影）
+    - month_financial          按上映月份
+    - director_financial       按导演（person 字典ID）
+    - budget_financial         按预算区间（BUDGET_BINS 下标），另保存ROI中位数
+    - genre_financial          按类型（genre 字典ID，一部电影计入它的每个类型），另保存ROI中位数
+
+    build 一次性计算；apply 对变更事件中的行先扣除旧的贡献再累加新的贡献，
+    只处理变化的行。聚合表写时复制，通过 tables 读取到的始终是完整的一份。
+    """
+
+    TABLES = {
+        # 表名: (行键, 只统计有财务数据的电影, 保存中位数的列)
+        'year': ('year', False, None),
+        'year_financial': ('year', True, None),
+        'month_financial': ('month', True, None),
+        'director_financial': ('director', True, None),
+        'budget_financial': ('bucket', True, 'roi'),
+    }
+    GENRE_TABLE = 'genre_financial'
+
+    def __init__(self, data_version: Optional[str] = None):
+        self.data_version = data_version
+        self.tables: dict = {}
+        self._n = 0
+        self._keys: dict = {}
+        self._financial = np.zeros(0, dtype=bool)
+        self._values = np.zeros((0, len(VALUE_COLUMNS)))
+        self._genres = None
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, genres, director_ids: np.ndarray,
+              data_version: Optional[str] = None) -> 'MovieAggregates':
+        """由合并数据、类型CSR列表列和导演ID构建"""
+        aggregates = cls(data_version)
+        tables = {name: MomentTable(median_column=median)
+                  for name, (_, _, median) in cls.TABLES.items()}
+        tables[cls.GENRE_TABLE] = MomentTable(median_column='roi')
+        rows = np.arange(len(df))
+        aggregates._store_rows(rows, df, director_ids)
+        aggregates._genres = genres
+        aggregates._contribute(rows, 1, tables)
+        aggregates.tables = tables
+        return aggregates
+
+    def apply(self, rows: np.ndarray, df: pd.DataFrame, genres, director_ids: np.ndarray,
+              data_version: Optional[str] = None):
+        """按变更事件更新：rows 为合并数据中新增或变化的行号"""
+        rows = np.asarray(rows, dtype=np.int64)
+        tables = {name: table.copy() for name, table in self.tables.items()}
+        self._contribute(rows[rows < self._n], -1, tables)
+        self._store_rows(rows, df, director_ids)
+        self._genres = genres
+        self._contribute(rows, 1, tables)
+        self.tables = tables
+        self.data_version = data_version
+
+    def _store_rows(self, rows: np.ndarray, df: pd.DataFrame, director_ids: np.ndarray):
+        """保存这些行的分组键和数值（扣除旧贡献时使用）"""
+        n = max(self._n, int(rows.max()) + 1) if len(rows) else self._n
+        if n > len(self._financial):
+            capacity = max(n, 2 * len(self._financial))
+            extra = capacity - len(self._financial)
+            for name in ('year', 'month', 'director', 'bucket'):
+                self._keys[name] = np.concatenate([
+                    self._keys.get(name, np.zeros(0, dtype=np.int64)),
+                    np.full(extra, -1, dtype=np.int64)
+                ])
+            self._financial = np.concatenate([self._financial, np.zeros(extra, dtype=bool)])
+            self._values = np.vstack([self._values, np.zeros((extra, len(VALUE_COLUMNS)))])
+        self._n = n
+
+        def code(column: str) -> np.ndarray:
+            values = df[column].to_numpy()[rows].astype(np.float64)
+            return np.where(np.isnan(values), -1, values).astype(np.int64)
+
+        for j, column in enumerate(VALUE_COLUMNS):
+            self._values[rows, j] = df[column].to_numpy()[rows].astype(np.float64)
+        self._keys['year'][rows] = code('release_year')
+        self._keys['month'][rows] = code('release_month')
+        self._keys['director'][rows] = director_ids[rows]
+        self._keys['bucket'][rows] = budget_buckets(self._values[rows, VALUE_COLUMNS.index('budget')])
+        self._financial[rows] = df['has_financial_data'].to_numpy()[rows]
+
+    def _contribute(self, rows: np.ndarray, sign: int, tables: dict):
+        if len(rows) == 0:
+            return
+        values = self._values[rows]
+        financial = self._financial[rows]
+        for name, (key, financial_only, _) in self.TABLES.items():
+            groups = self._keys[key][rows]
+            if financial_only:
+                groups = np.where(financial, groups, -1)
+            tables[name].add(groups, values, sign)
+
+        # 类型：按CSR展开为 (行, 类型) 对
+        offsets = self._genres.offsets
+        starts = offsets[rows]
+        lengths = offsets[rows + 1] - starts
+        pair_rows = np.repeat(np.arange(len(rows)), lengths)
+        elements = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                    + np.arange(int(lengths.sum())))
+        groups = np.where(financial[pair_rows], self._genres.ids[elements], -1)
+        tables[self.GENRE_TABLE].add(groups.astype(np.int64), values[pair_rows], sign)
@@ -3,21 +3,74 @@
 包含各类统计分析方法
 """
 
-from collections import Counter
+import threading
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 
+from .aggregates import BUDGET_LABELS, MovieAggregates
 from .data_loader import DataLoader
+from .rankings import EntityRanking, top_k
+from .result_cache import ResultCache, cached_result
+from .scatter import SCATTER_VARIABLES, scatter_density
 
 
 class MovieAnalyzer:
-    """电影数据分析器"""
+    """
+    电影数据分析器
     
-    def __init__(self, data_loader: Optional[DataLoader] = None):
+    analyze_* 与 get_scatter_data 的结果按数据版本缓存在 result_cache 中
+    （多个分析器可传入同一个 ResultCache 共享），返回的是共享对象，调用方不应修改。
+    将 result_cache 设为 None 可关闭缓存。
+    年度、月度、导演、预算区间和类型统计读取物化聚合（见 aggregates），
+    增量导入时只更新变化的行。导演、演员和公司排行按数据版本预先排序（见 rankings）。
+    """
+    
+    def __init__(self, data_loader: Optional[DataLoader] = None,
+                 result_cache: Optional[ResultCache] = None):
         self.loader = data_loader or DataLoader()
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
         self._df: Optional[pd.DataFrame] = None
+        self._aggregates: Optional[MovieAggregates] = None
+        self._aggregates_lock = threading.Lock()
+        self._rankings: dict = {}
+        self.loader.add_reload_listener(self._on_data_reload)
+        self.loader.add_change_listener(self._on_data_change)
+    
+    def _on_data_reload(self, version: str):
+        """数据重新加载后丢弃本地数据引用、物化聚合和缓存结果"""
+        self._df = None
+        self._aggregates = None
+        self._rankings = {}
+        self.result_cache.clear()
+    
+    def _on_data_change(self, change: dict):
+        """增量导入后按变化的行更新物化聚合，丢弃本地数据引用、排行和缓存结果"""
+        self._df = None
+        self._rankings = {}
+        with self._aggregates_lock:
+            aggregates = self._aggregates
+            if aggregates is not None and aggregates.data_version == change['previous_version']:
+                aggregates.apply(change['rows'], self.loader.load_merged(),
+                                 self.loader.get_list_column('genre_names'),
+                                 self.loader.get_director_ids(), change['version'])
+            else:
+                self._aggregates = None
+        self.result_cache.clear()
+    
+    def _aggregate_tables(self) -> dict:
+        """当前数据版本的物化聚合表（首次使用时构建）"""
+        version = self.loader.data_version
+        aggregates = self._aggregates
+        if aggregates is None or aggregates.data_version != version:
+            aggregates = MovieAggregates.build(
+                self.loader.load_merged(), self.loader.get_list_column('genre_names'),
+                self.loader.get_director_ids(), data_version=version
+            )
+            with self._aggregates_lock:
+                self._aggregates = aggregates
+        return aggregates.tables
     
     @property
     def df(self) -> pd.DataFrame:
@@ -26,40 +79,70 @@ class MovieAnalyzer:
             self._df = self.loader.load_merged()
         return self._df
     
+    def _ranking(self, kind: str) -> EntityRanking:
+        """
+        当前数据版本的实体排行（director / actor / company，首次使用时构建）
+        
+        导演读取物化聚合表，演员和公司基于关联表按实体ID统计有财务数据的电影。
+        """
+        version = self.loader.data_version
+        cached = self._rankings.get(kind)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        if kind == 'director':
+            ranking = EntityRanking.from_table(
+                'director', self._aggregate_tables()['director_financial'],
+                self.loader.get_dictionary('person').names
+            )
+        else:
+            df = self.df
+            source_col, entity_col = self.loader.BRIDGE_TABLES[kind]
+            bridge = self.loader.load_bridge(kind)
+            movie_idx = bridge['movie_idx'].to_numpy()
+            keep = df['has_financial_data'].to_numpy()[movie_idx]
+            movie_idx = movie_idx[keep]
+            values = {col: df[col].to_numpy(dtype=np.float64, na_value=np.nan)[movie_idx]
+                      for col in ('revenue', 'budget', 'vote_average', 'roi')}
+            ranking = EntityRanking.from_pairs(
+                entity_col, bridge[entity_col].array.codes[keep].astype(np.int64), values,
+                self.loader.get_dictionary(self.loader.ENTITY_COLUMNS[source_col]).names
+            )
+        self._rankings[kind] = (version, ranking)
+        return ranking
+    
     # ==================== ROI 分析 ====================
     
+    @cached_result
     def analyze_roi(self) -> dict:
         """ROI投资回报率综合分析"""
-        valid_df = self.df[self.df['has_financial_data']].copy()
+        # 只取ROI一列，不复制整张表
+        financial = np.flatnonzero(self.df['has_financial_data'].to_numpy())
+        roi = self.df['roi'].iloc[financial]
         
         # 基础统计
         roi_stats = {
-            'mean': float(valid_df['roi'].mean()),
-            'median': float(valid_df['roi'].median()),
-            'std': float(valid_df['roi'].std()),
-            'min': float(valid_df['roi'].min()),
-            'max': float(valid_df['roi'].max()),
-            'profitable_count': int((valid_df['roi'] > 0).sum()),
-            'loss_count': int((valid_df['roi'] <= 0).sum()),
-            'profitable_rate': float((valid_df['roi'] > 0).mean() * 100)
+            'mean': float(roi.mean()),
+            'median': float(roi.median()),
+            'std': float(roi.std()),
+            'min': float(roi.min()),
+            'max': float(roi.max()),
+            'profitable_count': int((roi > 0).sum()),
+            'loss_count': int((roi <= 0).sum()),
+            'profitable_rate': float((roi > 0).mean() * 100)
         }
         
         # ROI分布区间
         roi_bins = [-float('inf'), -50, 0, 100, 500, 1000, float('inf')]
         roi_labels = ['亏损>50%', '亏损0-50%', '盈利0-100%', '盈利100-500%', '盈利500-1000%', '盈利>1000%']
-        valid_df['roi_category'] = pd.cut(valid_df['roi'], bins=roi_bins, labels=roi_labels)
-        roi_distribution = valid_df['roi_category'].value_counts().to_dict()
+        roi_distribution = pd.cut(roi, bins=roi_bins, labels=roi_labels).value_counts().to_dict()
         roi_distribution = {str(k): int(v) for k, v in roi_distribution.items()}
         
-        # 高ROI电影Top10
-        top_roi = valid_df.nlargest(10, 'roi')[
-            ['title', 'budget', 'revenue', 'roi', 'release_year', 'genre_names']
-        ].to_dict('records')
-        
-        # 低ROI电影Top10
-        bottom_roi = valid_df.nsmallest(10, 'roi')[
-            ['title', 'budget', 'revenue', 'roi', 'release_year', 'genre_names']
-        ].to_dict('records')
+        # 高 / 低ROI电影Top10（O(n) 选择，只对候选排序）
+        columns = ['title', 'budget', 'revenue', 'roi', 'release_year', 'genre_names']
+        roi_values = roi.to_numpy(dtype=np.float64, na_value=np.nan)
+        top_roi = self.df.iloc[financial[top_k(roi_values, 10)]][columns].to_dict('records')
+        bottom_roi = self.df.iloc[financial[top_k(roi_values, 10, largest=False)]][columns].to_dict('records')
         
         return {
             'statistics': roi_stats,
@@ -68,252 +151,230 @@ class MovieAnalyzer:
             'bottom_roi_movies': bottom_roi
         }
     
+    @cached_result
     def analyze_roi_by_genre(self) -> list:
         """按类型分析ROI"""
-        valid_df = self.df[self.df['has_financial_data']].copy()
-        
-        # 展开类型
-        genre_roi = []
-        for _, row in valid_df.iterrows():
-            for genre in row['genre_names']:
-                genre_roi.append({
-                    'genre': genre,
-                    'roi': row['roi'],
-                    'budget': row['budget'],
-                    'revenue': row['revenue']
-                })
-        
-        genre_df = pd.DataFrame(genre_roi)
-        
-        # 按类型聚合
-        result = genre_df.groupby('genre').agg({
-            'roi': ['mean', 'median', 'std', 'count'],
-            'budget': 'mean',
-            'revenue': 'mean'
-        }).reset_index()
-        
-        result.columns = ['genre', 'mean_roi', 'median_roi', 'std_roi', 'count', 'avg_budget', 'avg_revenue']
-        result = result.sort_values('mean_roi', ascending=False)
-        
-        return result.to_dict('records')
+        table = self._aggregate_tables()['genre_financial']
+        names = self.loader.get_dictionary('genre').names
+        groups = table.groups()
+        mean_roi = table.mean('roi', groups)
+        median_roi = table.median(groups)
+        std_roi = table.std('roi', groups)
+        counts = table.counts('roi', groups)
+        avg_budget = table.mean('budget', groups)
+        avg_revenue = table.mean('revenue', groups)
+        
+        result = [{
+            'genre': names[g],
+            'mean_roi': float(mean_roi[i]),
+            'median_roi': float(median_roi[i]),
+            'std_roi': float(std_roi[i]),
+            'count': int(counts[i]),
+            'avg_budget': float(avg_budget[i]),
+            'avg_revenue': float(avg_revenue[i])
+        } for i, g in enumerate(groups)]
+        return sorted(result, key=lambda r: -r['mean_roi'])
     
+    @cached_result
     def analyze_roi_by_budget_range(self) -> list:
         """按预算区间分析ROI"""
-        valid_df = self.df[self.df['has_financial_data']].copy()
-        
-        # 定义预算区间（单位：百万美元）
-        budget_bins = [0, 1e6, 10e6, 50e6, 100e6, 200e6, float('inf')]
-        budget_labels = ['<1M', '1-10M', '10-50M', '50-100M', '100-200M', '>200M']
-        
-        valid_df['budget_range'] = pd.cut(valid_df['budget'], bins=budget_bins, labels=budget_labels)
-        
-        result = valid_df.groupby('budget_range', observed=True).agg({
-            'roi': ['mean', 'median', 'count'],
-            'revenue': 'mean'
-        }).reset_index()
-        
-        result.columns = ['budget_range', 'mean_roi', 'median_roi', 'count', 'avg_revenue']
-        
-        return result.to_dict('records')
+        table = self._aggregate_tables()['budget_financial']
+        groups = table.groups()
+        mean_roi = table.mean('roi', groups)
+        median_roi = table.median(groups)
+        counts = table.counts('roi', groups)
+        avg_revenue = table.mean('revenue', groups)
+        
+        return [{
+            'budget_range': BUDGET_LABELS[g],
+            'mean_roi': float(mean_roi[i]),
+            'median_roi': float(median_roi[i]),
+            'count': int(counts[i]),
+            'avg_revenue': float(avg_revenue[i])
+        } for i, g in enumerate(groups)]
     
     # ==================== 类型分析 ====================
     
+    @cached_result
     def analyze_genres(self) -> dict:
         """电影类型综合分析"""
-        df = self.df
-        
-        # 统计所有类型出现次数
-        all_genres = []
-        for genres in df['genre_names']:
-            all_genres.extend(genres)
-        genre_counts = Counter(all_genres)
+        index = self.loader.get_genre_index()
+        names = index.dictionary.names
+        
+        # 统计所有类型出现次数（数量相同的按首次出现顺序）
+        counts = index.counts()
+        order = np.argsort(-counts, kind='stable')
+        genre_counts = {names[i]: int(counts[i]) for i in order if counts[i] > 0}
+        
+        # 类型组合分析（按位图分组）
+        combo_counts = {
+            index.combo_name(mask): count
+            for mask, count in index.combo_counts()[:20]
+        }
         
-        # 类型组合分析
-        df['genre_combo'] = df['genre_names'].apply(lambda x: ', '.join(sorted(x)) if x else 'Unknown')
-        combo_counts = df['genre_combo'].value_counts().head(20).to_dict()
+        # 按类型统计票房和评分：读取有财务数据电影的类型物化聚合
+        table = self._aggregate_tables()['genre_financial']
+        stats_ids = np.flatnonzero(counts > 0)
+        stats_ids = stats_ids[stats_ids < len(table.rows)]
+        stats_ids = stats_ids[table.rows[stats_ids] > 0]
+        total_revenue = dict(zip(stats_ids.tolist(), table.total('revenue', stats_ids)))
+        means = {col: dict(zip(stats_ids.tolist(), table.mean(col, stats_ids)))
+                 for col in ['revenue', 'budget', 'vote_average', 'roi']}
         
-        # 按类型统计票房和评分
         genre_stats = []
-        valid_df = df[df['has_financial_data']]
-        for genre in genre_counts.keys():
-            genre_movies = valid_df[valid_df['genre_names'].apply(lambda x: genre in x)]
-            if len(genre_movies) > 0:
-                genre_stats.append({
-                    'genre': genre,
-                    'count': genre_counts[genre],
-                    'avg_revenue': float(genre_movies['revenue'].mean()),
-                    'total_revenue': float(genre_movies['revenue'].sum()),
-                    'avg_budget': float(genre_movies['budget'].mean()),
-                    'avg_rating': float(genre_movies['vote_average'].mean()),
-                    'avg_roi': float(genre_movies['roi'].mean())
-                })
-        
-        genre_stats = sorted(genre_stats, key=lambda x: x['count'], reverse=True)
+        for i in order:
+            if i not in total_revenue:
+                continue
+            genre_stats.append({
+                'genre': names[i],
+                'count': int(counts[i]),
+                'avg_revenue': float(means['revenue'][i]),
+                'total_revenue': float(total_revenue[i]),
+                'avg_budget': float(means['budget'][i]),
+                'avg_rating': float(means['vote_average'][i]),
+                'avg_roi': float(means['roi'][i])
+            })
         
         return {
-            'genre_counts': dict(genre_counts.most_common()),
+            'genre_counts': genre_counts,
             'genre_combinations': combo_counts,
             'genre_statistics': genre_stats
         }
     
+    def filter_by_genres(self, predicate: Optional[str] = None, all_of: Optional[list] = None,
+                         any_of: Optional[list] = None, none_of: Optional[list] = None,
+                         financial_only: bool = False) -> pd.DataFrame:
+        """
+        按类型条件过滤电影
+        
+        predicate 为类型谓词表达式（如 "Action AND NOT Comedy"），
+        all_of / any_of / none_of 为列表形式的条件，两者同时给出时取交集。
+        """
+        index = self.loader.get_genre_index()
+        mask = index.select(all_of or (), any_of or (), none_of or ())
+        if predicate:
+            mask &= index.evaluate(predicate)
+        if financial_only:
+            mask &= self.df['has_financial_data'].to_numpy()
+        return self.df[mask]
+    
+    # ==================== 切片查询 ====================
+    
+    @cached_result
+    def query(self, filters: Optional[dict] = None, group_by: Optional[str] = None,
+              metrics: Optional[list] = None, limit: Optional[int] = None) -> dict:
+        """
+        切片统计查询
+        
+        filters 为过滤条件（release_year / budget 区间、genre 谓词、country / language
+        代码列表、financial_only），group_by 为分组维度，metrics 为指标列表
+        （count 或 mean:roi 这样的 <聚合>:<列>），详见 analysis.query.QueryIndex。
+        """
+        return self.loader.get_query_index().execute(
+            filters or {}, group_by, metrics or ['count'], limit
+        )
+    
     # ==================== 时间趋势分析 ====================
     
+    @cached_result
     def analyze_yearly_trends(self) -> list:
         """年度趋势分析"""
-        df = self.df[self.df['release_year'].notna()].copy()
-        df['release_year'] = df['release_year'].astype(int)
+        tables = self._aggregate_tables()
+        yearly, financial = tables['year'], tables['year_financial']
         
         # 过滤有效年份范围
-        df = df[(df['release_year'] >= 1980) & (df['release_year'] <= 2017)]
-        
-        # 分别处理全部数据和有财务数据的数据
-        yearly_all = df.groupby('release_year').agg({
-            'id': 'count',
-            'vote_average': 'mean',
-            'popularity': 'mean',
-            'runtime': 'mean'
-        }).reset_index()
-        yearly_all.columns = ['year', 'movie_count', 'avg_rating', 'avg_popularity', 'avg_runtime']
-        
-        # 有财务数据的年度统计
-        valid_df = df[df['has_financial_data']]
-        yearly_financial = valid_df.groupby('release_year').agg({
-            'budget': ['mean', 'sum'],
-            'revenue': ['mean', 'sum'],
-            'roi': 'mean'
-        }).reset_index()
-        yearly_financial.columns = ['year', 'avg_budget', 'total_budget', 'avg_revenue', 'total_revenue', 'avg_roi']
-        
-        # 合并
-        result = yearly_all.merge(yearly_financial, on='year', how='left')
-        result = result.fillna(0)
-        
-        return result.to_dict('records')
+        years = yearly.groups()
+        years = years[(years >= 1980) & (years <= 2017)]
+        
+        # 有财务数据的年度统计（没有财务数据的年份取0）
+        fin_years = years[years < len(financial.rows)]
+        fin_years = fin_years[financial.rows[fin_years] > 0]
+        fin = {}
+        if len(fin_years):
+            columns = {
+                'avg_budget': financial.mean('budget', fin_years),
+                'total_budget': financial.total('budget', fin_years),
+                'avg_revenue': financial.mean('revenue', fin_years),
+                'total_revenue': financial.total('revenue', fin_years),
+                'avg_roi': financial.mean('roi', fin_years),
+            }
+            fin = {int(y): {k: v[i] for k, v in columns.items()} for i, y in enumerate(fin_years)}
+        empty = dict.fromkeys(['avg_budget', 'total_budget', 'avg_revenue',
+                               'total_revenue', 'avg_roi'], 0.0)
+        
+        def value(x) -> float:
+            return 0.0 if np.isnan(x) else float(x)
+        
+        avg_rating = yearly.mean('vote_average', years)
+        avg_popularity = yearly.mean('popularity', years)
+        avg_runtime = yearly.mean('runtime', years)
+        result = []
+        for i, year in enumerate(years.tolist()):
+            record = {
+                'year': year,
+                'movie_count': int(yearly.rows[year]),
+                'avg_rating': value(avg_rating[i]),
+                'avg_popularity': value(avg_popularity[i]),
+                'avg_runtime': value(avg_runtime[i]),
+            }
+            record.update({k: value(v) for k, v in fin.get(year, empty).items()})
+            result.append(record)
+        return result
     
+    @cached_result
     def analyze_monthly_patterns(self) -> list:
         """月度发行规律分析"""
-        df = self.df[self.df['release_month'].notna()].copy()
-        valid_df = df[df['has_financial_data']]
-        
-        monthly = valid_df.groupby('release_month').agg({
-            'id': 'count',
-            'revenue': 'mean',
-            'budget': 'mean',
-            'roi': 'mean',
-            'vote_average': 'mean'
-        }).reset_index()
-        
-        monthly.columns = ['month', 'movie_count', 'avg_revenue', 'avg_budget', 'avg_roi', 'avg_rating']
+        monthly = self._aggregate_tables()['month_financial']
+        months = monthly.groups()
         
         # 添加月份名称
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                       'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        monthly['month_name'] = monthly['month'].apply(lambda x: month_names[int(x)-1])
-        
-        return monthly.to_dict('records')
+        avg_revenue = monthly.mean('revenue', months)
+        avg_budget = monthly.mean('budget', months)
+        avg_roi = monthly.mean('roi', months)
+        avg_rating = monthly.mean('vote_average', months)
+        
+        return [{
+            'month': float(month),
+            'movie_count': int(monthly.rows[month]),
+            'avg_revenue': float(avg_revenue[i]),
+            'avg_budget': float(avg_budget[i]),
+            'avg_roi': float(avg_roi[i]),
+            'avg_rating': float(avg_rating[i]),
+            'month_name': month_names[int(month) - 1]
+        } for i, month in enumerate(months)]
     
     # ==================== 导演和演员分析 ====================
     
-    def analyze_directors(self, top_n: int = 20) -> list:
-        """导演分析"""
-        df = self.df[self.df['director'].notna()].copy()
-        valid_df = df[df['has_financial_data']]
-        
-        director_stats = valid_df.groupby('director').agg({
-            'id': 'count',
-            'revenue': ['sum', 'mean'],
-            'budget': ['sum', 'mean'],
-            'vote_average': 'mean',
-            'roi': 'mean'
-        }).reset_index()
-        
-        director_stats.columns = ['director', 'movie_count', 'total_revenue', 'avg_revenue',
-                                  'total_budget', 'avg_budget', 'avg_rating', 'avg_roi']
-        
-        # 至少2部电影的导演
-        director_stats = director_stats[director_stats['movie_count'] >= 2]
-        director_stats = director_stats.nlargest(top_n, 'total_revenue')
-        
-        return director_stats.to_dict('records')
+    @cached_result
+    def analyze_directors(self, top_n: int = 20, sort: str = 'total_revenue', offset: int = 0,
+                          min_count: int = 2) -> list:
+        """
+        导演排行
+        
+        至少 min_count 部有财务数据电影的导演按 sort（total_revenue / avg_roi / avg_rating /
+        movie_count，降序，相同按导演ID）排名，返回第 offset 起的 top_n 条。
+        """
+        return self._ranking('director').page(sort, offset, top_n, min_count)
     
-    def analyze_actors(self, top_n: int = 20) -> list:
-        """演员分析"""
-        valid_df = self.df[self.df['has_financial_data']].copy()
-        
-        # 展开演员
-        actor_data = []
-        for _, row in valid_df.iterrows():
-            for actor in row.get('top_actors', []):
-                actor_data.append({
-                    'actor': actor,
-                    'revenue': row['revenue'],
-                    'budget': row['budget'],
-                    'roi': row['roi'],
-                    'vote_average': row['vote_average']
-                })
-        
-        if not actor_data:
-            return []
-        
-        actor_df = pd.DataFrame(actor_data)
-        
-        actor_stats = actor_df.groupby('actor').agg({
-            'revenue': ['count', 'sum', 'mean'],
-            'budget': ['sum', 'mean'],
-            'vote_average': 'mean',
-            'roi': 'mean'
-        }).reset_index()
-        
-        actor_stats.columns = ['actor', 'movie_count', 'total_revenue', 'avg_revenue',
-                               'total_budget', 'avg_budget', 'avg_rating', 'avg_roi']
-        
-        # 至少3部电影的演员
-        actor_stats = actor_stats[actor_stats['movie_count'] >= 3]
-        actor_stats = actor_stats.nlargest(top_n, 'total_revenue')
-        
-        return actor_stats.to_dict('records')
+    @cached_result
+    def analyze_actors(self, top_n: int = 20, sort: str = 'total_revenue', offset: int = 0,
+                       min_count: int = 3) -> list:
+        """演员排行（参数同 analyze_directors，默认至少3部电影）"""
+        return self._ranking('actor').page(sort, offset, top_n, min_count)
     
     # ==================== 制作公司分析 ====================
     
-    def analyze_production_companies(self, top_n: int = 20) -> list:
-        """制作公司分析"""
-        valid_df = self.df[self.df['has_financial_data']].copy()
-        
-        # 展开公司
-        company_data = []
-        for _, row in valid_df.iterrows():
-            for company in row.get('company_names', []):
-                company_data.append({
-                    'company': company,
-                    'revenue': row['revenue'],
-                    'budget': row['budget'],
-                    'roi': row['roi'],
-                    'vote_average': row['vote_average']
-                })
-        
-        if not company_data:
-            return []
-        
-        company_df = pd.DataFrame(company_data)
-        
-        company_stats = company_df.groupby('company').agg({
-            'revenue': ['count', 'sum', 'mean'],
-            'budget': ['sum', 'mean'],
-            'vote_average': 'mean',
-            'roi': 'mean'
-        }).reset_index()
-        
-        company_stats.columns = ['company', 'movie_count', 'total_revenue', 'avg_revenue',
-                                  'total_budget', 'avg_budget', 'avg_rating', 'avg_roi']
-        
-        # 至少5部电影的公司
-        company_stats = company_stats[company_stats['movie_count'] >= 5]
-        company_stats = company_stats.nlargest(top_n, 'total_revenue')
-        
-        return company_stats.to_dict('records')
+    @cached_result
+    def analyze_production_companies(self, top_n: int = 20, sort: str = 'total_revenue',
+                                     offset: int = 0, min_count: int = 5) -> list:
+        """制作公司排行（参数同 analyze_directors，默认至少5部电影）"""
+        return self._ranking('company').page(sort, offset, top_n, min_count)
     
     # ==================== 相关性分析 ====================
     
+    @cached_result
     def analyze_correlations(self) -> dict:
         """数值变量相关性分析"""
         valid_df = self.df[self.df['has_financial_data']].copy()
@@ -355,6 +416,7 @@ class MovieAnalyzer:
     
     # ==================== 散点图数据 ====================
     
+    @cached_result
     def get_scatter_data(self, x_var: str = 'budget', y_var: str = 'revenue', 
                          limit: int = 500) -> list:
         """获取散点图数据"""
@@ -371,3 +433,40 @@ class MovieAnalyzer:
             result = result.nlargest(limit, y_var if y_var in result.columns else x_var)
         
         return result.to_dict('records')
+    
+    @cached_result
+    def get_scatter_density(self, x_var: str = 'budget', y_var: str = 'revenue',
+                            mode: str = 'hexbin', resolution: int = 40,
+                            limit: int = 1000) -> dict:
+        """
+        散点图降采样（有财务数据的电影）
+        
+        mode 为 histogram（二维直方图）、hexbin（六边形分箱）或 sample（按网格分层的
+        代表点，最多 limit 个，每个点带 weight = 代表的电影数）。预算、票房等跨数量级
+        的变量在对数空间中分箱，详见 analysis.scatter。结果按 (变量, 模式, 分辨率, limit) 缓存。
+        """
+        for var in (x_var, y_var):
+            if var not in SCATTER_VARIABLES:
+                raise ValueError(f"不支持的散点图变量: {var}（可选 {', '.join(SCATTER_VARIABLES)}）")
+        df = self.df
+        financial = np.flatnonzero(df['has_financial_data'].to_numpy())
+        x = df[x_var].to_numpy(dtype=np.float64, na_value=np.nan)[financial]
+        y = df[y_var].to_numpy(dtype=np.float64, na_value=np.nan)[financial]
+        result = scatter_density(x, y, x_var, y_var, mode, resolution, limit)
+        
+        if mode == 'sample':
+            chosen = result.pop('rows')
+            weights = result.pop('weights')
+            rows = financial[chosen]
+            years = df['release_year'].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
+            ratings = df['vote_average'].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
+            result['points'] = [{
+                'x': float(x_value),
+                'y': float(y_value),
+                'title': title,
+                'release_year': None if np.isnan(year) else int(year),
+                'vote_average': float(rating),
+                'weight': float(weight)
+            } for x_value, y_value, title, year, rating, weight in zip(
+                x[chosen], y[chosen], df['title'].iloc[rows].tolist(), years, ratings, weights)]
+        return result
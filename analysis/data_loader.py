@@ -2,73 +2,869 @@
 数据加载与预处理模块
 """
 
+import functools
+import hashlib
+import inspect
+import io
 import json
-import ast
+import os
+import sys
+import tempfile
+import threading
+import uuid
+import warnings
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 
+from .frame_store import FrameStore, file_digest
+from .indexes import GenreIndex
+from .instrumentation import STAGE_LOAD, span
+from .query import QueryIndex
+from . import parallel_credits
+from .parallel_credits import ParallelCreditsParser, PARALLEL_MIN_ROWS, TOP_ACTORS, extract_director
+from .json_columns import (
+    JsonColumnParser,
+    NAME_PARSER_FIELDS,
+    COUNTRY_PARSER_FIELDS,
+    LANGUAGE_PARSER_FIELDS,
+    CAST_PARSER_FIELDS,
+    CREW_PARSER_FIELDS,
+)
+
+
+# 预处理逻辑版本，修改 _preprocess_* 的输出结构时递增
+PREPROCESS_VERSION = 3
+
+# 分块流式加载每块行数的环境变量（未设置时一次读入整个文件）
+CHUNKSIZE_ENV = 'DATA_CHUNKSIZE'
+
+# 演职人员并行解析进程数的环境变量（未设置时在当前进程中解析）
+PARSE_WORKERS_ENV = 'DATA_PARSE_WORKERS'
+
+
+def _synchronized(method):
+    """
+    在实例的可重入锁内执行，避免多个线程重复构建同一份惰性数据
+    
+    等锁和执行的时间计入当前请求的 load 阶段。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with span(STAGE_LOAD), self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class EntityDictionary:
+    """
+    实体字典：为类型、人物、公司等名称分配稳定的整数ID
+    
+    ID按首次出现顺序分配，新实体只会追加，已分配的ID不会改变。
+    字典同时作为字符串驻留表，相同名称在各处共享同一个字符串对象。
+    """
+    
+    def __init__(self, names=()):
+        self._names: list = []
+        self._ids: dict = {}
+        self._names_array: Optional[np.ndarray] = None
+        for name in names:
+            self.intern(name)
+    
+    def __len__(self) -> int:
+        return len(self._names)
+    
+    def __contains__(self, name) -> bool:
+        return name in self._ids
+    
+    def intern(self, name: str) -> int:
+        """返回名称的ID，不存在时分配新ID"""
+        entity_id = self._ids.get(name)
+        if entity_id is None:
+            entity_id = len(self._names)
+            self._ids[name] = entity_id
+            self._names.append(name)
+            self._names_array = None
+        return entity_id
+    
+    def id_of(self, name: str) -> int:
+        """名称 -> ID，不存在时返回 -1"""
+        return self._ids.get(name, -1)
+    
+    def name_of(self, entity_id: int) -> Optional[str]:
+        """ID -> 名称，ID为负数时返回None"""
+        return self._names[entity_id] if entity_id >= 0 else None
+    
+    def encode(self, names) -> np.ndarray:
+        """批量名称 -> ID数组（未知名称为 -1）"""
+        get = self._ids.get
+        return np.fromiter((get(n, -1) for n in names), dtype=np.int32)
+    
+    def decode(self, ids) -> list:
+        """批量ID -> 名称列表"""
+        names = self._names
+        return [names[i] if i >= 0 else None for i in ids]
+    
+    @property
+    def names(self) -> np.ndarray:
+        """按ID排列的名称数组"""
+        if self._names_array is None:
+            self._names_array = np.array(self._names + [None], dtype=object)[:-1]
+        return self._names_array
+
+
+class ListColumn:
+    """
+    CSR格式的列表列
+    
+    第 i 行的ID为 ids[offsets[i]:offsets[i + 1]]，offsets 长度为行数 + 1。
+    """
+    
+    def __init__(self, offsets: np.ndarray, ids: np.ndarray):
+        self.offsets = offsets
+        self.ids = ids
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    @classmethod
+    def from_lists(cls, lists, dictionary: EntityDictionary) -> 'ListColumn':
+        """编码名称列表列，同时把新名称登记到字典"""
+        intern = dictionary.intern
+        lengths = np.zeros(len(lists) + 1, dtype=np.int64)
+        ids = []
+        for i, items in enumerate(lists):
+            if isinstance(items, list):
+                row = [intern(name) for name in items if name is not None]
+                ids.extend(row)
+                lengths[i + 1] = len(row)
+        return cls(np.cumsum(lengths), np.asarray(ids, dtype=np.int32))
+    
+    def lengths(self) -> np.ndarray:
+        """每行的元素个数"""
+        return np.diff(self.offsets)
+    
+    def row(self, i: int) -> np.ndarray:
+        """第 i 行的ID数组"""
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+    
+    def row_index(self) -> np.ndarray:
+        """每个元素所属的行号（与 ids 等长）"""
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.lengths())
+    
+    def positions(self) -> np.ndarray:
+        """每个元素在所在行内的位置"""
+        return np.arange(len(self.ids)) - np.repeat(self.offsets[:-1], self.lengths())
+    
+    def splice(self, rows: np.ndarray, replacement: 'ListColumn') -> 'ListColumn':
+        """
+        用 replacement 的各行替换第 rows[i] 行，返回新的列表列（原对象不变）
+        
+        rows 中不小于当前行数的行号表示追加，须从当前行数开始连续编号。
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n = max(len(self), int(rows.max()) + 1) if len(rows) else len(self)
+        lengths = np.zeros(n, dtype=np.int64)
+        lengths[:len(self)] = self.lengths()
+        lengths[rows] = replacement.lengths()
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.empty(offsets[-1], dtype=self.ids.dtype)
+        
+        # 未替换行的元素整体平移到新位置，替换行的元素写入对应位置
+        replaced = np.zeros(n, dtype=bool)
+        replaced[rows] = True
+        old_rows = self.row_index()
+        keep = ~replaced[old_rows]
+        ids[offsets[old_rows[keep]] + self.positions()[keep]] = self.ids[keep]
+        ids[offsets[rows][replacement.row_index()] + replacement.positions()] = replacement.ids
+        return ListColumn(offsets, ids)
+    
+    def to_lists(self, dictionary: EntityDictionary) -> list:
+        """还原为名称列表列（名称对象与字典共享）"""
+        names = dictionary._names
+        ids = self.ids.tolist()
+        offsets = self.offsets.tolist()
+        return [[names[j] for j in ids[offsets[i]:offsets[i + 1]]] for i in range(len(self))]
+
 
 class DataLoader:
     """TMDB电影数据加载器"""
     
-    def __init__(self, data_dir: str = "data/raw"):
+    MOVIES_FILE = "tmdb_5000_movies.csv"
+    CREDITS_FILE = "tmdb_5000_credits.csv"
+    
+    # 源文件 -> (导入日志中的种类名, 主键列)
+    SOURCES = {
+        MOVIES_FILE: ('movies', 'id'),
+        CREDITS_FILE: ('credits', 'movie_id'),
+    }
+    
+    # 分块流式加载时的列投影：不读取分析用不到的长文本列，JSON列解析出派生列后丢弃原始字符串
+    STREAMING_SKIPPED_COLUMNS = {
+        MOVIES_FILE: ('homepage', 'overview', 'tagline'),
+        CREDITS_FILE: ('title',),
+    }
+    STREAMING_DROPPED_COLUMNS = {
+        MOVIES_FILE: ('genres', 'keywords', 'production_companies',
+                      'production_countries', 'spoken_languages'),
+        CREDITS_FILE: ('cast', 'crew'),
+    }
+    
+    def __init__(self, data_dir: str = "data/raw", cache_dir: Optional[str] = None,
+                 use_cache: bool = True, journal_dir: Optional[str] = None,
+                 use_journal: bool = True, chunksize: Optional[int] = None,
+                 spill_dir: Optional[str] = None, parse_workers: Optional[int] = None):
         self.data_dir = Path(data_dir)
+        self.cache_dir = Path(cache_dir) if cache_dir else self.data_dir.parent / "cache"
+        self.use_cache = use_cache
+        self.journal_dir = Path(journal_dir) if journal_dir else self.data_dir.parent / "ingest"
+        self.use_journal = use_journal
+        if chunksize is None and os.environ.get(CHUNKSIZE_ENV):
+            chunksize = int(os.environ[CHUNKSIZE_ENV])
+        self.chunksize = chunksize or None
+        self.spill_dir = Path(spill_dir) if spill_dir else self.cache_dir / "spill"
+        if parse_workers is None and os.environ.get(PARSE_WORKERS_ENV):
+            parse_workers = int(os.environ[PARSE_WORKERS_ENV])
+        self.parse_workers = max(1, parse_workers or 1)
+        self._credits_parser: Optional[ParallelCreditsParser] = None
+        self._store = FrameStore(self.cache_dir)
+        self._lock = threading.RLock()
+        self._source_digests: dict = {}
+        self._parse_report: dict = {}
         self._movies_df: Optional[pd.DataFrame] = None
         self._credits_df: Optional[pd.DataFrame] = None
         self._merged_df: Optional[pd.DataFrame] = None
+        self._entities: Optional[dict] = None
+        self._bridges: dict = {}
+        self._genre_index: Optional[GenreIndex] = None
+        self._query_index: Optional[QueryIndex] = None
+        self._revision = 0
+        self._data_version: Optional[str] = None
+        self._version_snapshot: Optional[str] = None
+        self._reload_listeners: list = []
+        self._change_listeners: list = []
+    
+    # ==================== 数据版本 ====================
     
+    @property
+    @_synchronized
+    def data_version(self) -> str:
+        """
+        当前数据版本
+        
+        由源文件、导入日志与预处理代码的摘要加上重新加载次数组成，
+        下游缓存以它作为键的一部分。
+        """
+        if self._data_version is None:
+            h = hashlib.sha256(self._preprocess_fingerprint().encode())
+            for name in (self.MOVIES_FILE, self.CREDITS_FILE):
+                self._update_source_hash(h, name)
+            self._data_version = f"{h.hexdigest()[:16]}.{self._revision}"
+            self._version_snapshot = self._data_version
+        return self._data_version
+    
+    @property
+    def current_version(self) -> Optional[str]:
+        """
+        最近一次算出的数据版本（不加锁，可在事件循环中读取）
+        
+        reload / ingest 执行期间仍为旧版本，完成后切换为新版本；还没有算过时为None。
+        """
+        return self._version_snapshot
+    
+    def add_reload_listener(self, callback):
+        """注册数据重新加载回调，回调参数为新的数据版本"""
+        self._reload_listeners.append(callback)
+    
+    def add_change_listener(self, callback):
+        """注册增量数据变更回调，回调参数为变更事件（见 ingest）"""
+        self._change_listeners.append(callback)
+    
+    @_synchronized
+    def reload(self):
+        """丢弃内存中的数据和派生结构，下次访问时重新加载，并通知下游失效"""
+        self._source_digests = {}
+        self._parse_report = {}
+        self._movies_df = None
+        self._credits_df = None
+        self._merged_df = None
+        self._entities = None
+        self._bridges = {}
+        self._genre_index = None
+        self._query_index = None
+        self._revision += 1
+        self._data_version = None
+        
+        version = self.data_version
+        for callback in list(self._reload_listeners):
+            callback(version)
+    
+    @_synchronized
     def load_movies(self) -> pd.DataFrame:
         """加载电影数据"""
         if self._movies_df is None:
-            movies_path = self.data_dir / "tmdb_5000_movies.csv"
-            self._movies_df = pd.read_csv(movies_path)
-            self._preprocess_movies()
+            key = self._cache_key(self.MOVIES_FILE)
+            self._movies_df = self._load_cached('movies', key)
+            if self._movies_df is None:
+                self._movies_df = self._load_source(self.MOVIES_FILE)
+                self._save_cached('movies', key, self._movies_df)
         return self._movies_df
     
+    @_synchronized
     def load_credits(self) -> pd.DataFrame:
         """加载演职人员数据"""
         if self._credits_df is None:
-            credits_path = self.data_dir / "tmdb_5000_credits.csv"
-            self._credits_df = pd.read_csv(credits_path)
-            self._preprocess_credits()
+            key = self._cache_key(self.CREDITS_FILE)
+            self._credits_df = self._load_cached('credits', key)
+            if self._credits_df is None:
+                self._credits_df = self._load_source(self.CREDITS_FILE)
+                self._save_cached('credits', key, self._credits_df)
         return self._credits_df
     
+    @_synchronized
     def load_merged(self) -> pd.DataFrame:
         """加载合并后的完整数据"""
         if self._merged_df is None:
-            movies = self.load_movies()
-            credits = self.load_credits()
-            self._merged_df = movies.merge(
-                credits[['movie_id', 'cast', 'crew', 'director', 'top_actors']],
-                left_on='id',
-                right_on='movie_id',
-                how='left'
-            )
-            self._merged_df.drop('movie_id', axis=1, inplace=True)
+            key = self._cache_key(self.MOVIES_FILE, self.CREDITS_FILE)
+            self._merged_df = self._load_cached('merged', key)
+            if self._merged_df is None:
+                self._merged_df = self._merge(self.load_movies(), self.load_credits())
+                # 先做实体编码：列表列中的名称改为共享字典中的字符串对象再写缓存
+                self._build_entities(self._merged_df)
+                self._save_cached('merged', key, self._merged_df)
+                self._save_entities(key)
         return self._merged_df
     
-    def _preprocess_movies(self):
-        """预处理电影数据"""
-        df = self._movies_df
-        
-        # 解析JSON字段
-        json_columns = ['genres', 'keywords', 'production_companies', 
-                       'production_countries', 'spoken_languages']
-        for col in json_columns:
-            df[col] = df[col].apply(self._safe_parse_json)
-        
-        # 提取类型名称列表
-        df['genre_names'] = df['genres'].apply(
-            lambda x: [g['name'] for g in x] if isinstance(x, list) else []
+    @staticmethod
+    def _merge(movies: pd.DataFrame, credits: pd.DataFrame) -> pd.DataFrame:
+        """电影数据左连接演职人员数据（保持电影的行顺序，流式加载时没有原始 cast / crew 列）"""
+        columns = ['movie_id', 'cast', 'crew', 'director', 'top_actors']
+        merged = movies.merge(
+            credits[[c for c in columns if c in credits.columns]],
+            left_on='id',
+            right_on='movie_id',
+            how='left'
         )
+        merged.drop('movie_id', axis=1, inplace=True)
+        return merged
+    
+    # ==================== 实体编码 ====================
+    
+    # 合并数据中的列表列 -> 实体字典域（导演与演员共用 person 域）
+    ENTITY_COLUMNS = {
+        'genre_names': 'genre',
+        'top_actors': 'person',
+        'company_names': 'company',
+        'country_codes': 'country',
+        'language_codes': 'language',
+    }
+    
+    def get_dictionary(self, domain: str) -> EntityDictionary:
+        """获取实体字典（genre / person / company / country / language）"""
+        entities = self._ensure_entities()
+        if domain not in entities['dictionaries']:
+            raise ValueError(f"未知的实体域: {domain}")
+        return entities['dictionaries'][domain]
+    
+    def get_list_column(self, column: str) -> ListColumn:
+        """获取列表列的CSR编码（行顺序与 load_merged() 一致）"""
+        entities = self._ensure_entities()
+        if column not in entities['lists']:
+            raise ValueError(f"未编码的列表列: {column}")
+        return entities['lists'][column]
+    
+    def get_director_ids(self) -> np.ndarray:
+        """每部电影导演在 person 字典中的ID，无导演为 -1"""
+        return self._ensure_entities()['director_ids']
+    
+    @_synchronized
+    def _ensure_entities(self) -> dict:
+        if self._entities is None:
+            df = self.load_merged()
+            if self._entities is None:
+                key = self._cache_key(self.MOVIES_FILE, self.CREDITS_FILE)
+                arrays = self._store.load_arrays('entities', key) if key else None
+                if arrays is not None:
+                    self._entities = self._entities_from_arrays(arrays)
+                else:
+                    self._build_entities(df)
+                    self._save_entities(key)
+        return self._entities
+    
+    def _build_entities(self, df: pd.DataFrame):
+        """构建实体字典和CSR列表列，并把列表列中的名称替换为驻留字符串"""
+        dictionaries = {domain: EntityDictionary() for domain in
+                        dict.fromkeys(self.ENTITY_COLUMNS.values())}
+        self._entities = {'dictionaries': dictionaries,
+                          **self._encode_entities(df, dictionaries)}
+    
+    def _encode_entities(self, df: pd.DataFrame, dictionaries: dict) -> dict:
+        """编码导演和列表列（新名称登记到字典），并把 df 中的名称替换为驻留字符串"""
+        person = dictionaries['person']
         
-        # 提取制作公司名称
-        df['company_names'] = df['production_companies'].apply(
-            lambda x: [c['name'] for c in x] if isinstance(x, list) else []
+        director_ids = np.fromiter(
+            (person.intern(d) if isinstance(d, str) else -1 for d in df['director']),
+            dtype=np.int32, count=len(df)
         )
+        df['director'] = person.decode(director_ids.tolist())
+        
+        lists = {}
+        for column, domain in self.ENTITY_COLUMNS.items():
+            lists[column] = ListColumn.from_lists(df[column].tolist(), dictionaries[domain])
+            df[column] = lists[column].to_lists(dictionaries[domain])
+        
+        return {'lists': lists, 'director_ids': director_ids}
+    
+    def _save_entities(self, key: Optional[str]):
+        if key is None or self._entities is None:
+            return
+        arrays = {'director.ids': self._entities['director_ids']}
+        for domain, dictionary in self._entities['dictionaries'].items():
+            arrays[f'{domain}.names'] = dictionary.names
+        for column, list_column in self._entities['lists'].items():
+            arrays[f'{column}.offsets'] = list_column.offsets
+            arrays[f'{column}.ids'] = list_column.ids
+        try:
+            self._store.save_arrays('entities', key, arrays)
+        except OSError as e:
+            warnings.warn(f"实体编码缓存写入失败: {e}")
+    
+    def _entities_from_arrays(self, arrays: dict) -> dict:
+        dictionaries = {
+            domain: EntityDictionary(arrays[f'{domain}.names'].tolist())
+            for domain in dict.fromkeys(self.ENTITY_COLUMNS.values())
+        }
+        lists = {
+            column: ListColumn(arrays[f'{column}.offsets'], arrays[f'{column}.ids'])
+            for column in self.ENTITY_COLUMNS
+        }
+        return {
+            'dictionaries': dictionaries,
+            'lists': lists,
+            'director_ids': arrays['director.ids'],
+        }
+    
+    @_synchronized
+    def get_genre_index(self) -> GenreIndex:
+        """获取类型位图索引（首次调用时构建）"""
+        if self._genre_index is None:
+            self._genre_index = GenreIndex(
+                self.get_list_column('genre_names'), self.get_dictionary('genre')
+            )
+        return self._genre_index
+    
+    @_synchronized
+    def get_query_index(self) -> QueryIndex:
+        """获取切片查询索引（首次调用时构建，数据重新加载或增量导入后重新构建）"""
+        if self._query_index is None:
+            entities = self._ensure_entities()
+            self._query_index = QueryIndex(
+                self.load_merged(), self.get_genre_index(), entities['lists'],
+                entities['dictionaries']
+            )
+        return self._query_index
+    
+    # ==================== 关联表 ====================
+    
+    # 关联表名称 -> (合并数据中的列表列, 类别列名)
+    BRIDGE_TABLES = {
+        'genre': ('genre_names', 'genre'),
+        'actor': ('top_actors', 'actor'),
+        'company': ('company_names', 'company'),
+    }
+    
+    @_synchronized
+    def load_bridge(self, kind: str) -> pd.DataFrame:
+        """
+        加载电影与类型/演员/公司的长表（每个 电影×实体 一行）
+        
+        列: movie_idx (合并数据中的行号), movie_id, <实体> (分类列，编码即实体字典ID)，
+        演员表额外包含 billing_order（在主演列表中的位置）。
+        由CSR列表列直接展开，不需要逐行遍历。
+        """
+        if kind not in self.BRIDGE_TABLES:
+            raise ValueError(f"未知的关联表: {kind}")
+        if kind not in self._bridges:
+            self._bridges[kind] = self._build_bridge(kind)
+        return self._bridges[kind]
+    
+    def load_movie_genres(self) -> pd.DataFrame:
+        """电影-类型关联表"""
+        return self.load_bridge('genre')
+    
+    def load_movie_actors(self) -> pd.DataFrame:
+        """电影-演员关联表（含主演顺序）"""
+        return self.load_bridge('actor')
+    
+    def load_movie_companies(self) -> pd.DataFrame:
+        """电影-制作公司关联表"""
+        return self.load_bridge('company')
+    
+    def _build_bridge(self, kind: str) -> pd.DataFrame:
+        """由CSR列表列展开为长表"""
+        source_col, entity_col = self.BRIDGE_TABLES[kind]
+        list_column = self.get_list_column(source_col)
+        dictionary = self.get_dictionary(self.ENTITY_COLUMNS[source_col])
+        movie_idx = list_column.row_index()
+        
+        bridge = pd.DataFrame({
+            'movie_idx': movie_idx,
+            'movie_id': self.load_merged()['id'].to_numpy()[movie_idx],
+            entity_col: pd.Categorical.from_codes(list_column.ids, categories=dictionary.names),
+        })
+        if kind == 'actor':
+            bridge['billing_order'] = list_column.positions().astype(np.int8)
+        return bridge
+    
+    # ==================== 增量导入 ====================
+    
+    @_synchronized
+    def ingest(self, movies=None, credits=None) -> dict:
+        """
+        追加或更新电影与演职人员记录，返回变更事件
+        
+        movies / credits 可以是 DataFrame、记录字典列表，或 CSV / JSON Lines 文件路径，
+        字段与源CSV相同（JSON字段可以直接给出列表），按 id / movie_id 覆盖已有记录。
+        只对导入的记录做解析和预处理：合并数据中已有电影保持行号不变，新电影追加在末尾，
+        实体字典和CSR列表列增量更新，关联表和类型索引在下次访问时由CSR重新展开。
+        
+        记录同时写入导入日志目录（默认 data/ingest），重启后随源文件一起加载，
+        数据版本由源文件和导入日志共同决定。变更事件通知 add_change_listener 注册的回调：
+        {'version', 'previous_version', 'rows'（合并数据中变化的行号）, 'appended', 'updated'}
+        导入后类型数会超过 GenreIndex.MAX_GENRES 时抛出 ValueError，记录不写入日志、数据不变。
+        """
+        texts = {}
+        for filename, source in ((self.MOVIES_FILE, movies), (self.CREDITS_FILE, credits)):
+            if source is not None:
+                text = self._normalize_records(filename, source)
+                if text is not None:
+                    texts[filename] = text
+        
+        merged = self.load_merged()
+        entities = self._ensure_entities()
+        movies_df, credits_df = self.load_movies(), self.load_credits()
+        previous_version = self.data_version
+        if not texts:
+            return {'version': previous_version, 'previous_version': previous_version,
+                    'rows': np.empty(0, dtype=np.int64), 'appended': 0, 'updated': 0}
+        
+        # 只预处理导入的记录并先做校验：被拒绝的记录不能写入导入日志，否则重启重放时同样出错
+        new_movies = new_credits = None
+        if self.MOVIES_FILE in texts:
+            new_movies = pd.read_csv(io.StringIO(texts[self.MOVIES_FILE]))
+            self._preprocess_movies(new_movies)
+            new_movies = self._project(self.MOVIES_FILE, new_movies)
+            self._check_genre_count(new_movies, entities['dictionaries']['genre'])
+        if self.CREDITS_FILE in texts:
+            new_credits = pd.read_csv(io.StringIO(texts[self.CREDITS_FILE]))
+            self._preprocess_credits(new_credits)
+            new_credits = self._project(self.CREDITS_FILE, new_credits)
+        
+        if self.use_journal:
+            self._write_journal(texts)
+        
+        # 按主键合并到已有数据
+        affected = []
+        if new_movies is not None:
+            movies_df, _ = self._upsert_rows(movies_df, new_movies, 'id')
+            affected.append(new_movies['id'])
+        if new_credits is not None:
+            credits_df, _ = self._upsert_rows(credits_df, new_credits, 'movie_id')
+            affected.append(new_credits['movie_id'])
+        
+        # 重新合并受影响的电影，编码实体后写回合并数据和CSR列表列
+        changed = movies_df[movies_df['id'].isin(pd.concat(affected))]
+        changed = self._merge(changed, credits_df)
+        encoded = self._encode_entities(changed, entities['dictionaries'])
+        merged_df, rows = self._upsert_rows(merged, changed, 'id')
+        
+        director_ids = np.empty(len(merged_df), dtype=np.int32)
+        director_ids[:len(merged)] = entities['director_ids']
+        director_ids[rows] = encoded['director_ids']
+        self._entities = {
+            'dictionaries': entities['dictionaries'],
+            'lists': {column: entities['lists'][column].splice(rows, list_column)
+                      for column, list_column in encoded['lists'].items()},
+            'director_ids': director_ids,
+        }
+        self._movies_df, self._credits_df, self._merged_df = movies_df, credits_df, merged_df
+        self._bridges = {}
+        self._genre_index = None
+        self._query_index = None
+        
+        # 有导入日志时数据版本由日志摘要区分（重启后保持不变），否则递增修订号
+        if not self.use_journal:
+            self._revision += 1
+        self._data_version = None
+        change = {
+            'version': self.data_version,
+            'previous_version': previous_version,
+            'rows': np.sort(rows),
+            'appended': int((rows >= len(merged)).sum()),
+            'updated': int((rows < len(merged)).sum()),
+        }
+        for callback in list(self._change_listeners):
+            callback(change)
+        return change
+    
+    @staticmethod
+    def _check_genre_count(movies: pd.DataFrame, dictionary: EntityDictionary):
+        """导入的新类型名称会使类型数超过 GenreIndex.MAX_GENRES 时拒绝整批记录"""
+        added = {name for names in movies['genre_names'] if isinstance(names, list)
+                 for name in names if name is not None and name not in dictionary}
+        total = len(dictionary) + len(added)
+        if total > GenreIndex.MAX_GENRES:
+            raise ValueError(f"导入后类型数量 {total} 超过上限 {GenreIndex.MAX_GENRES}"
+                             f"（本批新增 {len(added)} 个类型）")
+    
+    def _normalize_records(self, filename: str, source) -> Optional[str]:
+        """
+        导入记录 -> 与源CSV列相同的CSV文本，没有记录时返回None
+        
+        导入和重启后重放日志都从这份文本解析，两条路径得到相同的数据。
+        """
+        if isinstance(source, pd.DataFrame):
+            df = source
+        elif isinstance(source, (str, Path)):
+            path = Path(source)
+            if path.suffix.lower() == '.csv':
+                df = pd.read_csv(path)
+            else:
+                df = pd.read_json(path, lines=True, dtype=False, convert_dates=False)
+        else:
+            df = pd.DataFrame(list(source))
+        
+        kind, key = self.SOURCES[filename]
+        if len(df) == 0:
+            return None
+        if key not in df.columns:
+            raise ValueError(f"导入的 {kind} 记录缺少主键列: {key}")
+        if df[key].isna().any():
+            raise ValueError(f"导入的 {kind} 记录主键 {key} 不能为空")
+        
+        columns = pd.read_csv(self.data_dir / filename, nrows=0).columns
+        df = df.reindex(columns=columns)
+        for column in df.columns:
+            if df[column].dtype == object:
+                df[column] = [json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict))
+                              else v for v in df[column]]
+        return df.to_csv(index=False)
+    
+    def _journal_files(self, filename: str) -> list:
+        """源文件对应的导入日志文件（按导入顺序）"""
+        if not self.use_journal or not self.journal_dir.exists():
+            return []
+        kind, _ = self.SOURCES[filename]
+        return sorted(self.journal_dir.glob(f'[0-9]*-{kind}.csv'))
+    
+    def _write_journal(self, texts: dict):
+        """本次导入的记录写入日志（同一次导入的文件共用一个序号）"""
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        existing = [int(p.name.split('-', 1)[0]) for p in self.journal_dir.glob('[0-9]*-*.csv')]
+        seq = max(existing, default=0) + 1
+        for filename, text in texts.items():
+            kind, _ = self.SOURCES[filename]
+            tmp = self.journal_dir / f'.{kind}-{uuid.uuid4().hex}'
+            tmp.write_text(text, encoding='utf-8')
+            tmp.replace(self.journal_dir / f'{seq:06d}-{kind}.csv')
+    
+    def _read_source(self, filename: str) -> pd.DataFrame:
+        """读取源CSV并依次应用导入日志"""
+        df = pd.read_csv(self.data_dir / filename)
+        _, key = self.SOURCES[filename]
+        for path in self._journal_files(filename):
+            df, _ = self._upsert_rows(df, pd.read_csv(path), key)
+        return df
+    
+    @staticmethod
+    def _upsert_rows(df: pd.DataFrame, rows: pd.DataFrame, key: str):
+        """
+        按主键合并记录：已有的行原位替换，新记录依次追加在末尾
+        
+        返回 (新的DataFrame, 每条记录在其中的行号)；同一批中重复的主键以最后一条为准。
+        """
+        rows = rows.drop_duplicates(subset=key, keep='last')
+        first = pd.Series(np.arange(len(df)), index=df[key].to_numpy())
+        first = first[~first.index.duplicated(keep='first')]
+        position = first.reindex(rows[key].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+        
+        existing = position >= 0
+        take = np.arange(len(df) + int((~existing).sum()))
+        take[position[existing]] = len(df) + np.flatnonzero(existing)
+        take[len(df):] = len(df) + np.flatnonzero(~existing)
+        
+        combined = pd.concat([df, rows], ignore_index=True).take(take).reset_index(drop=True)
+        result_rows = position.copy()
+        result_rows[~existing] = len(df) + np.arange(int((~existing).sum()))
+        return combined, result_rows
+    
+    # ==================== 分块流式加载 ====================
+    
+    def _preprocessor(self, filename: str):
+        return {self.MOVIES_FILE: self._preprocess_movies,
+                self.CREDITS_FILE: self._preprocess_credits}[filename]
+    
+    def _load_source(self, filename: str) -> pd.DataFrame:
+        """读取并预处理源文件（设置了 chunksize 时分块流式读取）"""
+        if filename == self.CREDITS_FILE and self.parse_workers > 1:
+            # 演职人员解析的进程池在整个加载过程中复用（分块加载时各块共用）
+            with ParallelCreditsParser(self.parse_workers) as parser:
+                self._credits_parser = parser
+                try:
+                    return self._read_and_preprocess(filename)
+                finally:
+                    self._credits_parser = None
+        return self._read_and_preprocess(filename)
+    
+    def _read_and_preprocess(self, filename: str) -> pd.DataFrame:
+        if self.chunksize:
+            return self._read_chunked(filename)
+        df = self._read_source(filename)
+        self._preprocessor(filename)(df)
+        return df
+    
+    def _project(self, filename: str, df: pd.DataFrame) -> pd.DataFrame:
+        """流式加载时去掉预处理后不再需要的列（非流式加载时原样返回）"""
+        if not self.chunksize:
+            return df
+        dropped = self.STREAMING_SKIPPED_COLUMNS[filename] + self.STREAMING_DROPPED_COLUMNS[filename]
+        return df.drop(columns=[c for c in dropped if c in df.columns])
+    
+    def _read_chunked(self, filename: str) -> pd.DataFrame:
+        """
+        分块读取并预处理源CSV
+        
+        每次只读入 chunksize 行，且不读取 STREAMING_SKIPPED_COLUMNS；预处理后丢弃
+        STREAMING_DROPPED_COLUMNS 中的原始JSON字符串，结果暂存到 spill_dir 下的临时目录，
+        读完后逐块载入并驻留名称字符串再拼接，内存中同时只有一块原始数据。
+        预处理逐行进行，分块的结果与整体读取相同（只少了投影掉的列）；
+        导入日志的记录同样预处理后按主键合并。
+        """
+        kind, key = self.SOURCES[filename]
+        skipped = set(self.STREAMING_SKIPPED_COLUMNS[filename])
+        preprocess = self._preprocessor(filename)
+        
+        def read(path, **kwargs):
+            return pd.read_csv(path, usecols=lambda c: c not in skipped, **kwargs)
+        
+        def prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+            preprocess(chunk)
+            return self._project(filename, chunk)
+        
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.spill_dir, prefix=f'{kind}-',
+                                         ignore_cleanup_errors=True) as tmp:
+            spill = FrameStore(tmp)
+            n_chunks = 0
+            with read(self.data_dir / filename, chunksize=self.chunksize) as reader:
+                for chunk in reader:
+                    spill.save(f'{n_chunks:06d}', kind, prepare(chunk))
+                    n_chunks += 1
+            chunks = []
+            for i in range(n_chunks):
+                chunk = spill.load(f'{i:06d}', kind)
+                if chunk is None:
+                    raise OSError(f"分块暂存文件读取失败: {tmp}")
+                self._intern_names(chunk)
+                chunks.append(chunk)
+            df = (pd.concat(chunks, ignore_index=True) if chunks
+                  else prepare(read(self.data_dir / filename, nrows=0)))
+            del chunks
+        
+        for path in self._journal_files(filename):
+            df, _ = self._upsert_rows(df, prepare(read(path)), key)
+        return df
+    
+    @staticmethod
+    def _intern_names(df: pd.DataFrame):
+        """对象列中的字符串（含列表中的字符串）改为驻留字符串，各块中相同的名称共享一个对象"""
+        intern = sys.intern
+        for column in df.columns:
+            if df[column].dtype != object:
+                continue
+            df[column] = [
+                intern(v) if isinstance(v, str)
+                else [intern(x) if isinstance(x, str) else x for x in v] if isinstance(v, list)
+                else v
+                for v in df[column]
+            ]
+    
+    # ==================== 预处理缓存 ====================
+    
+    def _source_digest(self, filename: str) -> str:
+        """源文件内容摘要（进程内只计算一次）"""
+        return self._file_digest(self.data_dir / filename)
+    
+    def _file_digest(self, path: Path) -> str:
+        key = str(path)
+        if key not in self._source_digests:
+            self._source_digests[key] = file_digest(path)
+        return self._source_digests[key]
+    
+    def _update_source_hash(self, h, filename: str):
+        """把源文件及其导入日志的摘要加入哈希"""
+        h.update(f"{filename}:{self._source_digest(filename)}".encode())
+        for path in self._journal_files(filename):
+            h.update(f"{path.name}:{self._file_digest(path)}".encode())
+    
+    @classmethod
+    @functools.cache
+    def _preprocess_fingerprint(cls) -> str:
+        """预处理代码指纹，代码变化后缓存自动失效"""
+        h = hashlib.sha256(f"v{PREPROCESS_VERSION}".encode())
+        for func in (cls._preprocess_movies, cls._preprocess_credits,
+                     cls._extract_director, cls._build_entities, cls._encode_entities,
+                     cls._merge, cls._read_source, cls._read_chunked, cls._project,
+                     cls._intern_names, cls._upsert_rows, JsonColumnParser,
+                     parallel_credits,
+                     EntityDictionary, ListColumn):
+            try:
+                h.update(inspect.getsource(func).encode())
+            except (OSError, TypeError):
+                h.update(func.__qualname__.encode())
+        return h.hexdigest()
+    
+    def _cache_key(self, *filenames: str) -> Optional[str]:
+        """由源文件摘要和预处理版本组成的缓存键"""
+        if not self.use_cache:
+            return None
+        h = hashlib.sha256(self._preprocess_fingerprint().encode())
+        for name in filenames:
+            self._update_source_hash(h, name)
+        # 流式加载的结果少了投影掉的列，与完整加载分开缓存
+        if self.chunksize:
+            h.update(b'projected')
+        return h.hexdigest()
+    
+    def _load_cached(self, name: str, key: Optional[str]) -> Optional[pd.DataFrame]:
+        if key is None:
+            return None
+        return self._store.load(name, key)
+    
+    def _save_cached(self, name: str, key: Optional[str], df: pd.DataFrame):
+        if key is None:
+            return
+        try:
+            self._store.save(name, key, df)
+        except OSError as e:
+            warnings.warn(f"预处理缓存写入失败，将在下次启动时重新解析: {e}")
+    
+    def clear_cache(self):
+        """删除磁盘上的预处理缓存"""
+        self._store.clear()
+    
+    def _preprocess_movies(self, df: pd.DataFrame):
+        """预处理电影数据（原地添加派生列）"""
+        
+        # 批量解析JSON字段，只提取用到的值；原始JSON字符串列保持不变
+        df['genre_names'] = self._parse_column(df, 'genres', NAME_PARSER_FIELDS)
+        df['keyword_names'] = self._parse_column(df, 'keywords', NAME_PARSER_FIELDS)
+        df['company_names'] = self._parse_column(df, 'production_companies', NAME_PARSER_FIELDS)
+        df['country_codes'] = self._parse_column(df, 'production_countries', COUNTRY_PARSER_FIELDS)
+        df['language_codes'] = self._parse_column(df, 'spoken_languages', LANGUAGE_PARSER_FIELDS)
         
         # 提取主要制作公司
         df['main_company'] = df['company_names'].apply(
@@ -89,52 +885,64 @@ class DataLoader:
         
         # 标记有效财务数据
         df['has_financial_data'] = (df['budget'] > 0) & (df['revenue'] > 0)
-        
-        # 提取关键词
-        df['keyword_names'] = df['keywords'].apply(
-            lambda x: [k['name'] for k in x] if isinstance(x, list) else []
-        )
     
-    def _preprocess_credits(self):
-        """预处理演职人员数据"""
-        df = self._credits_df
+    def _preprocess_credits(self, df: pd.DataFrame):
+        """预处理演职人员数据（原地添加派生列）"""
+        if self.parse_workers > 1 and len(df) >= PARALLEL_MIN_ROWS:
+            self._preprocess_credits_parallel(df)
+            return
         
-        # 解析JSON字段
-        df['cast'] = df['cast'].apply(self._safe_parse_json)
-        df['crew'] = df['crew'].apply(self._safe_parse_json)
+        # 批量解析演职人员，cast 提取 (name, order)，crew 提取 (job, name)
+        cast = self._parse_column(df, 'cast', CAST_PARSER_FIELDS)
+        crew = self._parse_column(df, 'crew', CREW_PARSER_FIELDS)
         
         # 提取导演
-        df['director'] = df['crew'].apply(self._extract_director)
+        df['director'] = crew.apply(self._extract_director)
         
-        # 提取前3位主演
-        df['top_actors'] = df['cast'].apply(
-            lambda x: [a['name'] for a in x[:3]] if isinstance(x, list) else []
-        )
+        # 提取前几位主演
+        df['top_actors'] = cast.apply(lambda x: [name for name, _ in x[:TOP_ACTORS]])
     
-    @staticmethod
-    def _safe_parse_json(x):
-        """安全解析JSON字符串"""
-        if pd.isna(x):
-            return []
-        if isinstance(x, list):
-            return x
-        try:
-            return json.loads(x.replace("'", '"'))
-        except (json.JSONDecodeError, AttributeError):
-            try:
-                return ast.literal_eval(x)
-            except (ValueError, SyntaxError):
-                return []
+    def _preprocess_credits_parallel(self, df: pd.DataFrame):
+        """多进程解析 cast / crew（见 ParallelCreditsParser），派生列与单进程解析相同"""
+        parser = self._credits_parser
+        if parser is None:
+            with ParallelCreditsParser(self.parse_workers) as parser:
+                result = parser.parse(df['cast'].tolist(), df['crew'].tolist())
+        else:
+            result = parser.parse(df['cast'].tolist(), df['crew'].tolist())
+        
+        for column, stats in result['stats'].items():
+            self._record_parse_stats(column, stats)
+        df['director'] = pd.Series(result['director'], index=df.index)
+        df['top_actors'] = pd.Series(result['top_actors'], index=df.index, dtype=object)
+    
+    def _parse_column(self, df: pd.DataFrame, column: str, fields: tuple) -> pd.Series:
+        """批量解析一个JSON列并记录解析统计"""
+        parser = JsonColumnParser(fields)
+        result = parser.parse_series(df[column])
+        self._record_parse_stats(column, parser.stats)
+        return result
+    
+    def _record_parse_stats(self, column: str, stats: dict):
+        # 分块加载和增量导入时累加到已有的统计
+        previous = self._parse_report.get(column)
+        if previous is None:
+            self._parse_report[column] = dict(stats)
+        else:
+            self._parse_report[column] = {k: previous[k] + stats[k] for k in previous}
     
     @staticmethod
     def _extract_director(crew_list):
-        """从剧组列表中提取导演"""
-        if not isinstance(crew_list, list):
-            return None
-        for member in crew_list:
-            if member.get('job') == 'Director':
-                return member.get('name')
-        return None
+        """从剧组 (job, name) 列表中提取导演"""
+        return extract_director(crew_list)
+    
+    def get_parse_report(self) -> dict:
+        """
+        获取JSON列解析统计（每列的行数、快速路径/回退/格式错误行数）
+        
+        数据从预处理缓存加载时没有解析过程，返回空字典。
+        """
+        return dict(self._parse_report)
     
     def get_valid_financial_data(self) -> pd.DataFrame:
         """获取有效财务数据（budget和revenue都大于0）"""
@@ -0,0 +1,210 @@
+"""
+特征布局模块
+把训练时的特征顺序和标准化参数编译为固定的数组下标，供低延迟预测使用
+"""
+
+import math
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+
+
+class FeatureLayout:
+    """
+    编译后的特征布局
+
+    训练完成时根据特征列表确定每个输入字段对应的列下标，并把 StandardScaler 的
+    mean / scale 折叠进去：全零输入的标准化结果、每个类型列取1时的标准化结果都预先算好，
+    单条预测只需在预分配的缓冲区中填入少量数值，不再构造 DataFrame 或重排列。
+    """
+
+    def __init__(self, feature_names, numeric_features, log_features,
+                 genre_classes=(), mean=None, scale=None):
+        self.feature_names = list(feature_names)
+        n = len(self.feature_names)
+        position = {name: i for i, name in enumerate(self.feature_names)}
+
+        self.mean = np.zeros(n) if mean is None else np.asarray(mean, dtype=float)
+        self.scale = np.ones(n) if scale is None else np.asarray(scale, dtype=float)
+
+        # (输入字段, 原值列下标, 对数列下标)，列不存在时为None
+        self._numeric = tuple(
+            (feature, position.get(feature),
+             position.get(f'{feature}_log') if feature in log_features else None)
+            for feature in numeric_features
+        )
+        self._genre_count = position.get('genre_count')
+        self._genre_columns = {g: position[f'genre_{g}'] for g in genre_classes
+                               if f'genre_{g}' in position}
+
+        # 折叠标准化参数（运算顺序与 StandardScaler.transform 相同：先减均值再除以标准差）
+        self._base = ((np.zeros(n) - self.mean) / self.scale).tolist()
+        self._genre_on = {g: (1.0 - self.mean[j]) / self.scale[j]
+                          for g, j in self._genre_columns.items()}
+        self._mean = self.mean.tolist()
+        self._scale = self.scale.tolist()
+        self._local = threading.local()
+
+    @classmethod
+    def from_state(cls, state: dict, numeric_features, log_features) -> 'FeatureLayout':
+        """由训练产物（特征列表、标准化器、类型编码器）构建"""
+        scaler = state['scaler']
+        mlb = state['mlb']
+        return cls(state['feature_names'], numeric_features, log_features,
+                   genre_classes=mlb.classes_ if mlb is not None else (),
+                   mean=scaler.mean_, scale=scaler.scale_)
+
+    def __len__(self) -> int:
+        return len(self.feature_names)
+
+    def row(self, movie: dict) -> np.ndarray:
+        """
+        单部电影的标准化特征，形状 (1, 特征数)
+
+        返回当前线程的预分配缓冲区，下一次调用会覆盖其内容。
+        """
+        values = self._base.copy()
+        mean, scale = self._mean, self._scale
+        for feature, column, log_column in self._numeric:
+            value = float(movie.get(feature, 0))
+            if column is not None:
+                values[column] = (value - mean[column]) / scale[column]
+            if log_column is not None:
+                values[log_column] = (math.log1p(value) - mean[log_column]) / scale[log_column]
+
+        genres = movie.get('genres', [])
+        if self._genre_count is not None:
+            j = self._genre_count
+            values[j] = (len(genres) - mean[j]) / scale[j]
+        for genre in genres:
+            j = self._genre_columns.get(genre)
+            if j is not None:
+                values[j] = self._genre_on[genre]
+
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(values)))
+        buffer[0] = values
+        return buffer
+
+    def matrix(self, movies: list) -> np.ndarray:
+        """多部电影的标准化特征矩阵（缺失的输入取0，未知类型忽略）"""
+        X = np.zeros((len(movies), len(self.feature_names)))
+
+        # 数值特征及其对数变换
+        for feature, column, log_column in self._numeric:
+            values = np.array([movie.get(feature, 0) for movie in movies], dtype=float)
+            if column is not None:
+                X[:, column] = values
+            if log_column is not None:
+                X[:, log_column] = np.log1p(values)
+
+        # 类型特征
+        genre_lists = [movie.get('genres', []) for movie in movies]
+        if self._genre_count is not None:
+            X[:, self._genre_count] = [len(genres) for genres in genre_lists]
+
+        rows, columns = [], []
+        for i, genres in enumerate(genre_lists):
+            for genre in genres:
+                column = self._genre_columns.get(genre)
+                if column is not None:
+                    rows.append(i)
+                    columns.append(column)
+        X[rows, columns] = 1
+
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+
+# ==================== 单条预测打分器 ====================
+
+class _PackedTrees:
+    """
+    把多棵回归树的节点数组拼接在一起，对单条样本同时遍历所有树
+
+    叶节点的左右子节点指向自身，固定迭代 max_depth 次后每棵树都停在叶节点。
+    比较方式与 scikit-learn 相同：特征先转为 float32，再与 float64 阈值比较。
+    """
+
+    def __init__(self, trees):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            nodes = np.arange(n)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += n
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+    def leaf_values(self, x: np.ndarray) -> np.ndarray:
+        """单条样本在每棵树上的叶节点值"""
+        x32 = x.astype(np.float32)
+        node = self.roots
+        for _ in range(self.max_depth):
+            go_left = x32[self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+
+def compile_scorer(model) -> Callable[[np.ndarray], float]:
+    """
+    为已训练的模型生成单条预测函数（输入形状 (1, 特征数)，返回对数票房）
+
+    线性模型直接做点积；随机森林和梯度提升树使用打包后的树同时遍历，
+    避免 scikit-learn 每次预测的输入校验和并行调度开销；其他模型退回 model.predict。
+    """
+    if isinstance(model, (LinearRegression, Ridge)) and np.ndim(model.coef_) == 1:
+        coef = np.asarray(model.coef_, dtype=float)
+        intercept = float(model.intercept_)
+        return lambda x: float(x[0] @ coef) + intercept
+
+    if isinstance(model, RandomForestRegressor) and getattr(model, 'n_outputs_', 1) == 1:
+        packed = _PackedTrees([estimator.tree_ for estimator in model.estimators_])
+        n_trees = len(model.estimators_)
+        return lambda x: float(packed.leaf_values(x[0]).sum()) / n_trees
+
+    if (isinstance(model, GradientBoostingRegressor) and model.loss == 'squared_error'
+            and model.estimators_.shape[1] == 1):
+        packed = _PackedTrees([estimator.tree_ for estimator in model.estimators_[:, 0]])
+        init = _gradient_boosting_init(model)
+        if init is not None:
+            learning_rate = model.learning_rate
+            return lambda x: init + float((learning_rate * packed.leaf_values(x[0])).sum())
+
+    return lambda x: float(model.predict(x)[0])
+
+
+def _gradient_boosting_init(model: GradientBoostingRegressor) -> Optional[float]:
+    """梯度提升树的初始预测值（常数初始化器以外返回None）"""
+    if isinstance(model.init_, str):
+        return 0.0 if model.init_ == 'zero' else None
+    constant = getattr(model.init_, 'constant_', None)
+    if constant is None:
+        return None
+    return float(np.ravel(constant)[0])
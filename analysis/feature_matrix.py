@@ -0,0 +1,198 @@
+"""
+特征矩阵缓存模块
+把训练用的特征矩阵保存为连续的 float32 数组，数据追加时只计算新增的行
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MultiLabelBinarizer
+
+
+# 追加行时预留的空余容量比例
+GROWTH_FACTOR = 1.5
+
+
+def _genre_lists(df: pd.DataFrame) -> list:
+    if 'genre_names' not in df.columns:
+        return [[] for _ in range(len(df))]
+    return [g if isinstance(g, list) else [] for g in df['genre_names']]
+
+
+class FeatureMatrix:
+    """
+    训练特征矩阵
+
+    X 为C连续的 float32 数组（行 × 特征），y 为票房（float64），rows 为每行在合并数据中的
+    行号，行顺序与合并数据一致，因此增量更新与完整构建的结果相同。
+    对象创建后不再修改：update 返回新的矩阵。纯追加时新行写入共享缓冲区的空余容量，
+    已交给训练任务的旧矩阵只引用缓冲区的前 n 行，不受影响。
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, rows: np.ndarray,
+                 numeric_features, log_features, genre_classes,
+                 data_version: Optional[str] = None, spec_version: Optional[int] = None,
+                 _buffers: Optional[dict] = None):
+        self.numeric_features = tuple(numeric_features)
+        self.log_features = tuple(log_features)
+        self.genre_classes = tuple(genre_classes)
+        self.data_version = data_version
+        self.spec_version = spec_version
+        self._n = len(rows)
+        if _buffers is None:
+            _buffers = {
+                'X': np.ascontiguousarray(X, dtype=np.float32),
+                'y': np.asarray(y, dtype=np.float64),
+                'rows': np.asarray(rows, dtype=np.int64),
+                'used': self._n,
+            }
+        self._buffers = _buffers
+
+    # ==================== 构建 ====================
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, numeric_features, log_features,
+              data_version: Optional[str] = None,
+              spec_version: Optional[int] = None) -> 'FeatureMatrix':
+        """由合并数据完整构建（只保留有财务数据且特征和票房都不缺失的行）"""
+        numeric = [f for f in numeric_features if f in df.columns]
+        df = cls._eligible(df, numeric)
+        classes = sorted({g for genres in _genre_lists(df) for g in genres})
+        X, y = cls._encode(df, numeric, log_features, classes)
+        return cls(X, y, df.index.to_numpy(), numeric, log_features, classes,
+                   data_version=data_version, spec_version=spec_version)
+
+    @staticmethod
+    def _eligible(df: pd.DataFrame, numeric: list) -> pd.DataFrame:
+        df = df[df['has_financial_data']]
+        return df.dropna(subset=numeric + ['revenue'])
+
+    @staticmethod
+    def _encode(df: pd.DataFrame, numeric: list, log_features,
+                classes) -> Tuple[np.ndarray, np.ndarray]:
+        """计算特征（列顺序：数值特征、对数特征、类型One-Hot、类型数量）"""
+        n_columns = len(numeric) + len(log_features) + len(classes) + 1
+        X = np.zeros((len(df), n_columns), dtype=np.float32)
+
+        for j, feature in enumerate(numeric):
+            X[:, j] = df[feature].to_numpy(dtype=np.float64)
+        offset = len(numeric)
+        for j, feature in enumerate(log_features):
+            X[:, offset + j] = np.log1p(df[feature].to_numpy(dtype=np.float64))
+        offset += len(log_features)
+
+        # 类型One-Hot：展开为 (行, 列) 坐标后一次赋值
+        genre_lists = _genre_lists(df)
+        column_of = {g: offset + j for j, g in enumerate(classes)}
+        lengths = np.fromiter((len(g) for g in genre_lists), dtype=np.intp, count=len(df))
+        columns = np.fromiter((column_of[g] for genres in genre_lists for g in genres),
+                              dtype=np.intp, count=int(lengths.sum()))
+        X[np.repeat(np.arange(len(df)), lengths), columns] = 1
+        X[:, -1] = lengths
+
+        return X, df['revenue'].to_numpy(dtype=np.float64)
+
+    # ==================== 访问 ====================
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def X(self) -> np.ndarray:
+        return self._buffers['X'][:self._n]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._buffers['y'][:self._n]
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._buffers['rows'][:self._n]
+
+    @property
+    def feature_names(self) -> list:
+        return (list(self.numeric_features)
+                + [f'{feature}_log' for feature in self.log_features]
+                + [f'genre_{g}' for g in self.genre_classes]
+                + ['genre_count'])
+
+    def genre_encoder(self) -> MultiLabelBinarizer:
+        """与特征列对应的类型编码器（和直接在训练数据上 fit 的结果相同）"""
+        mlb = MultiLabelBinarizer()
+        mlb.fit([self.genre_classes])
+        return mlb
+
+    def to_frame(self) -> Tuple[pd.DataFrame, pd.Series, MultiLabelBinarizer]:
+        """(特征DataFrame, 票房Series, 类型编码器)，DataFrame直接引用float32数组，不复制"""
+        index = pd.Index(self.rows)
+        X = pd.DataFrame(self.X, columns=self.feature_names, index=index, copy=False)
+        y = pd.Series(self.y, index=index, name='revenue', copy=False)
+        return X, y, self.genre_encoder()
+
+    # ==================== 增量更新 ====================
+
+    def update(self, changed: pd.DataFrame, data_version: Optional[str] = None) -> 'FeatureMatrix':
+        """
+        合并新增或变化的行，返回新的特征矩阵
+
+        changed 为合并数据中新增或变化的行，索引为行号。只对这些行计算特征；
+        全部是末尾新增的行且没有新类型时直接写入缓冲区的空余容量，
+        否则（更新已有的行、出现新类型）重新排列为新的数组。
+        """
+        numeric = list(self.numeric_features)
+        eligible = self._eligible(changed, numeric)
+        new_classes = {g for genres in _genre_lists(eligible) for g in genres}
+        classes = self.genre_classes
+        if not new_classes <= set(classes):
+            classes = tuple(sorted(new_classes.union(classes)))
+        X_new, y_new = self._encode(eligible, numeric, self.log_features, classes)
+        rows_new = eligible.index.to_numpy(dtype=np.int64)
+
+        appended_only = (classes == self.genre_classes
+                         and (self._n == 0 or changed.index.min() > self.rows[-1]))
+        if appended_only:
+            return self._append(X_new, y_new, rows_new, data_version)
+
+        # 一般情况：去掉变化的旧行，与新行合并后按行号排序
+        base = self if classes == self.genre_classes else self._with_classes(classes)
+        keep = ~np.isin(base.rows, changed.index.to_numpy())
+        rows = np.concatenate([base.rows[keep], rows_new])
+        order = np.argsort(rows, kind='stable')
+        X = np.concatenate([base.X[keep], X_new])[order]
+        y = np.concatenate([base.y[keep], y_new])[order]
+        return FeatureMatrix(X, y, rows[order], numeric, self.log_features, classes,
+                             data_version=data_version, spec_version=self.spec_version)
+
+    def _append(self, X_new: np.ndarray, y_new: np.ndarray, rows_new: np.ndarray,
+                data_version: Optional[str]) -> 'FeatureMatrix':
+        buffers = self._buffers
+        n, k = self._n, len(X_new)
+        # 只有最新的矩阵可以写入共享缓冲区（旧矩阵派生出的分支另行分配）
+        if buffers['used'] != n or len(buffers['X']) < n + k:
+            capacity = max(n + k, int((n + k) * GROWTH_FACTOR))
+            X = np.empty((capacity, X_new.shape[1]), dtype=np.float32)
+            y = np.empty(capacity, dtype=np.float64)
+            rows = np.empty(capacity, dtype=np.int64)
+            X[:n], y[:n], rows[:n] = self.X, self.y, self.rows
+            buffers = {'X': X, 'y': y, 'rows': rows, 'used': n}
+        buffers['X'][n:n + k] = X_new
+        buffers['y'][n:n + k] = y_new
+        buffers['rows'][n:n + k] = rows_new
+        buffers['used'] = n + k
+        return FeatureMatrix(buffers['X'][:n + k], buffers['y'][:n + k], buffers['rows'][:n + k],
+                             self.numeric_features, self.log_features, self.genre_classes,
+                             data_version=data_version, spec_version=self.spec_version,
+                             _buffers=buffers)
+
+    def _with_classes(self, classes: tuple) -> 'FeatureMatrix':
+        """扩展类型列（已有行的新类型列为0）"""
+        offset = len(self.numeric_features) + len(self.log_features)
+        X = np.zeros((self._n, offset + len(classes) + 1), dtype=np.float32)
+        X[:, :offset] = self.X[:, :offset]
+        position = {g: offset + j for j, g in enumerate(classes)}
+        X[:, [position[g] for g in self.genre_classes]] = self.X[:, offset:-1]
+        X[:, -1] = self.X[:, -1]
+        return FeatureMatrix(X, self.y, self.rows, self.numeric_features, self.log_features,
+                             classes, data_version=self.data_version,
+                             spec_version=self.spec_version)
@@ -0,0 +1,164 @@
+"""
+预处理数据缓存模块
+将预处理后的DataFrame以列式二进制格式持久化到磁盘
+"""
+
+import hashlib
+import json
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# 缓存文件格式版本，格式变化时递增
+FORMAT_VERSION = 1
+
+
+def file_digest(path) -> str:
+    """计算文件内容的SHA-256摘要"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _is_binary_column(series: pd.Series) -> bool:
+    """判断列能否以定长二进制数组(.npy)存储"""
+    dtype = series.dtype
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM'
+
+
+class FrameStore:
+    """
+    列式DataFrame磁盘缓存
+
+    每个缓存条目对应一个目录：数值/布尔/日期列逐列保存为 .npy，
+    加载时以内存映射方式打开；其余对象列（字符串、列表等）合并保存为一个pickle。
+    也可以保存一组不等长的命名数组（save_arrays / load_arrays）。
+    manifest.json 最后写入，作为条目完整的标记。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _entry_dir(self, name: str, key: str) -> Path:
+        return self.cache_dir / name / key[:32]
+
+    def load(self, name: str, key: str) -> Optional[pd.DataFrame]:
+        """按名称和缓存键加载，未命中时返回None"""
+        entry = self._entry_dir(name, key)
+        manifest = self._read_manifest(entry, key)
+        if manifest is None or 'columns' not in manifest:
+            return None
+
+        try:
+            objects = None
+            if manifest['object_columns']:
+                with open(entry / 'objects.pkl', 'rb') as f:
+                    objects = pickle.load(f)
+
+            columns = {}
+            for i, col in enumerate(manifest['columns']):
+                if col in manifest['binary_columns']:
+                    columns[col] = np.load(entry / f'{i}.npy', mmap_mode='r')
+                else:
+                    columns[col] = objects[col]
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError):
+            return None
+
+        return pd.DataFrame(columns, columns=manifest['columns'], copy=False)
+
+    def save(self, name: str, key: str, df: pd.DataFrame):
+        """保存DataFrame，并清理同名的旧条目"""
+        df = df.reset_index(drop=True)
+        columns = [str(c) for c in df.columns]
+        binary_columns = [c for c in columns if _is_binary_column(df[c])]
+        object_columns = [c for c in columns if c not in binary_columns]
+
+        def write(tmp: Path):
+            for i, col in enumerate(columns):
+                if col in binary_columns:
+                    np.save(tmp / f'{i}.npy', np.ascontiguousarray(df[col].to_numpy()))
+            if object_columns:
+                with open(tmp / 'objects.pkl', 'wb') as f:
+                    pickle.dump(df[object_columns], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._write_entry(name, key, write, {
+            'rows': len(df),
+            'columns': columns,
+            'binary_columns': binary_columns,
+            'object_columns': object_columns
+        })
+
+    def load_arrays(self, name: str, key: str) -> Optional[dict]:
+        """加载一组命名数组，数值数组以内存映射方式打开；未命中时返回None"""
+        entry = self._entry_dir(name, key)
+        manifest = self._read_manifest(entry, key)
+        if manifest is None or 'arrays' not in manifest:
+            return None
+        try:
+            arrays = {}
+            for i, (array_name, is_object) in enumerate(manifest['arrays']):
+                if is_object:
+                    arrays[array_name] = np.load(entry / f'{i}.npy', allow_pickle=True)
+                else:
+                    arrays[array_name] = np.load(entry / f'{i}.npy', mmap_mode='r')
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        return arrays
+
+    def save_arrays(self, name: str, key: str, arrays: dict):
+        """保存一组命名数组（对象数组使用pickle）"""
+        items = [(array_name, np.asarray(arr)) for array_name, arr in arrays.items()]
+
+        def write(tmp: Path):
+            for i, (_, arr) in enumerate(items):
+                np.save(tmp / f'{i}.npy', np.ascontiguousarray(arr),
+                        allow_pickle=arr.dtype.hasobject)
+
+        self._write_entry(name, key, write, {
+            'arrays': [[array_name, bool(arr.dtype.hasobject)] for array_name, arr in items]
+        })
+
+    def _read_manifest(self, entry: Path, key: str) -> Optional[dict]:
+        manifest_path = entry / 'manifest.json'
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('key') != key or manifest.get('format') != FORMAT_VERSION:
+            return None
+        return manifest
+
+    def _write_entry(self, name: str, key: str, write, manifest: dict):
+        """写入一个缓存条目，并清理同名的旧条目"""
+        # 先写入临时目录，完成后整体改名，避免读到写了一半的条目
+        parent = self.cache_dir / name
+        parent.mkdir(parents=True, exist_ok=True)
+        tmp = parent / f'.tmp-{uuid.uuid4().hex}'
+        tmp.mkdir()
+        try:
+            write(tmp)
+            with open(tmp / 'manifest.json', 'w', encoding='utf-8') as f:
+                json.dump({'format': FORMAT_VERSION, 'key': key, **manifest},
+                          f, ensure_ascii=False, indent=2)
+
+            entry = self._entry_dir(name, key)
+            for old in parent.iterdir():
+                if old != tmp and not old.name.startswith('.tmp-'):
+                    shutil.rmtree(old, ignore_errors=True)
+            tmp.rename(entry)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def clear(self, name: Optional[str] = None):
+        """清除缓存（指定名称或全部）"""
+        target = self.cache_dir / name if name else self.cache_dir
+        shutil.rmtree(target, ignore_errors=True)
@@ -0,0 +1,295 @@
+"""
+索引模块
+为常用的过滤条件预先构建向量化索引
+"""
+
+import re
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class GenreIndex:
+    """
+    类型位图索引
+
+    每部电影一个无符号整数位图（类型ID对应的位为1），
+    同时保存 电影×类型 的多热布尔矩阵，类型过滤和组合统计均为向量化位运算。
+    类型超过 64 个时（导入了自定义类型）不构建位图，过滤和组合统计改用布尔矩阵。
+    """
+
+    # 位图的最大类型数
+    MAX_BITS = 64
+    # 支持的最大类型数：布尔矩阵按 电影×类型 存储，导入时拒绝超过该数量的新类型
+    MAX_GENRES = 256
+
+    # 谓词表达式的词法单元：括号、双引号包裹的名称、其他单词
+    _TOKEN = re.compile(r'\(|\)|"[^"]*"|[^\s()"]+')
+    _KEYWORDS = ('AND', 'OR', 'NOT')
+
+    def __init__(self, genres, dictionary):
+        """genres 为类型列的 ListColumn，dictionary 为类型 EntityDictionary"""
+        self.dictionary = dictionary
+        n_genres = len(dictionary)
+        self._ids_by_lower = {name.lower(): i for i, name in enumerate(dictionary.names)}
+
+        self.matrix = np.zeros((len(genres), n_genres), dtype=bool)
+        self.matrix[genres.row_index(), genres.ids] = True
+
+        self.masks: Optional[np.ndarray] = None
+        if n_genres <= self.MAX_BITS:
+            self.dtype = np.uint32 if n_genres <= 32 else np.uint64
+            weights = np.left_shift(np.ones(n_genres, dtype=np.uint64),
+                                    np.arange(n_genres, dtype=np.uint64))
+            self.masks = (self.matrix.astype(np.uint64) @ weights).astype(self.dtype)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def genre_id(self, genre: str) -> int:
+        """类型名称对应的ID（名称不区分大小写）"""
+        genre_id = self.dictionary.id_of(genre)
+        if genre_id < 0:
+            genre_id = self._ids_by_lower.get(genre.lower(), -1)
+        if genre_id < 0:
+            raise ValueError(f"未知的电影类型: {genre}")
+        return genre_id
+
+    def bit(self, genre: str) -> int:
+        """类型名称对应的位（名称不区分大小写）"""
+        return 1 << self.genre_id(genre)
+
+    def bits(self, genres: Iterable[str]) -> int:
+        """多个类型的位之并"""
+        combined = 0
+        for genre in genres:
+            combined |= self.bit(genre)
+        return combined
+
+    def contains(self, genre: str) -> np.ndarray:
+        """包含指定类型的电影（布尔数组）"""
+        genre_id = self.dictionary.id_of(genre)
+        if genre_id < 0:
+            return self._none()
+        return self.matrix[:, genre_id]
+
+    def select(self, all_of: Iterable[str] = (), any_of: Iterable[str] = (),
+               none_of: Iterable[str] = ()) -> np.ndarray:
+        """按 全部包含 / 任一包含 / 都不包含 组合过滤，返回布尔数组"""
+        masks = self.masks
+        if masks is None:
+            return self._select_columns(all_of, any_of, none_of)
+        result = np.ones(len(masks), dtype=bool)
+
+        required = self.dtype(self.bits(all_of))
+        if required:
+            result &= (masks & required) == required
+
+        any_bits = self.dtype(self.bits(any_of))
+        if any_bits:
+            result &= (masks & any_bits) != 0
+
+        excluded = self.dtype(self.bits(none_of))
+        if excluded:
+            result &= (masks & excluded) == 0
+
+        return result
+
+    def _select_columns(self, all_of: Iterable[str], any_of: Iterable[str],
+                        none_of: Iterable[str]) -> np.ndarray:
+        """select 的布尔矩阵实现（无位图时）"""
+        result = np.ones(len(self.matrix), dtype=bool)
+        required = [self.genre_id(genre) for genre in all_of]
+        if required:
+            result &= self.matrix[:, required].all(axis=1)
+        any_ids = [self.genre_id(genre) for genre in any_of]
+        if any_ids:
+            result &= self.matrix[:, any_ids].any(axis=1)
+        excluded = [self.genre_id(genre) for genre in none_of]
+        if excluded:
+            result &= ~self.matrix[:, excluded].any(axis=1)
+        return result
+
+    def evaluate(self, predicate: str) -> np.ndarray:
+        """
+        计算类型谓词表达式，返回布尔数组
+
+        支持 AND / OR / NOT（不区分大小写）和括号，例如
+        "Action AND NOT Comedy"、"(Drama OR Romance) AND NOT \"Science Fiction\""。
+        含空格的类型名可直接书写或用双引号包裹。
+        """
+        tokens = self._tokenize(predicate)
+        if not tokens:
+            raise ValueError("类型谓词为空")
+        result, pos = self._parse_or(tokens, 0)
+        if pos != len(tokens):
+            raise ValueError(f"类型谓词语法错误: {predicate}")
+        return result
+
+    def counts(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """每个类型的电影数（可限定行）"""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return matrix.sum(axis=0)
+
+    def combo_counts(self, rows: Optional[np.ndarray] = None) -> list:
+        """
+        类型组合计数，按数量降序（数量相同按首次出现顺序）
+
+        返回 [(位图, 数量), ...]，无位图时位图为按布尔矩阵的行算出的Python整数
+        """
+        if self.masks is None:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            uniques, first, counts = np.unique(matrix, axis=0, return_index=True, return_counts=True)
+            order = np.lexsort((first, -counts))
+            return [(sum(1 << int(i) for i in np.flatnonzero(uniques[j])), int(counts[j]))
+                    for j in order]
+        masks = self.masks if rows is None else self.masks[rows]
+        uniques, first, counts = np.unique(masks, return_index=True, return_counts=True)
+        order = np.lexsort((first, -counts))
+        return [(int(uniques[i]), int(counts[i])) for i in order]
+
+    def combo_name(self, mask: int, empty: str = 'Unknown') -> str:
+        """位图 -> 按名称排序、逗号分隔的类型组合名"""
+        names = [self.dictionary.name_of(i) for i in range(len(self.dictionary))
+                 if mask >> i & 1]
+        return ', '.join(sorted(names)) if names else empty
+
+    # ---------- 谓词解析 ----------
+
+    def _none(self) -> np.ndarray:
+        return np.zeros(len(self.matrix), dtype=bool)
+
+    def _tokenize(self, predicate: str) -> list:
+        """合并连续的普通单词为一个类型名"""
+        tokens = []
+        words = []
+        for token in self._TOKEN.findall(predicate):
+            if token.upper() in self._KEYWORDS or token in '()':
+                if words:
+                    tokens.append(('NAME', ' '.join(words)))
+                    words = []
+                tokens.append((token.upper(), token))
+            elif token.startswith('"'):
+                if words:
+                    tokens.append(('NAME', ' '.join(words)))
+                    words = []
+                tokens.append(('NAME', token[1:-1]))
+            else:
+                words.append(token)
+        if words:
+            tokens.append(('NAME', ' '.join(words)))
+        return tokens
+
+    def _parse_or(self, tokens: list, pos: int):
+        result, pos = self._parse_and(tokens, pos)
+        while pos < len(tokens) and tokens[pos][0] == 'OR':
+            right, pos = self._parse_and(tokens, pos + 1)
+            result = result | right
+        return result, pos
+
+    def _parse_and(self, tokens: list, pos: int):
+        result, pos = self._parse_not(tokens, pos)
+        while pos < len(tokens) and tokens[pos][0] == 'AND':
+            right, pos = self._parse_not(tokens, pos + 1)
+            result = result & right
+        return result, pos
+
+    def _parse_not(self, tokens: list, pos: int):
+        if pos >= len(tokens):
+            raise ValueError("类型谓词不完整")
+        kind, value = tokens[pos]
+        if kind == 'NOT':
+            operand, pos = self._parse_not(tokens, pos + 1)
+            return ~operand, pos
+        if kind == '(':
+            result, pos = self._parse_or(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos][0] != ')':
+                raise ValueError("类型谓词括号不匹配")
+            return result, pos + 1
+        if kind == 'NAME':
+            if self.masks is None:
+                return self.matrix[:, self.genre_id(value)].copy(), pos + 1
+            bit = self.dtype(self.bit(value))
+            return (self.masks & bit) != 0, pos + 1
+        raise ValueError(f"类型谓词语法错误: 意外的 {value}")
+
+
+class SortedIndex:
+    """
+    数值列排序索引
+
+    保存非缺失值的升序排列及对应行号，闭区间 [low, high] 查询为两次二分查找，
+    只访问落在区间内的行。
+    """
+
+    def __init__(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        rows = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[rows], kind='stable')
+        self.rows = rows[order]
+        self.values = values[self.rows]
+        self.n_rows = len(values)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def range_rows(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """值在 [low, high] 内的行号（按值升序），None 表示不限"""
+        start = 0 if low is None else int(np.searchsorted(self.values, low, side='left'))
+        stop = len(self.values) if high is None else int(np.searchsorted(self.values, high, side='right'))
+        return self.rows[start:max(start, stop)]
+
+    def range_mask(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """值在 [low, high] 内的电影（布尔数组）"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.range_rows(low, high)] = True
+        return mask
+
+
+class PostingIndex:
+    """
+    列表列倒排索引
+
+    实体数量不受位图宽度限制（国家、语言等）：每个实体一个升序行号数组，
+    由CSR列表列按实体ID稳定排序得到。"包含任一实体" 的过滤只访问这些实体的行。
+    """
+
+    def __init__(self, list_column, dictionary, domain: str):
+        """list_column 为 ListColumn，dictionary 为对应的 EntityDictionary，domain 用于错误信息"""
+        self.dictionary = dictionary
+        self.domain = domain
+        self.n_rows = len(list_column)
+        ids = np.asarray(list_column.ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self.rows = list_column.row_index()[order]
+        self.offsets = np.zeros(len(dictionary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=len(dictionary)), out=self.offsets[1:])
+        self._ids_by_lower = {name.lower(): i for i, name in enumerate(dictionary.names)}
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def entity_id(self, name: str) -> int:
+        """名称对应的实体ID（不区分大小写）"""
+        entity_id = self.dictionary.id_of(name)
+        if entity_id < 0:
+            entity_id = self._ids_by_lower.get(name.lower(), -1)
+        if entity_id < 0:
+            raise ValueError(f"未知的{self.domain}: {name}")
+        return entity_id
+
+    def entity_rows(self, name: str) -> np.ndarray:
+        """包含该实体的行号（升序）"""
+        entity_id = self.entity_id(name)
+        return self.rows[self.offsets[entity_id]:self.offsets[entity_id + 1]]
+
+    def any_mask(self, names: Iterable[str]) -> np.ndarray:
+        """包含任一实体的电影（布尔数组）"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for name in names:
+            mask[self.entity_rows(name)] = True
+        return mask
+
+    def counts(self) -> np.ndarray:
+        """每个实体的电影数"""
+        return np.diff(self.offsets)
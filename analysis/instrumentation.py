@@ -0,0 +1,133 @@
+"""
+性能埋点模块
+记录一次请求中各阶段（数据加载 / 计算 / 序列化等）的耗时，以及分析方法的调用耗时
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+# 常用阶段名
+STAGE_QUEUE = 'queue'
+STAGE_LOAD = 'load'
+STAGE_COMPUTE = 'compute'
+STAGE_INFERENCE = 'inference'
+STAGE_SERIALIZE = 'serialize'
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('trace', default=None)
+_method_observers: list = []
+
+
+class Trace:
+    """
+    一次请求的阶段耗时
+
+    阶段可以嵌套，每段时间只计入最内层的阶段（例如计算中读取数据，读取的时间计入
+    load 而不计入 compute），因此各阶段之和不超过请求的总耗时。同一条 trace 可以
+    先后在事件循环线程和计算线程中激活，每个线程各有一个阶段栈。
+    """
+
+    def __init__(self):
+        self.stages: dict = {}
+        self._stacks: dict = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        """直接累加一段耗时（例如在线程池中排队的时间）"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def enter(self, stage: str):
+        now = time.perf_counter()
+        ident = threading.get_ident()
+        with self._lock:
+            stack = self._stacks.setdefault(ident, [])
+            if stack:
+                # 暂停外层阶段
+                outer = stack[-1]
+                self.stages[outer[0]] = self.stages.get(outer[0], 0.0) + now - outer[1]
+            stack.append([stage, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        ident = threading.get_ident()
+        with self._lock:
+            stack = self._stacks[ident]
+            stage, resumed = stack.pop()
+            self.stages[stage] = self.stages.get(stage, 0.0) + now - resumed
+            if stack:
+                stack[-1][1] = now
+            else:
+                del self._stacks[ident]
+
+    def active_threads(self) -> dict:
+        """正在为这条 trace 执行阶段的线程: {线程ID: 最内层阶段}"""
+        with self._lock:
+            return {ident: stack[-1][0] for ident, stack in self._stacks.items()}
+
+
+def current_trace() -> Optional[Trace]:
+    """当前上下文中的 trace（没有时为None）"""
+    return _current_trace.get()
+
+
+@contextmanager
+def use_trace(trace: Trace):
+    """在当前上下文（线程或协程任务）中设置 trace"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """把代码块的耗时计入当前 trace 的某个阶段，没有 trace 时不做任何事"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    trace.enter(stage)
+    try:
+        yield
+    finally:
+        trace.exit()
+
+
+def traced(trace: Trace, stage: str, func: Callable) -> Callable:
+    """
+    包装要交给线程池执行的 func
+
+    从包装到开始执行的时间计入 queue 阶段；执行时在工作线程中激活 trace，
+    func 本身的耗时计入 stage。
+    """
+    submitted = time.perf_counter()
+
+    def run(*args):
+        trace.add(STAGE_QUEUE, time.perf_counter() - submitted)
+        with use_trace(trace), span(stage):
+            return func(*args)
+
+    return run
+
+
+# ==================== 分析方法耗时 ====================
+
+def add_method_observer(callback: Callable):
+    """注册方法耗时回调 callback(方法名, 耗时秒数, 缓存情况 hit / miss / off)"""
+    _method_observers.append(callback)
+
+
+def remove_method_observer(callback: Callable):
+    """注销方法耗时回调"""
+    if callback in _method_observers:
+        _method_observers.remove(callback)
+
+
+def observe_method(name: str, seconds: float, cache: str):
+    for callback in list(_method_observers):
+        callback(name, seconds, cache)
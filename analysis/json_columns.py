@@ -0,0 +1,150 @@
+"""
+JSON列批量解析模块
+按列提取TMDB JSON字段中需要的值，不构造完整的字典对象
+"""
+
+import ast
+import json
+import re
+from typing import Iterable, Optional
+
+import pandas as pd
+
+
+# JSON字符串值（含转义，展开循环写法以减少回溯）与整数值的正则片段
+_STRING_VALUE = r'"([^"\\]*(?:\\.[^"\\]*)*)"'
+_INT_VALUE = r'(-?\d+)'
+
+
+def _decode_string(value: str) -> str:
+    """还原JSON字符串转义（仅在包含反斜杠时才调用json）"""
+    if '\\' not in value:
+        return value
+    try:
+        return json.loads(f'"{value}"')
+    except json.JSONDecodeError:
+        return value
+
+
+class JsonColumnParser:
+    """
+    JSON列批量解析器
+
+    fields 为需要提取的字段及类型，按其在源数据对象中出现的相邻顺序给出，
+    例如 (('job', str), ('name', str))。TMDB数据中对象的键按字母序排列，
+    因此相邻字段可以用一个正则一次性匹配。
+
+    快速路径：对每行执行一次 findall，并以对象数量校验匹配是否完整；
+    校验失败的行退回到 json.loads / ast.literal_eval 的逐行解析，
+    两者都失败的行记为格式错误并返回空列表。
+    """
+
+    def __init__(self, fields: tuple):
+        self.fields = tuple(fields)
+        self._names = tuple(name for name, _ in self.fields)
+        self._types = tuple(t for _, t in self.fields)
+        pattern = r',\s*'.join(
+            f'"{re.escape(name)}":\\s*' + (_STRING_VALUE if t is str else _INT_VALUE)
+            for name, t in self.fields
+        )
+        self._pattern = re.compile(pattern)
+        self._single = len(self.fields) == 1
+        self._all_strings = all(t is str for t in self._types)
+        self._convert_match = self._build_converter()
+        self.stats: dict = {}
+
+    def parse(self, values: Iterable) -> list:
+        """
+        解析整列，返回每行的提取结果列表
+
+        单字段时每行为值列表，多字段时每行为元组列表。
+        解析统计写入 self.stats。
+        """
+        stats = {'rows': 0, 'empty': 0, 'fast': 0, 'fallback': 0, 'malformed': 0}
+        findall = self._pattern.findall
+        convert = self._convert_match
+        result = []
+
+        for value in values:
+            stats['rows'] += 1
+            if not isinstance(value, str):
+                if isinstance(value, list):
+                    result.append(self._from_objects(value))
+                    stats['fallback'] += 1
+                else:
+                    result.append([])
+                    stats['empty'] += 1
+                continue
+
+            text = value.strip()
+            if text in ('', '[]'):
+                result.append([])
+                stats['empty'] += 1
+                continue
+
+            matches = findall(text)
+            if text[0] == '[' and text[-1] == ']' and len(matches) == text.count('{'):
+                # 不含转义的纯字符串字段可直接使用 findall 的结果
+                if self._all_strings and '\\' not in text:
+                    result.append(matches)
+                else:
+                    result.append([convert(m) for m in matches])
+                stats['fast'] += 1
+                continue
+
+            objects = self._parse_slow(text)
+            if objects is None:
+                result.append([])
+                stats['malformed'] += 1
+            else:
+                result.append(self._from_objects(objects))
+                stats['fallback'] += 1
+
+        self.stats = stats
+        return result
+
+    def parse_series(self, series: pd.Series) -> pd.Series:
+        """解析Series，保持索引不变"""
+        return pd.Series(self.parse(series.tolist()), index=series.index, dtype=object)
+
+    def _build_converter(self):
+        """按字段类型生成单个匹配结果的转换函数"""
+        converters = tuple(_decode_string if t is str else int for t in self._types)
+        if self._single:
+            return converters[0]
+        if len(converters) == 2:
+            first, second = converters
+            return lambda m: (first(m[0]), second(m[1]))
+        return lambda m: tuple(c(v) for c, v in zip(converters, m))
+
+    def _from_objects(self, objects: list) -> list:
+        """从已解析的字典列表中提取字段"""
+        items = []
+        for obj in objects:
+            if not isinstance(obj, dict):
+                continue
+            if self._single:
+                items.append(obj.get(self._names[0]))
+            else:
+                items.append(tuple(obj.get(name) for name in self._names))
+        return items
+
+    @staticmethod
+    def _parse_slow(text: str) -> Optional[list]:
+        """逐行慢速解析：标准JSON优先，其次Python字面量"""
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                parsed = ast.literal_eval(text)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                return None
+        return parsed if isinstance(parsed, list) else None
+
+
+# TMDB各JSON列需要提取的字段
+NAME_PARSER_FIELDS = (('name', str),)
+COUNTRY_PARSER_FIELDS = (('iso_3166_1', str),)
+LANGUAGE_PARSER_FIELDS = (('iso_639_1', str),)
+CAST_PARSER_FIELDS = (('name', str), ('order', int))
+CREW_PARSER_FIELDS = (('job', str), ('name', str))
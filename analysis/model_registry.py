@@ -0,0 +1,207 @@
+"""
+模型注册表模块
+把训练好的预测模型按版本持久化到磁盘，支持快速加载和版本固定
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import joblib
+import sklearn
+
+
+# 注册表文件格式版本，格式变化时递增
+REGISTRY_FORMAT = 1
+
+# 固定版本的指针文件
+PIN_FILE = 'PINNED'
+
+# 通过环境变量固定版本（优先于指针文件）
+PIN_ENV = 'MODEL_VERSION'
+
+# 大于该大小的模型文件以内存映射方式加载（小文件逐个映射数组反而更慢）
+MMAP_MIN_BYTES = 16 * 1024 * 1024
+
+_VERSION_PATTERN = re.compile(r'^v\d{4,}$')
+
+
+def _slug(name: str) -> str:
+    """模型名 -> 文件名"""
+    return re.sub(r'[^0-9a-z]+', '_', name.lower()).strip('_')
+
+
+class ModelRegistry:
+    """
+    版本化的模型注册表
+
+    每个版本一个目录（v0001、v0002 ...）：
+    - models/<模型>.joblib  每个模型单独保存（不压缩），大文件加载时数组以内存映射方式打开，
+                            多个进程可共享同一份页缓存
+    - preprocess.joblib     标准化器和类型编码器
+    - metadata.json         特征列表、数据版本、评估指标等，最后写入，作为版本完整的标记
+
+    对外服务的版本依次取：显式指定 > 环境变量 MODEL_VERSION > PINNED 指针文件 > 最新版本。
+    """
+
+    def __init__(self, registry_dir, keep: int = 10):
+        self.registry_dir = Path(registry_dir)
+        self.keep = keep
+
+    # ==================== 版本信息 ====================
+
+    def versions(self) -> list:
+        """所有完整的版本号（从旧到新）"""
+        if not self.registry_dir.exists():
+            return []
+        found = [p.name for p in self.registry_dir.iterdir()
+                 if p.is_dir() and _VERSION_PATTERN.match(p.name)
+                 and (p / 'metadata.json').exists()]
+        return sorted(found, key=lambda v: int(v[1:]))
+
+    def metadata(self, version: str) -> Optional[dict]:
+        """版本元数据，不存在或无法读取时返回None"""
+        try:
+            with open(self.registry_dir / version / 'metadata.json', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if metadata.get('format') != REGISTRY_FORMAT:
+            return None
+        return metadata
+
+    def list_versions(self) -> list:
+        """所有版本的元数据（新版本在前），标记固定版本"""
+        pinned = self.pinned_version()
+        result = []
+        for version in reversed(self.versions()):
+            metadata = self.metadata(version)
+            if metadata is not None:
+                result.append({**metadata, 'pinned': version == pinned})
+        return result
+
+    def latest_version(self) -> Optional[str]:
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def pinned_version(self) -> Optional[str]:
+        """固定的版本（环境变量优先），未固定时返回None"""
+        version = os.environ.get(PIN_ENV, '').strip()
+        if version:
+            return version
+        try:
+            version = (self.registry_dir / PIN_FILE).read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+        return version or None
+
+    def resolve(self, version: Optional[str] = None) -> Optional[str]:
+        """确定要加载的版本"""
+        return version or self.pinned_version() or self.latest_version()
+
+    def pin(self, version: str):
+        """固定对外服务的版本"""
+        if self.metadata(version) is None:
+            raise ValueError(f"模型版本不存在: {version}")
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.registry_dir / f'.{PIN_FILE}-{uuid.uuid4().hex}'
+        tmp.write_text(version, encoding='utf-8')
+        tmp.replace(self.registry_dir / PIN_FILE)
+
+    def unpin(self):
+        """取消固定，恢复使用最新版本"""
+        (self.registry_dir / PIN_FILE).unlink(missing_ok=True)
+
+    # ==================== 保存与加载 ====================
+
+    def save(self, state: dict) -> str:
+        """保存一份训练产物，返回新版本号"""
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        latest = self.latest_version()
+        version = f'v{(int(latest[1:]) if latest else 0) + 1:04d}'
+
+        # 先写入临时目录，完成后整体改名，避免读到写了一半的版本
+        tmp = self.registry_dir / f'.tmp-{uuid.uuid4().hex}'
+        (tmp / 'models').mkdir(parents=True)
+        try:
+            model_files = {}
+            for name, model in state['models'].items():
+                filename = f'models/{_slug(name)}.joblib'
+                joblib.dump(model, tmp / filename)
+                model_files[name] = filename
+            joblib.dump({'scaler': state['scaler'], 'mlb': state['mlb']},
+                        tmp / 'preprocess.joblib')
+
+            metadata = {
+                'format': REGISTRY_FORMAT,
+                'version': version,
+                'created_at': time.time(),
+                'trained_at': state.get('trained_at'),
+                'data_version': state.get('data_version'),
+                'feature_names': list(state['feature_names']),
+                'best_model': state['best_model'],
+                'evaluation_results': state['evaluation_results'],
+                'model_params': state.get('model_params', {}),
+                'model_files': model_files,
+                'sklearn_version': sklearn.__version__,
+            }
+            with open(tmp / 'metadata.json', 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            tmp.rename(self.registry_dir / version)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        self._prune()
+        return version
+
+    def load(self, version: Optional[str] = None, mmap: bool = True) -> Optional[dict]:
+        """
+        加载训练产物，返回与 BoxOfficePredictor.install 兼容的字典
+
+        未指定版本时按固定规则选择；版本不存在、格式不兼容或 scikit-learn
+        版本不一致时返回None。
+        """
+        version = self.resolve(version)
+        if version is None:
+            return None
+        metadata = self.metadata(version)
+        if metadata is None or metadata.get('sklearn_version') != sklearn.__version__:
+            return None
+
+        entry = self.registry_dir / version
+        try:
+            models = {}
+            for name, filename in metadata['model_files'].items():
+                path = entry / filename
+                use_mmap = mmap and path.stat().st_size >= MMAP_MIN_BYTES
+                models[name] = joblib.load(path, mmap_mode='r' if use_mmap else None)
+            preprocess = joblib.load(entry / 'preprocess.joblib')
+        except (OSError, ValueError, EOFError, KeyError):
+            return None
+
+        return {
+            'models': models,
+            'scaler': preprocess['scaler'],
+            'mlb': preprocess['mlb'],
+            'feature_names': metadata['feature_names'],
+            'evaluation_results': metadata['evaluation_results'],
+            'best_model': metadata['best_model'],
+            'model_params': metadata.get('model_params', {}),
+            'trained_at': metadata['trained_at'],
+            'data_version': metadata['data_version'],
+            'version': version,
+        }
+
+    def _prune(self):
+        """只保留最近 keep 个版本（固定的版本不删除）"""
+        pinned = self.pinned_version()
+        versions = self.versions()
+        for version in versions[:max(0, len(versions) - self.keep)]:
+            if version != pinned:
+                shutil.rmtree(self.registry_dir / version, ignore_errors=True)
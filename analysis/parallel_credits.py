@@ -0,0 +1,187 @@
+"""
+演职人员并行解析模块
+把 credits 的 cast / crew 列按行分片交给工作进程解析，解析结果以整数ID写入共享内存
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from .json_columns import JsonColumnParser, CAST_PARSER_FIELDS, CREW_PARSER_FIELDS
+
+
+# 每部电影保留的主演人数
+TOP_ACTORS = 3
+
+# 行数少于该值时不值得启动工作进程，直接在当前进程中解析
+PARALLEL_MIN_ROWS = 20000
+
+# 每个工作进程分到的分片数（分片更小，各进程的负载更均衡）和每个分片的最少行数
+SHARDS_PER_WORKER = 4
+MIN_SHARD_ROWS = 5000
+
+
+def extract_director(crew_list):
+    """从剧组 (job, name) 列表中提取导演"""
+    for job, name in crew_list:
+        if job == 'Director':
+            return name
+    return None
+
+
+def _result_arrays(buffer, n_rows: int) -> tuple:
+    """
+    共享内存中的结果数组（均为 int32，名称ID为分片内的局部ID，-1 表示None）
+
+    - director  (n_rows,)              导演
+    - lengths   (n_rows,)              主演人数
+    - top       (n_rows, TOP_ACTORS)   主演
+    """
+    director = np.ndarray((n_rows,), dtype=np.int32, buffer=buffer)
+    lengths = np.ndarray((n_rows,), dtype=np.int32, buffer=buffer, offset=4 * n_rows)
+    top = np.ndarray((n_rows, TOP_ACTORS), dtype=np.int32, buffer=buffer, offset=8 * n_rows)
+    return director, lengths, top
+
+
+def _buffer_size(n_rows: int) -> int:
+    return max(1, 4 * (2 + TOP_ACTORS) * n_rows)
+
+
+def _parse_into(buffer, n_rows: int, start: int, cast: list, crew: list) -> tuple:
+    """
+    解析一个分片，结果写入 buffer 中结果数组的 [start, start + len(cast)) 行
+
+    返回 (分片内的名称表, cast解析统计, crew解析统计)，名称表只包含分片中
+    出现过的导演和主演，每个名称一份。
+    """
+    cast_parser = JsonColumnParser(CAST_PARSER_FIELDS)
+    crew_parser = JsonColumnParser(CREW_PARSER_FIELDS)
+    ids: dict = {}
+
+    def id_of(name) -> int:
+        if name is None:
+            return -1
+        entity_id = ids.get(name)
+        if entity_id is None:
+            entity_id = ids[name] = len(ids)
+        return entity_id
+
+    director, lengths, top = _result_arrays(buffer, n_rows)
+    for i, members in enumerate(crew_parser.parse(crew), start):
+        director[i] = id_of(extract_director(members))
+    for i, members in enumerate(cast_parser.parse(cast), start):
+        row = [id_of(name) for name, _ in members[:TOP_ACTORS]]
+        lengths[i] = len(row)
+        top[i, :len(row)] = row
+    return list(ids), cast_parser.stats, crew_parser.stats
+
+
+def _parse_shard(shm_name: str, n_rows: int, start: int, cast: list, crew: list) -> tuple:
+    """工作进程入口：解析一个分片写入共享内存，返回 (start, 名称表, cast统计, crew统计)"""
+    # spawn 启动的工作进程与主进程共用资源跟踪器，共享内存只由主进程 unlink
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return (start, *_parse_into(shm.buf, n_rows, start, cast, crew))
+    finally:
+        shm.close()
+
+
+def _merge_stats(total: Optional[dict], stats: dict) -> dict:
+    return dict(stats) if total is None else {k: total[k] + stats[k] for k in total}
+
+
+class ParallelCreditsParser:
+    """
+    多进程演职人员解析器
+
+    parse 把行切成连续的分片提交到进程池（spawn），每个工作进程只返回紧凑的结果：
+    导演和前 TOP_ACTORS 位主演写入主进程分配的共享内存（分片内的局部整数ID），
+    连同分片的名称表一起返回，不传输解析出的元组列表。主进程按分片顺序还原名称，
+    结果与单进程逐行解析完全相同，与分片完成的先后无关。
+    进程池在第一次并行解析时创建，可跨多次 parse 复用（如分块加载的各块），用完后 close。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'ParallelCreditsParser':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def parse(self, cast: list, crew: list) -> dict:
+        """
+        解析 cast / crew 两列（两者行数相同）
+
+        返回 {'director': 每行导演名, 'top_actors': 每行主演名列表,
+              'stats': {'cast': 解析统计, 'crew': 解析统计}}
+        """
+        n_rows = len(cast)
+        if self.workers <= 1 or n_rows < PARALLEL_MIN_ROWS:
+            buffer = bytearray(_buffer_size(n_rows))
+            names, cast_stats, crew_stats = _parse_into(buffer, n_rows, 0, cast, crew)
+            result = self._decode([(0, n_rows, names)], *_result_arrays(buffer, n_rows))
+            result['stats'] = {'cast': cast_stats, 'crew': crew_stats}
+            return result
+
+        n_shards = min(self.workers * SHARDS_PER_WORKER, -(-n_rows // MIN_SHARD_ROWS))
+        bounds = np.linspace(0, n_rows, n_shards + 1).astype(np.int64).tolist()
+        shards = list(zip(bounds[:-1], bounds[1:]))
+        shm = shared_memory.SharedMemory(create=True, size=_buffer_size(n_rows))
+        try:
+            pool = self._executor()
+            futures = [pool.submit(_parse_shard, shm.name, n_rows, start,
+                                   cast[start:stop], crew[start:stop])
+                       for start, stop in shards]
+            names = {}
+            cast_stats = crew_stats = None
+            try:
+                for future in as_completed(futures):
+                    start, shard_names, shard_cast, shard_crew = future.result()
+                    names[start] = shard_names
+                    cast_stats = _merge_stats(cast_stats, shard_cast)
+                    crew_stats = _merge_stats(crew_stats, shard_crew)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+            # 按分片顺序还原名称，结果与完成顺序无关
+            arrays = _result_arrays(shm.buf, n_rows)
+            result = self._decode([(start, stop, names[start]) for start, stop in shards],
+                                  *arrays)
+            del arrays
+        finally:
+            shm.close()
+            shm.unlink()
+        result['stats'] = {'cast': cast_stats, 'crew': crew_stats}
+        return result
+
+    @staticmethod
+    def _decode(shards: list, director: np.ndarray, lengths: np.ndarray,
+                top: np.ndarray) -> dict:
+        """局部ID -> 名称（名称表末尾追加None，ID -1 正好取到它）"""
+        directors = []
+        top_actors = []
+        for start, stop, names in shards:
+            table = np.array(names + [None], dtype=object)
+            directors.extend(table[director[start:stop]].tolist())
+            rows = table[top[start:stop]].tolist()
+            top_actors.extend(row[:k] for row, k in zip(rows, lengths[start:stop].tolist()))
+        return {'director': directors, 'top_actors': top_actors}
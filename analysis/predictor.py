@@ -3,34 +3,223 @@
 使用机器学习算法进行票房预测
 """
 
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
+import math
+import os
+import threading
+import time
 import warnings
 
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression, Ridge
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, KFold
 from sklearn.preprocessing import StandardScaler, MultiLabelBinarizer
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
 from .data_loader import DataLoader
+from .feature_layout import FeatureLayout, compile_scorer
+from .feature_matrix import FeatureMatrix
+from .model_registry import ModelRegistry
+from .training_scheduler import TrainingScheduler
 
 warnings.filterwarnings('ignore')
 
 
+# 数值特征（预测输入缺失时取0）
+NUMERIC_FEATURES = ('budget', 'popularity', 'runtime', 'vote_average',
+                    'vote_count', 'release_year', 'release_month')
+
+# 取对数变换的数值特征（派生列名为 <特征>_log）
+LOG_FEATURES = ('budget', 'popularity', 'vote_count')
+
+# 特征定义版本，修改特征列或编码方式时递增（特征矩阵缓存随之失效）
+FEATURE_SPEC_VERSION = 1
+
+# 参与比较的模型（按训练顺序）
+MODEL_NAMES = ('Linear Regression', 'Ridge Regression', 'Random Forest', 'Gradient Boosting')
+
+# 交叉验证折数
+CV_FOLDS = 5
+
+
+class ModelNotTrainedError(RuntimeError):
+    """模型尚未训练完成"""
+
+
+def make_models(random_state: int = 42, model_params: Optional[dict] = None) -> dict:
+    """
+    创建待训练的模型
+    
+    model_params 为 {模型名: {参数: 值}}，覆盖默认超参数（如超参数搜索的结果）。
+    """
+    models = {
+        'Linear Regression': LinearRegression(),
+        'Ridge Regression': Ridge(alpha=1.0),
+        'Random Forest': RandomForestRegressor(
+            n_estimators=100, max_depth=15, 
+            min_samples_split=5, random_state=random_state, n_jobs=-1
+        ),
+        'Gradient Boosting': GradientBoostingRegressor(
+            n_estimators=100, max_depth=5,
+            learning_rate=0.1, random_state=random_state
+        )
+    }
+    for name, params in (model_params or {}).items():
+        if name not in models:
+            raise ValueError(f"未知的模型: {name}")
+        models[name].set_params(**params)
+    return models
+
+
+def fit_models(X: pd.DataFrame, y: pd.Series, mlb: Optional[MultiLabelBinarizer],
+               test_size: float = 0.2, random_state: int = 42,
+               progress: Optional[Callable[[dict], None]] = None,
+               core_budget: Optional[int] = None,
+               model_params: Optional[dict] = None) -> Tuple[dict, dict]:
+    """
+    训练并评估所有模型
+    
+    不依赖预测器实例，可以在工作进程中执行。各模型的完整训练和每折交叉验证
+    由 TrainingScheduler 按核心预算（默认环境变量 TRAIN_CORE_BUDGET 或全部CPU）并行执行，
+    所有模型共用同一组折划分。progress 在模型开始、完整训练结束、每折完成和模型
+    全部完成时收到一个事件字典（并行时事件按完成顺序到达）。
+    model_params 覆盖默认超参数（见 make_models）。
+    返回 (训练产物, 训练结果)，训练产物交给 BoxOfficePredictor.install 启用。
+    """
+    notify = progress or (lambda event: None)
+    total_start = time.perf_counter()
+    
+    # 分割数据
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    
+    # 标准化（特征以 float32 缓存和传输，标准化与拟合在 float64 下进行）
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train.to_numpy(dtype=np.float64))
+    X_test_scaled = scaler.transform(X_test.to_numpy(dtype=np.float64))
+    
+    # 对数变换目标变量（票房分布是偏态的）
+    y_train_log = np.log1p(y_train).to_numpy()
+    y_test_log = np.log1p(y_test)
+    
+    # 交叉验证折划分（与 cross_val_score(cv=5) 相同），所有模型共用
+    folds = list(KFold(n_splits=CV_FOLDS).split(X_train_scaled))
+    prepare_seconds = time.perf_counter() - total_start
+    
+    models = make_models(random_state, model_params)
+    fitted = {}
+    fold_scores = {name: [None] * CV_FOLDS for name in models}
+    results = {}
+    timings = {name: {'fit_seconds': 0.0, 'cv_seconds': 0.0} for name in models}
+    
+    def evaluate(name: str) -> dict:
+        """模型的测试集指标和交叉验证统计"""
+        y_pred_log = fitted[name].predict(X_test_scaled)
+        y_pred = np.expm1(y_pred_log)  # 还原
+        
+        # 评估指标
+        mse = mean_squared_error(y_test, y_pred)
+        cv_scores = np.array(fold_scores[name])
+        return {
+            'rmse': float(np.sqrt(mse)),
+            'mae': float(mean_absolute_error(y_test, y_pred)),
+            'r2': float(r2_score(y_test, y_pred)),
+            # 对数空间的R2（更适合偏态分布）
+            'r2_log': float(r2_score(y_test_log, y_pred_log)),
+            'cv_r2_mean': float(cv_scores.mean()),
+            'cv_r2_std': float(cv_scores.std())
+        }
+    
+    def on_result(kind: str, name: str, fold: Optional[int], result, seconds: float):
+        if kind == 'fit':
+            fitted[name] = result
+            timings[name]['fit_seconds'] = seconds
+            notify({'event': 'model_fitted', 'model': name})
+        else:
+            fold_scores[name][fold] = result
+            timings[name]['cv_seconds'] += seconds
+            notify({'event': 'fold_finished', 'model': name, 'fold': fold + 1,
+                    'folds': CV_FOLDS, 'r2': result})
+        if name in fitted and None not in fold_scores[name]:
+            results[name] = evaluate(name)
+            notify({'event': 'model_finished', 'model': name, 'metrics': results[name]})
+    
+    for name in models:
+        notify({'event': 'model_started', 'model': name})
+    schedule = TrainingScheduler(core_budget).run(
+        models, X_train_scaled, y_train_log, folds, on_result
+    )
+    
+    # 按固定顺序整理结果，选出最佳模型
+    results = {name: results[name] for name in models}
+    best_model_name = max(results, key=lambda x: results[x]['r2_log'])
+    
+    state = {
+        'models': {name: fitted[name] for name in models},
+        'scaler': scaler,
+        'mlb': mlb,
+        'feature_names': list(X.columns),
+        'evaluation_results': results,
+        'best_model': best_model_name,
+        'model_params': model_params or {},
+        'trained_at': time.time(),
+    }
+    summary = {
+        'model_comparison': results,
+        'best_model': best_model_name,
+        'feature_count': X.shape[1],
+        'training_samples': len(X_train),
+        'test_samples': len(X_test),
+        'timings': {
+            'prepare_seconds': prepare_seconds,
+            'train_seconds': schedule['seconds'],
+            'total_seconds': time.perf_counter() - total_start,
+            'workers': schedule['workers'],
+            'core_budget': schedule['core_budget'],
+            'models': timings
+        }
+    }
+    return state, summary
+
+
 class BoxOfficePredictor:
-    """票房预测器"""
+    """
+    票房预测器
+    
+    训练产物（模型、标准化器、类型编码器等）保存在一个字典中，
+    新模型训练完成后通过 install 整体替换，预测期间始终使用同一份产物。
+    训练产物可以保存到模型注册表（默认 data/models，或环境变量 MODEL_REGISTRY_DIR），
+    启动时直接加载而不必重新训练。
+    """
     
-    def __init__(self, data_loader: Optional[DataLoader] = None):
+    def __init__(self, data_loader: Optional[DataLoader] = None,
+                 registry: Optional[ModelRegistry] = None):
         self.loader = data_loader or DataLoader()
+        self.registry = registry or ModelRegistry(
+            os.environ.get('MODEL_REGISTRY_DIR') or self.loader.data_dir.parent / 'models'
+        )
         self._df: Optional[pd.DataFrame] = None
-        self._models: dict = {}
-        self._scaler: Optional[StandardScaler] = None
-        self._mlb: Optional[MultiLabelBinarizer] = None
-        self._feature_names: list = []
-        self._is_trained: bool = False
-        self._evaluation_results: dict = {}
+        self._state: Optional[dict] = None
+        self._features: Optional[FeatureMatrix] = None
+        self._lock = threading.Lock()
+        self._features_lock = threading.Lock()
+        self.loader.add_reload_listener(self._on_data_reload)
+        self.loader.add_change_listener(self._on_data_change)
+    
+    def _on_data_reload(self, version: str):
+        """数据重新加载后丢弃本地数据引用和特征矩阵（已训练的模型保留）"""
+        self._df = None
+        self._features = None
+    
+    def _on_data_change(self, change: dict):
+        """增量导入后只为变化的行计算特征"""
+        self._df = None
+        if len(change['rows']):
+            changed = self.loader.load_merged().iloc[change['rows']]
+            self.update_features(changed, change['version'], change['previous_version'])
     
     @property
     def df(self) -> pd.DataFrame:
@@ -39,139 +228,139 @@ class BoxOfficePredictor:
             self._df = self.loader.load_merged()
         return self._df
     
+    @property
+    def is_trained(self) -> bool:
+        """是否已有可用模型"""
+        return self._state is not None
+    
+    def _require_state(self) -> dict:
+        """当前训练产物，未训练时抛出 ModelNotTrainedError"""
+        state = self._state
+        if state is None:
+            raise ModelNotTrainedError("预测模型尚未训练，请先提交训练任务")
+        return state
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        """当前模型在注册表中的版本（未保存的模型为None）"""
+        state = self._state
+        return state.get('version') if state is not None else None
+    
+    @property
+    def model_data_version(self) -> Optional[str]:
+        """当前模型训练时的数据版本"""
+        state = self._state
+        return state.get('data_version') if state is not None else None
+    
+    def install(self, state: dict):
+        """
+        启用新的训练产物（原子替换，进行中的预测继续使用旧模型）
+        
+        启用前编译特征布局和各模型的单条预测函数。
+        """
+        state['layout'] = FeatureLayout.from_state(state, NUMERIC_FEATURES, LOG_FEATURES)
+        state['scorers'] = {name: compile_scorer(model) for name, model in state['models'].items()}
+        with self._lock:
+            self._state = state
+    
+    def save_to_registry(self, state: Optional[dict] = None) -> str:
+        """把训练产物（默认当前模型）保存为注册表的新版本，返回版本号"""
+        state = state or self._require_state()
+        version = self.registry.save(state)
+        state['version'] = version
+        return version
+    
+    def load_from_registry(self, version: Optional[str] = None) -> Optional[str]:
+        """
+        从注册表加载并启用模型，返回加载的版本号
+        
+        未指定版本时使用固定版本或最新版本；没有可用版本时返回None。
+        """
+        state = self.registry.load(version)
+        if state is None:
+            return None
+        self.install(state)
+        return state['version']
+    
     def prepare_features(self) -> Tuple[pd.DataFrame, pd.Series]:
         """准备特征矩阵和目标变量"""
-        df = self.df[self.df['has_financial_data']].copy()
-        
-        # 基础数值特征
-        numeric_features = ['budget', 'popularity', 'runtime', 'vote_average', 
-                           'vote_count', 'release_year', 'release_month']
-        
-        # 过滤可用特征
-        available_numeric = [f for f in numeric_features if f in df.columns]
-        
-        # 移除缺失值
-        df = df.dropna(subset=available_numeric + ['revenue'])
-        
-        # 创建特征DataFrame
-        X = df[available_numeric].copy()
-        
-        # 添加派生特征
-        X['budget_log'] = np.log1p(df['budget'])
-        X['popularity_log'] = np.log1p(df['popularity'])
-        X['vote_count_log'] = np.log1p(df['vote_count'])
-        
-        # 类型特征（One-Hot编码）
-        if 'genre_names' in df.columns:
-            self._mlb = MultiLabelBinarizer()
-            genre_encoded = self._mlb.fit_transform(df['genre_names'])
-            genre_df = pd.DataFrame(
-                genre_encoded,
-                columns=[f'genre_{g}' for g in self._mlb.classes_],
-                index=df.index
-            )
-            X = pd.concat([X, genre_df], axis=1)
-        
-        # 类型数量
-        X['genre_count'] = df['genre_names'].apply(lambda x: len(x) if isinstance(x, list) else 0)
-        
-        # 目标变量
-        y = df['revenue']
-        
-        self._feature_names = list(X.columns)
-        
+        X, y, _ = self.build_training_data()
         return X, y
     
-    def train_models(self, test_size: float = 0.2, random_state: int = 42) -> dict:
-        """训练多个预测模型并比较"""
-        X, y = self.prepare_features()
-        
-        # 分割数据
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state
-        )
-        
-        # 标准化
-        self._scaler = StandardScaler()
-        X_train_scaled = self._scaler.fit_transform(X_train)
-        X_test_scaled = self._scaler.transform(X_test)
+    def build_training_data(self) -> Tuple[pd.DataFrame, pd.Series, Optional[MultiLabelBinarizer]]:
+        """
+        准备特征矩阵、目标变量和拟合好的类型编码器
         
-        # 对数变换目标变量（票房分布是偏态的）
-        y_train_log = np.log1p(y_train)
-        y_test_log = np.log1p(y_test)
-        
-        # 定义模型
-        models = {
-            'Linear Regression': LinearRegression(),
-            'Ridge Regression': Ridge(alpha=1.0),
-            'Random Forest': RandomForestRegressor(
-                n_estimators=100, max_depth=15, 
-                min_samples_split=5, random_state=random_state, n_jobs=-1
-            ),
-            'Gradient Boosting': GradientBoostingRegressor(
-                n_estimators=100, max_depth=5,
-                learning_rate=0.1, random_state=random_state
-            )
-        }
-        
-        results = {}
-        
-        for name, model in models.items():
-            # 训练
-            model.fit(X_train_scaled, y_train_log)
-            
-            # 预测
-            y_pred_log = model.predict(X_test_scaled)
-            y_pred = np.expm1(y_pred_log)  # 还原
-            
-            # 评估指标
-            mse = mean_squared_error(y_test, y_pred)
-            rmse = np.sqrt(mse)
-            mae = mean_absolute_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
-            
-            # 对数空间的R2（更适合偏态分布）
-            r2_log = r2_score(y_test_log, y_pred_log)
-            
-            # 交叉验证
-            cv_scores = cross_val_score(model, X_train_scaled, y_train_log, cv=5, scoring='r2')
-            
-            results[name] = {
-                'rmse': float(rmse),
-                'mae': float(mae),
-                'r2': float(r2),
-                'r2_log': float(r2_log),
-                'cv_r2_mean': float(cv_scores.mean()),
-                'cv_r2_std': float(cv_scores.std())
-            }
-            
-            # 保存模型
-            self._models[name] = model
-        
-        self._is_trained = True
-        self._evaluation_results = results
-        
-        # 保存最佳模型
-        best_model_name = max(results, key=lambda x: results[x]['r2_log'])
-        self._best_model_name = best_model_name
-        
-        return {
-            'model_comparison': results,
-            'best_model': best_model_name,
-            'feature_count': len(self._feature_names),
-            'training_samples': len(X_train),
-            'test_samples': len(X_test)
-        }
+        特征DataFrame直接引用缓存的 float32 特征矩阵（见 feature_matrix）。
+        """
+        return self.feature_matrix().to_frame()
     
-    def get_feature_importance(self, model_name: str = 'Random Forest') -> list:
+    def feature_matrix(self) -> FeatureMatrix:
+        """
+        当前数据的训练特征矩阵
+        
+        以 数据版本 + 特征定义版本 为键缓存，版本不变时重复训练不再重新计算特征。
+        """
+        version = self.loader.data_version
+        with self._features_lock:
+            features = self._features
+            if (features is not None and features.data_version == version
+                    and features.spec_version == FEATURE_SPEC_VERSION):
+                return features
+        
+        # 在锁外取数据（数据加载器的锁内会回调 update_features）
+        df = self.df
+        with self._features_lock:
+            features = self._features
+            if (features is None or features.data_version != version
+                    or features.spec_version != FEATURE_SPEC_VERSION):
+                features = FeatureMatrix.build(df, NUMERIC_FEATURES, LOG_FEATURES,
+                                               data_version=version,
+                                               spec_version=FEATURE_SPEC_VERSION)
+                self._features = features
+            return features
+    
+    def update_features(self, changed: pd.DataFrame, data_version: str,
+                        previous_version: Optional[str] = None) -> bool:
+        """
+        增量更新特征矩阵
+        
+        changed 为合并数据中新增或变化的行（索引为行号），只计算这些行的特征。
+        还没有构建过特征矩阵，或缓存的矩阵不是 previous_version 的数据时丢弃
+        （下次训练时完整构建），返回是否已更新。
+        """
+        with self._features_lock:
+            features = self._features
+            if (features is None or features.spec_version != FEATURE_SPEC_VERSION
+                    or (previous_version is not None
+                        and features.data_version != previous_version)):
+                self._features = None
+                return False
+            self._features = features.update(changed, data_version=data_version)
+            return True
+    
+    def train_models(self, test_size: float = 0.2, random_state: int = 42,
+                     progress: Optional[Callable[[dict], None]] = None,
+                     core_budget: Optional[int] = None,
+                     model_params: Optional[dict] = None) -> dict:
+        """训练多个预测模型并比较，完成后启用新模型"""
+        X, y, mlb = self.build_training_data()
+        state, summary = fit_models(X, y, mlb, test_size=test_size, random_state=random_state,
+                                    progress=progress, core_budget=core_budget,
+                                    model_params=model_params)
+        state['data_version'] = self.loader.data_version
+        self.install(state)
+        return summary
+    
+    def get_feature_importance(self, model_name: str = 'Random Forest',
+                               state: Optional[dict] = None) -> list:
         """获取特征重要性"""
-        if not self._is_trained:
-            self.train_models()
+        state = state or self._require_state()
         
-        if model_name not in self._models:
+        if model_name not in state['models']:
             model_name = 'Random Forest'
         
-        model = self._models[model_name]
+        model = state['models'][model_name]
         
         # 获取特征重要性
         if hasattr(model, 'feature_importances_'):
@@ -183,62 +372,27 @@ class BoxOfficePredictor:
         
         # 创建特征重要性DataFrame
         feature_importance = pd.DataFrame({
-            'feature': self._feature_names,
+            'feature': state['feature_names'],
             'importance': importances
         }).sort_values('importance', ascending=False)
         
         return feature_importance.to_dict('records')
     
     def predict(self, movie_data: dict, model_name: str = None) -> dict:
-        """预测单部电影票房"""
-        if not self._is_trained:
-            self.train_models()
-        
-        if model_name is None:
-            model_name = self._best_model_name
-        
-        model = self._models[model_name]
-        
-        # 构建特征向量
-        features = {}
-        
-        # 数值特征
-        numeric_features = ['budget', 'popularity', 'runtime', 'vote_average', 
-                           'vote_count', 'release_year', 'release_month']
-        
-        for f in numeric_features:
-            features[f] = movie_data.get(f, 0)
-        
-        # 派生特征
-        features['budget_log'] = np.log1p(features.get('budget', 0))
-        features['popularity_log'] = np.log1p(features.get('popularity', 0))
-        features['vote_count_log'] = np.log1p(features.get('vote_count', 0))
-        
-        # 类型特征
-        genres = movie_data.get('genres', [])
-        features['genre_count'] = len(genres)
+        """
+        预测单部电影票房
         
-        if self._mlb is not None:
-            genre_encoded = self._mlb.transform([genres])
-            for i, g in enumerate(self._mlb.classes_):
-                features[f'genre_{g}'] = genre_encoded[0][i]
+        使用训练时编译的特征布局直接填充特征向量，并调用编译后的单条预测函数。
+        """
+        state = self._require_state()
         
-        # 创建特征DataFrame
-        X = pd.DataFrame([features])
-        
-        # 确保列顺序一致
-        for col in self._feature_names:
-            if col not in X.columns:
-                X[col] = 0
-        
-        X = X[self._feature_names]
+        if model_name is None:
+            model_name = state['best_model']
         
-        # 标准化
-        X_scaled = self._scaler.transform(X)
+        scorer = state['scorers'][model_name]
         
-        # 预测
-        y_pred_log = model.predict(X_scaled)
-        y_pred = np.expm1(y_pred_log)[0]
+        # 预测（模型输出为对数票房）
+        y_pred = math.expm1(scorer(state['layout'].row(movie_data)))
         
         # 计算ROI预测
         budget = movie_data.get('budget', 0)
@@ -253,29 +407,61 @@ class BoxOfficePredictor:
     
     def get_prediction_insights(self) -> dict:
         """获取预测模型洞察"""
-        if not self._is_trained:
-            self.train_models()
+        state = self._require_state()
         
         # 特征重要性
-        feature_importance = self.get_feature_importance()
+        feature_importance = self.get_feature_importance(state=state)
         
         # 模型对比
-        model_comparison = self._evaluation_results
+        model_comparison = state['evaluation_results']
         
         # 最佳预测变量
         top_features = feature_importance[:10] if feature_importance else []
         
         return {
             'model_comparison': model_comparison,
-            'best_model': self._best_model_name,
+            'best_model': state['best_model'],
+            'model_version': state.get('version'),
             'top_features': top_features,
             'all_features': feature_importance
         }
     
-    def batch_predict(self, movies_data: list, model_name: str = None) -> list:
-        """批量预测多部电影"""
-        results = []
-        for movie in movies_data:
-            pred = self.predict(movie, model_name)
-            results.append(pred)
-        return results
+    def batch_predict(self, movies_data: list, model_name: str = None,
+                      state: Optional[dict] = None) -> list:
+        """
+        批量预测多部电影
+        
+        一次构建整个特征矩阵，标准化和模型预测各调用一次。
+        结果与逐部调用 predict 一致（浮点误差内）；state 可传入 snapshot() 的结果，
+        保证分块预测时使用同一份模型。
+        """
+        state = state or self._require_state()
+        if model_name is None:
+            model_name = state['best_model']
+        model = state['models'][model_name]
+        
+        if not movies_data:
+            return []
+        
+        X_scaled = state['layout'].matrix(movies_data)
+        predicted_revenue = np.expm1(model.predict(X_scaled))
+        
+        # 计算ROI预测（预算为0时ROI为0）
+        budget = np.array([movie.get('budget', 0) for movie in movies_data], dtype=float)
+        predicted_roi = np.divide(predicted_revenue - budget, budget,
+                                  out=np.zeros_like(predicted_revenue), where=budget > 0) * 100
+        
+        return [
+            {
+                'predicted_revenue': revenue,
+                'predicted_roi': roi,
+                'model_used': model_name,
+                'input_features': movie
+            }
+            for revenue, roi, movie in zip(predicted_revenue.tolist(), predicted_roi.tolist(),
+                                           movies_data)
+        ]
+    
+    def snapshot(self) -> dict:
+        """当前训练产物（未训练时抛出 ModelNotTrainedError）"""
+        return self._require_state()
@@ -0,0 +1,259 @@
+"""
+切片查询模块
+按年份、预算、类型、国家和语言过滤电影，按维度分组计算统计指标，过滤全部走预先构建的索引
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import BUDGET_LABELS, VALUE_COLUMNS, budget_buckets
+from .indexes import GenreIndex, PostingIndex, SortedIndex
+
+
+# 支持范围过滤的数值列（排序索引）
+RANGE_COLUMNS = ('release_year', 'budget')
+
+# 列表列过滤：过滤名 -> (合并数据中的列表列, 实体域, 错误信息中的名称)
+LIST_FILTERS = {
+    'country': ('country_codes', 'country', '国家'),
+    'language': ('language_codes', 'language', '语言'),
+}
+
+# 分组维度：单值维度每行一个组号，列表维度按CSR展开（一部电影计入它的每个实体）
+SCALAR_DIMENSIONS = ('year', 'month', 'budget_range')
+LIST_DIMENSIONS = {'genre': 'genre_names', 'country': 'country_codes', 'language': 'language_codes'}
+DIMENSIONS = SCALAR_DIMENSIONS + tuple(LIST_DIMENSIONS)
+
+# 指标: count，或 <聚合>:<列>（如 mean:roi、median:revenue）
+AGGREGATIONS = ('sum', 'mean', 'median', 'min', 'max')
+METRIC_COLUMNS = VALUE_COLUMNS
+
+
+def parse_metrics(metrics) -> list:
+    """
+    规范化指标列表，返回 [(聚合, 列), ...]（count 为 ('count', None)）
+
+    无效的指标抛出 ValueError。
+    """
+    parsed = []
+    for metric in metrics:
+        metric = metric.strip()
+        if metric == 'count':
+            parsed.append(('count', None))
+            continue
+        aggregation, _, column = metric.partition(':')
+        if aggregation not in AGGREGATIONS or column not in METRIC_COLUMNS:
+            raise ValueError(f"无效的指标: {metric}（count 或 <{'/'.join(AGGREGATIONS)}>:<"
+                             f"{'/'.join(METRIC_COLUMNS)}>）")
+        parsed.append((aggregation, column))
+    return list(dict.fromkeys(parsed)) or [('count', None)]
+
+
+def metric_name(aggregation: str, column: Optional[str]) -> str:
+    return aggregation if column is None else f'{aggregation}_{column}'
+
+
+class QueryIndex:
+    """
+    切片查询索引（按数据版本构建一次，数据变化后重新构建）
+
+    - release_year / budget 范围过滤:  SortedIndex
+    - 类型过滤:                        GenreIndex（位图，支持谓词表达式）
+    - 国家 / 语言过滤:                 PostingIndex
+    - 分组: 年份、月份、预算区间为每行一个组号，类型 / 国家 / 语言直接使用CSR列表列
+
+    过滤结果为布尔数组，多个条件按位与；分组统计只访问命中的行。
+    """
+
+    def __init__(self, df: pd.DataFrame, genre_index: GenreIndex, list_columns: dict,
+                 dictionaries: dict):
+        """
+        df 为合并数据，list_columns / dictionaries 为 {列表列: ListColumn} 和
+        {实体域: EntityDictionary}
+        """
+        self.n_rows = len(df)
+        self.genre_index = genre_index
+        self.ranges = {column: SortedIndex(df[column].to_numpy(dtype=np.float64, na_value=np.nan))
+                       for column in RANGE_COLUMNS}
+        self.postings = {
+            name: PostingIndex(list_columns[column], dictionaries[domain], label)
+            for name, (column, domain, label) in LIST_FILTERS.items()
+        }
+        self.financial = df['has_financial_data'].to_numpy(dtype=bool)
+        self.values = {column: df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                       for column in METRIC_COLUMNS}
+
+        def code(column: str) -> np.ndarray:
+            values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            return np.where(np.isnan(values), -1, values).astype(np.int64)
+
+        self.codes = {
+            'year': code('release_year'),
+            'month': code('release_month'),
+            'budget_range': budget_buckets(self.values['budget']),
+        }
+        self.lists = {dimension: list_columns[column] for dimension, column in LIST_DIMENSIONS.items()}
+        self.names = {
+            'genre': dictionaries['genre'].names,
+            'country': dictionaries['country'].names,
+            'language': dictionaries['language'].names,
+        }
+
+    # ==================== 过滤 ====================
+
+    def select(self, filters: dict) -> Optional[np.ndarray]:
+        """
+        计算过滤条件，返回布尔数组（没有条件时返回None，表示全部电影）
+
+        filters:
+        - release_year / budget:  [下限, 上限]（闭区间，None 表示不限）
+        - genre:                  类型谓词表达式（如 "Action AND NOT Comedy"）
+        - country / language:     代码列表（包含任一即命中）
+        - financial_only:         只保留有财务数据的电影
+        """
+        unknown = set(filters) - set(RANGE_COLUMNS) - set(LIST_FILTERS) - {'genre', 'financial_only'}
+        if unknown:
+            raise ValueError(f"未知的过滤条件: {', '.join(sorted(unknown))}")
+
+        masks = []
+        for column in RANGE_COLUMNS:
+            bounds = filters.get(column)
+            if bounds is not None and any(b is not None for b in bounds):
+                low, high = bounds
+                masks.append(self.ranges[column].range_mask(low, high))
+        if filters.get('genre'):
+            masks.append(self.genre_index.evaluate(filters['genre']))
+        for name, index in self.postings.items():
+            if filters.get(name):
+                masks.append(index.any_mask(filters[name]))
+        if filters.get('financial_only'):
+            masks.append(self.financial)
+
+        if not masks:
+            return None
+        mask = masks[0].copy()
+        for other in masks[1:]:
+            mask &= other
+        return mask
+
+    # ==================== 分组统计 ====================
+
+    def execute(self, filters: dict, group_by: Optional[str] = None, metrics=('count',),
+                limit: Optional[int] = None) -> dict:
+        """
+        过滤后按 group_by 分组计算指标
+
+        返回 {'total': 命中的电影数, 'group_by', 'metrics': 指标名列表,
+              'groups': [{'key', 'count', <指标名>: 值, ...}, ...]}。
+        年份、月份、预算区间按键升序，类型 / 国家 / 语言按电影数降序（相同按名称）；limit 限制组数。
+        """
+        if group_by is not None and group_by not in DIMENSIONS:
+            raise ValueError(f"未知的分组维度: {group_by}（可选 {', '.join(DIMENSIONS)}）")
+        metrics = parse_metrics(metrics)
+        mask = self.select(filters)
+        rows = np.arange(self.n_rows) if mask is None else np.flatnonzero(mask)
+
+        # (行, 组号) 对
+        if group_by is None:
+            pair_rows, groups = rows, np.zeros(len(rows), dtype=np.int64)
+        elif group_by in SCALAR_DIMENSIONS:
+            groups = self.codes[group_by] if mask is None else self.codes[group_by][rows]
+            keep = groups >= 0
+            pair_rows, groups = rows[keep], groups[keep]
+        elif mask is None:
+            list_column = self.lists[group_by]
+            pair_rows, groups = list_column.row_index(), list_column.ids
+        else:
+            pair_rows, groups = self._expand(self.lists[group_by], rows)
+
+        # 组号都是较小的非负整数：计数得到非空组，再映射为连续的组下标
+        occupied = np.bincount(groups) if len(groups) else np.zeros(0, dtype=np.int64)
+        keys = np.flatnonzero(occupied)
+        counts = occupied[keys]
+        remap = np.zeros(len(occupied), dtype=np.intp)
+        remap[keys] = np.arange(len(keys))
+        inverse = remap[groups]
+
+        columns = {}
+        for aggregation, column in metrics:
+            if aggregation != 'count':
+                columns[metric_name(aggregation, column)] = self._aggregate(
+                    aggregation, self.values[column][pair_rows], inverse, counts)
+
+        ranking = np.arange(len(keys))
+        if group_by in LIST_DIMENSIONS:
+            # 电影数相同按名称排序：实体ID取决于导入历史，同一数据版本的结果必须一致
+            ranking = np.lexsort((self.names[group_by][keys].astype(str), -counts))
+        if limit is not None:
+            ranking = ranking[:limit]
+
+        result_groups = []
+        for i in ranking.tolist():
+            record = {'key': self._key_label(group_by, int(keys[i])), 'count': int(counts[i])}
+            for name, values in columns.items():
+                value = values[i]
+                record[name] = None if np.isnan(value) else float(value)
+            result_groups.append(record)
+        return {
+            'total': int(len(rows)),
+            'group_by': group_by,
+            'metrics': [metric_name(a, c) for a, c in metrics],
+            'groups': result_groups,
+        }
+
+    @staticmethod
+    def _expand(list_column, rows: np.ndarray) -> tuple:
+        """按CSR把选中的行展开为 (行, 实体ID) 对"""
+        offsets = list_column.offsets
+        starts = offsets[rows]
+        lengths = offsets[rows + 1] - starts
+        pair_rows = np.repeat(rows, lengths)
+        elements = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                    + np.arange(int(lengths.sum())))
+        return pair_rows, np.asarray(list_column.ids, dtype=np.int64)[elements]
+
+    @staticmethod
+    def _aggregate(aggregation: str, values: np.ndarray, groups: np.ndarray,
+                   counts: np.ndarray) -> np.ndarray:
+        """
+        分组聚合（groups 为每个值的组下标，counts 为每组的值个数）
+
+        NaN 不计入，全为 NaN 的组结果为 NaN。只有中位数需要排序。
+        """
+        n_groups = len(counts)
+        present = ~np.isnan(values)
+        if aggregation in ('sum', 'mean'):
+            n = np.bincount(groups, weights=present, minlength=n_groups)
+            total = np.bincount(groups, weights=np.where(present, values, 0.0), minlength=n_groups)
+            if aggregation == 'sum':
+                return np.where(n > 0, total, np.nan)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return total / n
+        if aggregation in ('min', 'max'):
+            result = np.full(n_groups, np.nan)
+            (np.fmin if aggregation == 'min' else np.fmax).at(result, groups, values)
+            return result
+        # median: 先按值排序，再按组稳定排序（组下标为16位整数时是基数排序），
+        # NaN 排在组内最后，取每组非缺失值中间的一或两个
+        order = np.argsort(values)
+        small = groups.astype(np.int16) if n_groups <= np.iinfo(np.int16).max else groups
+        ordered = values[order[np.argsort(small[order], kind='stable')]]
+        starts = np.cumsum(counts) - counts
+        n = np.bincount(groups, weights=present, minlength=n_groups).astype(np.int64)
+        result = np.full(n_groups, np.nan)
+        has = n > 0
+        low = (starts + (n - 1) // 2)[has]
+        high = (starts + n // 2)[has]
+        result[has] = (ordered[low] + ordered[high]) / 2
+        return result
+
+    def _key_label(self, group_by: Optional[str], key: int):
+        if group_by is None:
+            return 'all'
+        if group_by == 'budget_range':
+            return BUDGET_LABELS[key]
+        if group_by in LIST_DIMENSIONS:
+            return str(self.names[group_by][key])
+        return key
@@ -0,0 +1,129 @@
+"""
+排行模块
+实体（导演 / 演员 / 公司）统计按各指标预先排好序，排行榜查询只是对有序数组取一段；
+另提供 O(n) 选择的 top_k，替代对整张表的 nlargest / nsmallest
+"""
+
+import numpy as np
+
+from .aggregates import MomentTable
+
+
+# 可排序的指标（均为降序）
+RANKING_METRICS = ('total_revenue', 'avg_roi', 'avg_rating', 'movie_count')
+
+# 排行记录中的统计列: 输出名 -> (聚合, 数值列)
+STAT_COLUMNS = {
+    'total_revenue': ('sum', 'revenue'),
+    'avg_revenue': ('mean', 'revenue'),
+    'total_budget': ('sum', 'budget'),
+    'avg_budget': ('mean', 'budget'),
+    'avg_rating': ('mean', 'vote_average'),
+    'avg_roi': ('mean', 'roi'),
+}
+
+
+def top_k(values: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+    """
+    前 k 个最大（或最小）值的下标，按值排序
+
+    值相同时下标小的在前，NaN 排在最后，与 nlargest / nsmallest（keep='first'）一致。
+    先用 partition 在 O(n) 内找到第 k 个值，只对不超过它的候选排序。
+    """
+    missing = np.isnan(values)
+    candidates = np.flatnonzero(~missing)
+    if k <= 0:
+        return candidates[:0]
+    keys = -values[candidates] if largest else values[candidates]
+    if k < len(candidates):
+        kth = np.partition(keys, k - 1)[k - 1]
+        within = keys <= kth
+        candidates, keys = candidates[within], keys[within]
+    selected = candidates[np.lexsort((candidates, keys))[:k]]
+    if k > len(selected):
+        # 非缺失值不足 k 个时按下标顺序补上 NaN
+        selected = np.concatenate([selected, np.flatnonzero(missing)[:k - len(selected)]])
+    return selected
+
+
+class EntityRanking:
+    """
+    一类实体的预排序排行
+
+    构建时为每个排序指标做一次降序排列（NaN 在最后，值相同按实体ID升序）；
+    按最少电影数过滤后的排列在首次使用时算出并保留，之后的查询只取切片。
+    """
+
+    def __init__(self, label: str, names, entity_ids: np.ndarray, movie_counts: np.ndarray,
+                 stats: dict):
+        """
+        label 为记录中实体名的字段名，names 为实体字典的名称（按ID下标），
+        entity_ids / movie_counts / stats 的各列按实体对齐
+        """
+        self.label = label
+        self.names = names
+        self.entity_ids = entity_ids
+        self.movie_counts = movie_counts
+        self.stats = stats
+        self.orders = {
+            metric: np.lexsort((entity_ids, -(movie_counts if metric == 'movie_count' else stats[metric])))
+            for metric in RANKING_METRICS
+        }
+        self._filtered: dict = {}
+
+    @classmethod
+    def from_table(cls, label: str, table: MomentTable, names) -> 'EntityRanking':
+        """由物化聚合表构建（组号即实体ID）"""
+        ids = table.groups()
+        stats = {
+            name: (table.total if aggregation == 'sum' else table.mean)(column, ids)
+            for name, (aggregation, column) in STAT_COLUMNS.items()
+        }
+        return cls(label, names, ids, table.rows[ids], stats)
+
+    @classmethod
+    def from_pairs(cls, label: str, entity_ids: np.ndarray, values: dict, names) -> 'EntityRanking':
+        """
+        由 电影×实体 对构建
+
+        entity_ids 为每对的实体ID，values 为 {数值列: 每对所属电影的值}，NaN 不计入均值。
+        """
+        n = len(names)
+        rows = np.bincount(entity_ids, minlength=n)
+        ids = np.flatnonzero(rows)
+        sums, counts = {}, {}
+        for column in dict.fromkeys(column for _, column in STAT_COLUMNS.values()):
+            present = ~np.isnan(values[column])
+            sums[column] = np.bincount(entity_ids, weights=np.where(present, values[column], 0.0),
+                                       minlength=n)[ids]
+            counts[column] = np.bincount(entity_ids, weights=present, minlength=n)[ids]
+        stats = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name, (aggregation, column) in STAT_COLUMNS.items():
+                stats[name] = sums[column] if aggregation == 'sum' else sums[column] / counts[column]
+        return cls(label, names, ids, rows[ids], stats)
+
+    def order(self, sort: str = 'total_revenue', min_count: int = 1) -> np.ndarray:
+        """至少 min_count 部电影的实体按 sort 降序的下标"""
+        if sort not in RANKING_METRICS:
+            raise ValueError(f"未知的排序指标: {sort}（可选 {', '.join(RANKING_METRICS)}）")
+        key = (sort, min_count)
+        order = self._filtered.get(key)
+        if order is None:
+            order = self.orders[sort]
+            if min_count > 1:
+                order = order[self.movie_counts[order] >= min_count]
+            self._filtered[key] = order
+        return order
+
+    def page(self, sort: str = 'total_revenue', offset: int = 0, limit: int = 20,
+             min_count: int = 1) -> list:
+        """排名第 offset 起的 limit 条记录"""
+        selected = self.order(sort, min_count)[offset:offset + limit]
+        columns = {name: values[selected].tolist() for name, values in self.stats.items()}
+        return [{
+            self.label: self.names[entity],
+            'movie_count': count,
+            **{name: values[i] for name, values in columns.items()}
+        } for i, (entity, count) in enumerate(zip(self.entity_ids[selected].tolist(),
+                                                   self.movie_counts[selected].tolist()))]
@@ -0,0 +1,152 @@
+"""
+分析结果缓存模块
+按 方法 + 参数 + 数据版本 缓存分析结果，LRU淘汰
+"""
+
+import functools
+import inspect
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .instrumentation import observe_method
+
+
+_MISSING = object()
+
+
+def _freeze(value):
+    """把列表/字典等参数转换为可哈希的形式"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """
+    分析结果LRU缓存
+
+    同时限制条目数和估算的总字节数（以pickle后的大小估算），
+    记录命中、未命中和淘汰次数。缓存的结果为共享对象，调用方不应修改。
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """读取缓存，命中时移到最近使用端"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """写入缓存，超出限制时淘汰最久未使用的条目"""
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """删除满足条件的条目（predicate 接收缓存键），不传则清空"""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            for key in [k for k in self._entries if predicate(k)]:
+                self._total_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """清空缓存"""
+        self.invalidate()
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def cached_result(method):
+    """
+    方法结果缓存装饰器
+
+    缓存键为 (方法名, 数据版本, 规范化后的参数)。实例需要提供
+    result_cache 属性（为None时不缓存）和 loader.data_version。
+    每次调用的耗时和缓存情况（hit / miss / off）通知 instrumentation 的方法耗时回调。
+    """
+    signature = inspect.signature(method)
+
+    def call(self, args, kwargs) -> tuple:
+        cache: Optional[ResultCache] = getattr(self, 'result_cache', None)
+        if cache is None:
+            return method(self, *args, **kwargs), 'off'
+
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple((k, _freeze(v)) for k, v in bound.arguments.items() if k != 'self')
+        key = (method.__name__, self.loader.data_version, arguments)
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs), 'off'
+
+        result = cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result, 'hit'
+        result = method(self, *args, **kwargs)
+        cache.put(key, result)
+        return result, 'miss'
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        result, outcome = call(self, args, kwargs)
+        observe_method(method.__name__, time.perf_counter() - start, outcome)
+        return result
+
+    return wrapper
@@ -0,0 +1,219 @@
+"""
+散点图降采样模块
+把任意规模的 (x, y) 点集压缩为固定大小的结果：二维直方图、六边形分箱或按网格分层的代表点样本
+"""
+
+import numpy as np
+
+
+# 可用作散点图坐标轴的数值列
+SCATTER_VARIABLES = ('budget', 'revenue', 'roi', 'vote_average', 'vote_count',
+                     'popularity', 'runtime', 'release_year')
+
+# 跨多个数量级的列使用对数坐标（只保留正值）
+LOG_SCALE_VARIABLES = ('budget', 'revenue', 'vote_count', 'popularity')
+
+SCATTER_MODES = ('histogram', 'hexbin', 'sample')
+
+# 分层采样的固定随机种子：相同的数据和参数总是选出同一批点
+SAMPLE_SEED = 0
+
+
+class ScatterAxis:
+    """一个坐标轴：变换后的取值范围（对数坐标在 log10 空间中分箱）"""
+
+    def __init__(self, name: str, values: np.ndarray):
+        self.name = name
+        self.log = name in LOG_SCALE_VARIABLES
+        self.transformed = np.log10(values) if self.log else values
+        low, high = float(self.transformed.min()), float(self.transformed.max())
+        # 原始单位的取值范围（不经过对数变换的往返，避免浮点误差）
+        self.domain = [float(values.min()), float(values.max())]
+        if high <= low:
+            # 所有值相同：扩展为单位宽度，避免除以零
+            low, high = low - 0.5, high + 0.5
+            self.domain = [float(self.inverse(low)), float(self.inverse(high))]
+        self.low, self.high = low, high
+
+    @property
+    def span(self) -> float:
+        return self.high - self.low
+
+    def inverse(self, transformed):
+        """变换空间 -> 原始单位"""
+        return np.power(10.0, transformed) if self.log else transformed
+
+    def cells(self, resolution: int) -> np.ndarray:
+        """每个值所在的分箱下标 [0, resolution)"""
+        scaled = (self.transformed - self.low) / self.span * resolution
+        return np.clip(scaled.astype(np.int64), 0, resolution - 1)
+
+    def edges(self, resolution: int) -> list:
+        edges = self.inverse(np.linspace(self.low, self.high, resolution + 1))
+        edges[0], edges[-1] = self.domain
+        return edges.tolist()
+
+    def describe(self) -> dict:
+        return {
+            'name': self.name,
+            'scale': 'log' if self.log else 'linear',
+            'domain': self.domain,
+        }
+
+
+def valid_points(x: np.ndarray, y: np.ndarray, x_var: str, y_var: str) -> np.ndarray:
+    """两列都有限（对数坐标还要求为正）的行"""
+    keep = np.isfinite(x) & np.isfinite(y)
+    if x_var in LOG_SCALE_VARIABLES:
+        keep &= x > 0
+    if y_var in LOG_SCALE_VARIABLES:
+        keep &= y > 0
+    return keep
+
+
+def histogram2d(x_axis: ScatterAxis, y_axis: ScatterAxis, resolution: int) -> dict:
+    """
+    二维直方图：resolution × resolution 个矩形格
+
+    只返回非空格 [[列, 行, 数量], ...]，格边界见 x_edges / y_edges（原始单位）。
+    """
+    cells = x_axis.cells(resolution) * resolution + y_axis.cells(resolution)
+    counts = np.bincount(cells, minlength=resolution * resolution)
+    occupied = np.flatnonzero(counts)
+    return {
+        'x_edges': x_axis.edges(resolution),
+        'y_edges': y_axis.edges(resolution),
+        'bins': np.column_stack([occupied // resolution, occupied % resolution,
+                                 counts[occupied]]).tolist(),
+    }
+
+
+def hexbin(x_axis: ScatterAxis, y_axis: ScatterAxis, resolution: int) -> dict:
+    """
+    六边形分箱（与 matplotlib hexbin 相同的双网格最近中心算法）
+
+    x 方向 resolution 个六边形，y 方向按 √3 的比例取网格数。返回非空六边形的中心
+    （原始单位）和点数，hex_size 为变换空间中的网格间距（对数坐标时以数量级为单位），
+    前端以此换算为像素绘制六边形。
+    """
+    nx = resolution
+    ny = max(1, int(round(resolution / np.sqrt(3))))
+    sx = (x_axis.transformed - x_axis.low) / x_axis.span * nx
+    sy = (y_axis.transformed - y_axis.low) / y_axis.span * ny
+
+    i1, j1 = np.round(sx), np.round(sy)
+    i2, j2 = np.floor(sx), np.floor(sy)
+    d1 = (sx - i1) ** 2 + 3.0 * (sy - j1) ** 2
+    d2 = (sx - i2 - 0.5) ** 2 + 3.0 * (sy - j2 - 0.5) ** 2
+    first = d1 < d2
+
+    # 第一套网格 (nx + 1) × (ny + 1) 个中心，第二套 nx × ny 个（偏移半格）
+    n_first = (nx + 1) * (ny + 1)
+    cells = np.where(
+        first,
+        i1.astype(np.int64) * (ny + 1) + j1.astype(np.int64),
+        n_first + np.minimum(i2, nx - 1).astype(np.int64) * ny + np.minimum(j2, ny - 1).astype(np.int64),
+    )
+    counts = np.bincount(cells, minlength=n_first + nx * ny)
+    occupied = np.flatnonzero(counts)
+
+    on_first = occupied < n_first
+    second = occupied - n_first
+    ci = np.where(on_first, occupied // (ny + 1), second // ny + 0.5)
+    cj = np.where(on_first, occupied % (ny + 1), second % ny + 0.5)
+    dx, dy = x_axis.span / nx, y_axis.span / ny
+    centers_x = x_axis.inverse(x_axis.low + ci * dx)
+    centers_y = y_axis.inverse(y_axis.low + cj * dy)
+    return {
+        'hex_size': {'dx': dx, 'dy': dy},
+        'bins': [[float(cx), float(cy), int(n)]
+                 for cx, cy, n in zip(centers_x, centers_y, counts[occupied])],
+    }
+
+
+def stratified_sample(x_axis: ScatterAxis, y_axis: ScatterAxis, resolution: int,
+                      limit: int, seed: int = SAMPLE_SEED) -> tuple:
+    """
+    分层代表点采样（细节层次）
+
+    在 resolution × resolution 的网格中，每个非空格最多取 k 个点，k 为总数不超过
+    limit 的最大值；稀疏区域（包括离群点）全部保留，密集区域按比例抽稀。
+    非空格多于 limit 时每格一个点，再按随机优先级截取 limit 个（权重按比例放大）。
+
+    返回 (选中的行下标（升序）, 每个点代表的原始点数)
+    """
+    n = len(x_axis.transformed)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    cells = x_axis.cells(resolution) * resolution + y_axis.cells(resolution)
+    # 随机打乱后按格稳定排序：格内的先后即随机优先级（格号在16位以内时为基数排序）
+    shuffled = np.random.default_rng(seed).permutation(n)
+    shuffled_cells = cells[shuffled]
+    if resolution * resolution <= np.iinfo(np.int16).max:
+        shuffled_cells = shuffled_cells.astype(np.int16)
+    order = shuffled[np.argsort(shuffled_cells, kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    # 二分查找满足 sum(min(counts, k)) <= limit 的最大 k
+    low, high = 1, int(counts.max())
+    while low < high:
+        k = (low + high + 1) // 2
+        if np.minimum(counts, k).sum() <= limit:
+            low = k
+        else:
+            high = k - 1
+    k = low
+
+    take = rank < k
+    chosen = order[take]
+    weights = (counts / np.minimum(counts, k))[np.repeat(np.arange(len(counts)), counts)][take]
+    if len(chosen) > limit:
+        priority = np.empty(n, dtype=np.int64)
+        priority[shuffled] = np.arange(n)
+        keep = np.argsort(priority[chosen], kind='stable')[:limit]
+        # 被截掉的格按比例分摊到保留的点上，权重之和仍为总点数
+        chosen, weights = chosen[keep], weights[keep] * (n / weights[keep].sum())
+    position = np.argsort(chosen, kind='stable')
+    return chosen[position], weights[position]
+
+
+def scatter_density(x: np.ndarray, y: np.ndarray, x_var: str, y_var: str, mode: str,
+                    resolution: int, limit: int = 1000) -> dict:
+    """
+    按 mode 降采样，返回结果字典
+
+    sample 模式另外返回 rows（选中的行，为传入数组的下标，升序）和 weights
+    （每个点代表的原始点数），由调用方换成需要的点字段。
+    """
+    if mode not in SCATTER_MODES:
+        raise ValueError(f"未知的散点图模式: {mode}（可选 {', '.join(SCATTER_MODES)}）")
+    keep = valid_points(x, y, x_var, y_var)
+    rows = np.flatnonzero(keep)
+    result = {
+        'mode': mode,
+        'resolution': resolution,
+        'total': int(len(rows)),
+        'excluded': int(len(x) - len(rows)),
+    }
+    if not len(rows):
+        result['x'] = {'name': x_var, 'scale': 'linear', 'domain': None}
+        result['y'] = {'name': y_var, 'scale': 'linear', 'domain': None}
+        if mode == 'sample':
+            result.update(rows=rows, weights=np.empty(0))
+        else:
+            result['bins'] = []
+        return result
+
+    x_axis, y_axis = ScatterAxis(x_var, x[keep]), ScatterAxis(y_var, y[keep])
+    result.update(x=x_axis.describe(), y=y_axis.describe())
+    if mode == 'histogram':
+        result.update(histogram2d(x_axis, y_axis, resolution))
+    elif mode == 'hexbin':
+        result.update(hexbin(x_axis, y_axis, resolution))
+    else:
+        chosen, weights = stratified_sample(x_axis, y_axis, resolution, limit)
+        result.update(rows=rows[chosen], weights=weights)
+    return result
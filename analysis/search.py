@@ -0,0 +1,348 @@
+"""
+超参数搜索模块
+用逐次减半（successive halving）和梯度提升早停为票房预测模型搜索超参数
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from .predictor import BoxOfficePredictor, CV_FOLDS, make_models
+from .training_scheduler import TrainingScheduler, shared_data
+
+
+# 默认搜索空间（未列出的参数沿用 make_models 中的默认值）
+SEARCH_SPACES = {
+    'Ridge Regression': {
+        'alpha': [0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0],
+    },
+    'Random Forest': {
+        'n_estimators': [100, 200, 300],
+        'max_depth': [None, 10, 15, 20, 30],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    },
+    'Gradient Boosting': {
+        'learning_rate': [0.02, 0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4, 5, 6],
+        'subsample': [0.7, 0.85, 1.0],
+        'min_samples_leaf': [1, 5, 10, 20],
+    },
+}
+
+# 梯度提升早停：最多训练的轮数与连续多少轮验证误差不下降后停止
+BOOSTING_MAX_ESTIMATORS = 600
+BOOSTING_PATIENCE = 25
+# 从每折训练样本中划出用于选择早停轮数的比例（折的验证集只用于打分）
+BOOSTING_STOPPING_FRACTION = 0.1
+
+# 折结果的评分方式版本，改变评分方式后旧的缓存条目不再命中
+SCORING_VERSION = 2
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _data_fingerprint(X: np.ndarray, y: np.ndarray) -> str:
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(X).tobytes())
+    h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()[:16]
+
+
+class _BoostingEarlyStopping:
+    """
+    GradientBoostingRegressor.fit 的 monitor：在早停集上逐轮累加预测，
+    早停集误差连续 patience 轮不下降时停止训练
+
+    早停集取自训练样本，不能是打分用的验证集，否则按验证误差选出的轮数会让得分偏高。
+    """
+
+    def __init__(self, X_stop: np.ndarray, y_stop: np.ndarray, patience: int):
+        self.X_stop = X_stop
+        self.y_stop = y_stop
+        self.patience = patience
+        self.raw = None
+        self.best_mse = math.inf
+        self.best_iteration = 0
+
+    def __call__(self, i: int, estimator, _locals) -> bool:
+        if self.raw is None:
+            self.raw = np.asarray(estimator.init_.predict(self.X_stop), dtype=float).ravel()
+        self.raw = self.raw + estimator.learning_rate * estimator.estimators_[i, 0].predict(self.X_stop)
+        mse = float(np.mean((self.y_stop - self.raw) ** 2))
+        if mse < self.best_mse:
+            self.best_mse = mse
+            self.best_iteration = i + 1
+        return i + 1 - self.best_iteration >= self.patience
+
+
+def _search_task(name: str, params: dict, fold: int, resource: int, seed: int,
+                 random_state: int, n_jobs: Optional[int],
+                 X: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None,
+                 folds: Optional[list] = None) -> tuple:
+    """
+    在一折上评估一组超参数，训练样本取该折训练集中的 resource 个
+
+    梯度提升从训练样本中再划出 BOOSTING_STOPPING_FRACTION 作早停集选择轮数，
+    得分为该轮数下在验证集上的 R²，与其他模型一样只在没见过的数据上评估。
+
+    返回 (模型名, 参数键, 折号, 资源量, {'r2', 'best_iteration', 'seconds'})
+    """
+    X, y, folds = shared_data(X, y, folds)
+    start = time.perf_counter()
+    train_idx, valid_idx = folds[fold]
+    if resource < len(train_idx):
+        rng = np.random.default_rng(seed + fold)
+        train_idx = np.sort(rng.choice(train_idx, size=resource, replace=False))
+
+    estimator = make_models(random_state, {name: params})[name]
+    if n_jobs is not None and 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=n_jobs)
+
+    best_iteration = None
+    if name == 'Gradient Boosting':
+        estimator.set_params(n_estimators=BOOSTING_MAX_ESTIMATORS)
+        fit_idx, stop_idx = train_test_split(train_idx, test_size=BOOSTING_STOPPING_FRACTION,
+                                             random_state=seed + fold)
+        monitor = _BoostingEarlyStopping(X[stop_idx], y[stop_idx], BOOSTING_PATIENCE)
+        estimator.fit(X[fit_idx], y[fit_idx], monitor=monitor)
+        best_iteration = monitor.best_iteration
+        # staged_predict 的第 k 个结果为前 k+1 轮的预测
+        for iteration, prediction in enumerate(estimator.staged_predict(X[valid_idx]), start=1):
+            if iteration == best_iteration:
+                break
+        score = float(r2_score(y[valid_idx], prediction))
+    else:
+        estimator.fit(X[train_idx], y[train_idx])
+        score = float(r2_score(y[valid_idx], estimator.predict(X[valid_idx])))
+
+    result = {'r2': score, 'best_iteration': best_iteration,
+              'seconds': time.perf_counter() - start}
+    return name, _params_key(params), fold, resource, result
+
+
+class SearchCache:
+    """
+    折结果缓存
+
+    键为 (评分方式版本, 数据指纹, 模型, 参数, 资源量, 折号, 随机种子)，值为该折的得分。
+    指定 path 时以JSON文件持久化，重复搜索不会重新训练相同的配置。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.exists():
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def key(fingerprint: str, name: str, params_key: str, resource: int, fold: int,
+            seed: int) -> str:
+        return '|'.join([f'v{SCORING_VERSION}', fingerprint, name, params_key, str(resource),
+                         str(fold), str(seed)])
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = value
+
+    def save(self):
+        """写回磁盘（未指定 path 时不做任何事）"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+        tmp.replace(self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class HyperparameterSearch:
+    """
+    超参数搜索
+
+    数据划分与 fit_models 相同：按同样的 test_size / random_state 留出测试集，
+    只在训练集上做5折交叉验证。每个模型独立做逐次减半：
+    第一轮用少量训练样本评估全部候选，每轮保留前 1/eta 的候选并把样本量乘以 eta，
+    最后一轮使用全部训练样本。梯度提升在每折训练样本中划出的早停集上早停，最终轮数取各折最佳轮数的中位数。
+    所有折任务通过 TrainingScheduler 按核心预算并行执行，结果写入 SearchCache。
+    """
+
+    def __init__(self, predictor: BoxOfficePredictor, spaces: Optional[dict] = None,
+                 n_candidates: int = 27, eta: int = 3, min_resource: int = 400,
+                 core_budget: Optional[int] = None, cache: Optional[SearchCache] = None,
+                 test_size: float = 0.2, random_state: int = 42):
+        self.predictor = predictor
+        self.spaces = spaces or SEARCH_SPACES
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_resource = min_resource
+        self.scheduler = TrainingScheduler(core_budget)
+        self.cache = cache or SearchCache()
+        self.test_size = test_size
+        self.random_state = random_state
+
+    def _training_data(self):
+        """与 fit_models 相同的训练集划分、标准化和折划分"""
+        X, y, _ = self.predictor.build_training_data()
+        X_train, _, y_train, _ = train_test_split(
+            X, y, test_size=self.test_size, random_state=self.random_state
+        )
+        X_train_scaled = StandardScaler().fit_transform(X_train.to_numpy(dtype=np.float64))
+        y_train_log = np.log1p(y_train).to_numpy()
+        folds = list(KFold(n_splits=CV_FOLDS).split(X_train_scaled))
+        return X_train_scaled, y_train_log, folds
+
+    def _schedule(self, fold_size: int) -> list:
+        """各轮的训练样本数（最后一轮为整折训练集）"""
+        rounds = max(1, math.floor(math.log(self.n_candidates, self.eta)) + 1)
+        resources = [fold_size]
+        while len(resources) < rounds:
+            smaller = resources[0] // self.eta
+            if smaller < self.min_resource:
+                break
+            resources.insert(0, smaller)
+        return resources
+
+    def run(self, models: Optional[list] = None) -> dict:
+        """
+        执行搜索
+
+        返回 leaderboard（每个候选在其到达的最高一轮的成绩，按轮次、得分排序）、
+        best_params（可直接传给 train_models(model_params=...)）、各轮统计和耗时。
+        """
+        total_start = time.perf_counter()
+        models = models or list(self.spaces)
+        X, y, folds = self._training_data()
+        fingerprint = _data_fingerprint(X, y)
+        fold_size = min(len(train_idx) for train_idx, _ in folds)
+        resources = self._schedule(fold_size)
+
+        candidates = {}
+        for name in models:
+            if name not in self.spaces:
+                raise ValueError(f"没有为模型 {name} 定义搜索空间")
+            sampled = ParameterSampler(self.spaces[name], n_iter=self.n_candidates,
+                                       random_state=self.random_state)
+            unique = {_params_key(p): p for p in sampled}
+            candidates[name] = list(unique.values())
+
+        entries = {}
+        rounds = []
+        for rung, resource in enumerate(resources):
+            scores = self._evaluate(candidates, resource, folds, X, y, fingerprint)
+            survivors = {}
+            for name, params_list in candidates.items():
+                ranked = sorted(params_list, reverse=True,
+                                key=lambda p: scores[(name, _params_key(p))]['cv_r2_mean'])
+                for params in ranked:
+                    entries[(name, _params_key(params))] = {
+                        'model': name, 'params': params, 'rung': rung, 'resource': resource,
+                        **scores[(name, _params_key(params))]
+                    }
+                keep = max(1, math.ceil(len(ranked) / self.eta))
+                survivors[name] = ranked[:keep]
+            rounds.append({
+                'rung': rung, 'resource': resource,
+                'candidates': {name: len(p) for name, p in candidates.items()}
+            })
+            candidates = survivors
+
+        leaderboard = sorted(entries.values(),
+                             key=lambda e: (-e['rung'], -e['cv_r2_mean']))
+        for rank, entry in enumerate(leaderboard, start=1):
+            entry['rank'] = rank
+
+        best_params = {}
+        for name in models:
+            best = next(e for e in leaderboard if e['model'] == name)
+            best_params[name] = dict(best['params'])
+            if best['best_iteration'] is not None:
+                best_params[name]['n_estimators'] = best['best_iteration']
+
+        self.cache.save()
+        return {
+            'leaderboard': leaderboard,
+            'best_params': best_params,
+            'rounds': rounds,
+            'cache': self.cache.stats(),
+            'seconds': time.perf_counter() - total_start,
+        }
+
+    def _evaluate(self, candidates: dict, resource: int, folds: list,
+                  X: np.ndarray, y: np.ndarray, fingerprint: str) -> dict:
+        """在所有折上评估一轮候选，已缓存的折直接复用"""
+        fold_results = {}
+        tasks = []
+        n_tasks = sum(len(p) for p in candidates.values()) * len(folds)
+        n_jobs = 1 if self.scheduler.workers_for(n_tasks) > 1 else None
+        for name, params_list in candidates.items():
+            for params in params_list:
+                params_key = _params_key(params)
+                for fold in range(len(folds)):
+                    key = SearchCache.key(fingerprint, name, params_key, resource, fold,
+                                          self.random_state)
+                    cached = self.cache.get(key)
+                    if cached is not None:
+                        fold_results[(name, params_key, fold)] = {**cached, 'cached': True}
+                    else:
+                        tasks.append((name, params, fold, resource, self.random_state,
+                                      self.random_state, n_jobs))
+
+        def on_result(result: tuple):
+            name, params_key, fold, resource_, value = result
+            self.cache.put(SearchCache.key(fingerprint, name, params_key, resource_, fold,
+                                           self.random_state), value)
+            fold_results[(name, params_key, fold)] = {**value, 'cached': False}
+
+        if tasks:
+            self.scheduler.map(_search_task, tasks, X, y, folds, on_result)
+
+        scores = {}
+        for name, params_list in candidates.items():
+            for params in params_list:
+                params_key = _params_key(params)
+                results = [fold_results[(name, params_key, fold)] for fold in range(len(folds))]
+                r2 = np.array([r['r2'] for r in results])
+                iterations = [r['best_iteration'] for r in results
+                              if r['best_iteration'] is not None]
+                scores[(name, params_key)] = {
+                    'cv_r2_mean': float(r2.mean()),
+                    'cv_r2_std': float(r2.std()),
+                    'best_iteration': int(np.median(iterations)) if iterations else None,
+                    'fit_seconds': float(sum(r['seconds'] for r in results)),
+                    'cached': all(r['cached'] for r in results),
+                }
+        return scores
@@ -0,0 +1,229 @@
+"""
+后台训练任务模块
+在独立的工作进程中训练预测模型，汇报进度，完成后原子替换在线模型
+"""
+
+import copy
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+import uuid
+import warnings
+from collections import OrderedDict
+from typing import Optional
+
+from .predictor import BoxOfficePredictor, MODEL_NAMES, CV_FOLDS, fit_models
+
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+def _training_worker(X, y, mlb, params: dict, messages):
+    """工作进程入口：训练模型并把进度和结果写入消息队列"""
+    try:
+        state, summary = fit_models(
+            X, y, mlb, progress=lambda event: messages.put(('progress', event)), **params
+        )
+        messages.put(('done', state, summary))
+    except BaseException as e:
+        messages.put(('error', f'{type(e).__name__}: {e}', traceback.format_exc()))
+
+
+class TrainingJobManager:
+    """
+    训练任务管理器
+
+    - submit 提交训练任务并立即返回任务信息；同一时间只运行一个任务，
+      已有任务在运行时直接返回该任务
+    - 特征准备在后台线程中完成，模型训练在独立进程（spawn）中执行，不占用API进程的GIL
+    - 进度以 模型 × 交叉验证折 为单位汇报，训练进程内部按核心预算并行（见 TrainingScheduler）
+    - 训练成功后保存到模型注册表，并通过 BoxOfficePredictor.install 启用新模型，
+      此前的预测继续使用旧模型；注册表固定了其他版本时只保存不启用
+    """
+
+    def __init__(self, predictor: BoxOfficePredictor, max_history: int = 20):
+        self.predictor = predictor
+        self.max_history = max_history
+        self._jobs: OrderedDict = OrderedDict()
+        self._active_id: Optional[str] = None
+        self._process = None
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+
+    def submit(self, test_size: float = 0.2, random_state: int = 42,
+               model_params: Optional[dict] = None) -> dict:
+        """提交训练任务，返回任务信息（model_params 覆盖默认超参数，见 make_models）"""
+        with self._lock:
+            if self._active_id is not None:
+                return copy.deepcopy(self._jobs[self._active_id])
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': QUEUED,
+                'params': {'test_size': test_size, 'random_state': random_state,
+                           'model_params': model_params or {}},
+                'data_version': None,
+                'model_version': None,
+                'installed': False,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': {
+                    'completed_steps': 0,
+                    # 每个模型：一次完整训练 + 每折交叉验证
+                    'total_steps': len(MODEL_NAMES) * (1 + CV_FOLDS),
+                    'percent': 0.0,
+                    'current_model': None,
+                    'models': {
+                        name: {'status': 'pending', 'folds_done': 0,
+                               'folds_total': CV_FOLDS, 'fold_scores': [None] * CV_FOLDS}
+                        for name in MODEL_NAMES
+                    },
+                },
+                'result': None,
+                'error': None,
+            }
+            self._active_id = job_id
+            while len(self._jobs) > self.max_history:
+                oldest = next(iter(self._jobs))
+                if oldest == job_id:
+                    break
+                del self._jobs[oldest]
+            snapshot = copy.deepcopy(self._jobs[job_id])
+
+        threading.Thread(target=self._run, args=(job_id,), name=f'training-{job_id}',
+                         daemon=True).start()
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """任务信息，不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def list_jobs(self) -> list:
+        """最近的任务（新任务在前），不含训练结果详情"""
+        with self._lock:
+            return [
+                {k: v for k, v in copy.deepcopy(job).items() if k != 'result'}
+                for job in reversed(self._jobs.values())
+            ]
+
+    def active_job(self) -> Optional[dict]:
+        """正在运行的任务"""
+        with self._lock:
+            if self._active_id is None:
+                return None
+            return copy.deepcopy(self._jobs[self._active_id])
+
+    def shutdown(self):
+        """终止正在运行的训练进程"""
+        process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout=5)
+
+    # ---------- 后台执行 ----------
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str):
+        try:
+            self._update(job_id, status=RUNNING, started_at=time.time())
+            params = self._jobs[job_id]['params']
+            data_version = self.predictor.loader.data_version
+            X, y, mlb = self.predictor.build_training_data()
+            self._update(job_id, data_version=data_version)
+
+            state, summary = self._train_in_process(job_id, X, y, mlb, params)
+            state['data_version'] = data_version
+            try:
+                version = self.predictor.save_to_registry(state)
+            except OSError as e:
+                warnings.warn(f"模型保存失败，新模型只在内存中生效: {e}")
+                version = None
+
+            pinned = self.predictor.registry.pinned_version()
+            installed = pinned is None or pinned == version
+            if installed:
+                self.predictor.install(state)
+            self._update(job_id, model_version=version, installed=installed)
+            self._finish(job_id, SUCCEEDED, result=summary)
+        except Exception as e:
+            self._finish(job_id, FAILED, error=str(e))
+
+    def _train_in_process(self, job_id: str, X, y, mlb, params: dict):
+        messages = self._context.Queue()
+        process = self._context.Process(
+            target=_training_worker, args=(X, y, mlb, params, messages),
+            # 非守护进程：训练进程内部还会按核心预算启动进程池
+            name=f'training-{job_id}', daemon=False
+        )
+        process.start()
+        self._process = process
+        try:
+            while True:
+                try:
+                    message = messages.get(timeout=0.5)
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(f'训练进程异常退出（exitcode={process.exitcode}）')
+                    continue
+
+                kind = message[0]
+                if kind == 'progress':
+                    self._apply_progress(job_id, message[1])
+                elif kind == 'done':
+                    return message[1], message[2]
+                else:
+                    raise RuntimeError(message[1])
+        finally:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            self._process = None
+
+    def _apply_progress(self, job_id: str, event: dict):
+        """把工作进程的进度事件合并进任务状态"""
+        with self._lock:
+            progress = self._jobs[job_id]['progress']
+            model = progress['models'][event['model']]
+            kind = event['event']
+            # 最近有进展的模型
+            progress['current_model'] = event['model']
+            if kind == 'model_started':
+                model['status'] = 'fitting'
+            elif kind == 'model_fitted':
+                model['status'] = 'cross_validating'
+                progress['completed_steps'] += 1
+            elif kind == 'fold_finished':
+                # 并行训练时各折按完成顺序到达
+                model['folds_done'] += 1
+                model['fold_scores'][event['fold'] - 1] = event['r2']
+                progress['completed_steps'] += 1
+            elif kind == 'model_finished':
+                model['status'] = 'done'
+                model['metrics'] = event['metrics']
+            progress['percent'] = round(
+                100.0 * progress['completed_steps'] / progress['total_steps'], 1
+            )
+
+    def _finish(self, job_id: str, status: str, result: Optional[dict] = None,
+                error: Optional[str] = None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=status, finished_at=time.time(), result=result, error=error)
+            if status == SUCCEEDED:
+                job['progress']['percent'] = 100.0
+                job['progress']['current_model'] = None
+            if self._active_id == job_id:
+                self._active_id = None
@@ -0,0 +1,146 @@
+"""
+训练调度模块
+把模型训练和交叉验证拆成独立任务，在进程池中按核心预算并行执行
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+
+
+# 训练核心预算的环境变量（默认使用全部CPU）
+CORE_BUDGET_ENV = 'TRAIN_CORE_BUDGET'
+
+# 工作进程中共享的训练数据（由进程池初始化函数设置，避免每个任务重复传输）
+_shared: dict = {}
+
+
+def default_core_budget() -> int:
+    """训练可用的核心数（环境变量优先，否则为当前进程可用的CPU数）"""
+    try:
+        return max(1, int(os.environ[CORE_BUDGET_ENV]))
+    except (KeyError, ValueError):
+        pass
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _init_worker(X: np.ndarray, y: np.ndarray, folds: list):
+    _shared.update(X=X, y=y, folds=folds)
+
+
+def shared_data(X: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None,
+                folds: Optional[list] = None) -> tuple:
+    """任务函数取训练数据：顺序执行时直接传入，进程池中取初始化时共享的数据"""
+    if X is None:
+        return _shared['X'], _shared['y'], _shared['folds']
+    return X, y, folds
+
+
+def _run_task(kind: str, name: str, estimator, fold: Optional[int],
+              X: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None,
+              folds: Optional[list] = None) -> tuple:
+    """
+    执行一个训练任务，返回 (类型, 模型名, 折号, 结果, 耗时秒数)
+
+    fit 任务在全部训练数据上拟合并返回模型；fold 任务在一折上拟合并返回验证集R2。
+    """
+    X, y, folds = shared_data(X, y, folds)
+    start = time.perf_counter()
+    if kind == 'fit':
+        result = clone(estimator).fit(X, y)
+    else:
+        train_idx, valid_idx = folds[fold]
+        model = clone(estimator).fit(X[train_idx], y[train_idx])
+        result = float(r2_score(y[valid_idx], model.predict(X[valid_idx])))
+    return kind, name, fold, result, time.perf_counter() - start
+
+
+def _is_ensemble(estimator) -> bool:
+    return 'n_estimators' in estimator.get_params()
+
+
+class TrainingScheduler:
+    """
+    训练任务调度器
+
+    每个模型拆成 1 个完整训练任务 + 每折 1 个交叉验证任务，所有模型共用同一组折划分。
+    任务数和核心预算都大于1时使用进程池（spawn）并行执行，训练数据只在
+    工作进程启动时传输一次；任务内部的 n_jobs 设为1，避免超出核心预算。
+    集成模型的任务先提交，减少尾部等待。核心预算为1时在当前进程中顺序执行。
+    map 可以按同样的方式执行其他任务函数（如超参数搜索的折任务）。
+    """
+
+    def __init__(self, core_budget: Optional[int] = None):
+        self.core_budget = core_budget or default_core_budget()
+
+    def workers_for(self, n_tasks: int) -> int:
+        """执行 n_tasks 个任务时的工作进程数（1 表示在当前进程中顺序执行）"""
+        return max(1, min(self.core_budget, n_tasks))
+
+    def run(self, estimators: dict, X: np.ndarray, y: np.ndarray, folds: list,
+            on_result: Callable[[str, str, Optional[int], object, float], None]) -> dict:
+        """
+        执行所有任务，每个任务完成时在调用线程中回调 on_result(类型, 模型名, 折号, 结果, 耗时)
+
+        返回调度统计（工作进程数、任务数、总耗时）。
+        """
+        ordered = sorted(estimators.items(), key=lambda item: not _is_ensemble(item[1]))
+        parallel = self.workers_for(len(ordered) * (1 + len(folds))) > 1
+
+        # 并行时每个任务单线程运行，完整训练的模型返回后恢复原来的 n_jobs
+        n_jobs = {}
+        tasks = []
+        for name, estimator in ordered:
+            if parallel and 'n_jobs' in estimator.get_params():
+                n_jobs[name] = estimator.get_params()['n_jobs']
+                estimator = clone(estimator).set_params(n_jobs=1)
+            tasks.append(('fit', name, estimator, None))
+            tasks.extend(('fold', name, estimator, k) for k in range(len(folds)))
+
+        def restore(result: tuple):
+            kind, name, fold, value, seconds = result
+            if kind == 'fit' and name in n_jobs:
+                value.set_params(n_jobs=n_jobs[name])
+            on_result(kind, name, fold, value, seconds)
+
+        return self.map(_run_task, tasks, X, y, folds, restore)
+
+    def map(self, func: Callable, tasks: list, X: np.ndarray, y: np.ndarray, folds: list,
+            on_result: Callable[[tuple], None]) -> dict:
+        """
+        执行 func(*task) 形式的任务，完成时在调用线程中回调 on_result(返回值)
+
+        func 必须是模块级函数，并通过 shared_data(X, y, folds) 取训练数据。
+        """
+        workers = self.workers_for(len(tasks))
+        start = time.perf_counter()
+        if workers <= 1:
+            for task in tasks:
+                on_result(func(*task, X=X, y=y, folds=folds))
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(X, y, folds)) as pool:
+                futures = [pool.submit(func, *task) for task in tasks]
+                try:
+                    for future in as_completed(futures):
+                        on_result(future.result())
+                except BaseException:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+        return {
+            'workers': workers,
+            'core_budget': self.core_budget,
+            'tasks': len(tasks),
+            'seconds': time.perf_counter() - start,
+        }
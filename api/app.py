@@ -3,39 +3,80 @@ FastAPI 应用主入口
 提供RESTful API服务
 """
 
+import json
+import os
 from contextlib import asynccontextmanager
 from typing import Optional
 
 import uvicorn
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from analysis import DataLoader, MovieAnalyzer, BoxOfficePredictor
+from analysis import (
+    DataLoader, MovieAnalyzer, BoxOfficePredictor, ModelNotTrainedError, TrainingJobManager
+)
+from analysis.instrumentation import (
+    STAGE_COMPUTE, STAGE_INFERENCE, STAGE_SERIALIZE,
+    add_method_observer, current_trace, remove_method_observer, span, traced
+)
+from analysis.model_registry import PIN_ENV as MODEL_PIN_ENV
+from analysis.predictor import make_models
+from .columnar import ENCODERS, FORMAT_JSON, negotiate_format
+from .executor import ComputeExecutor, ComputeSaturated
+from .metrics import InstrumentationMiddleware, Metrics, PROMETHEUS_CONTENT_TYPE
+from .profiler import SamplingProfiler
+from .response_cache import ResponseCache
 
 
 # 全局实例
 data_loader: Optional[DataLoader] = None
 analyzer: Optional[MovieAnalyzer] = None
 predictor: Optional[BoxOfficePredictor] = None
+training_jobs: Optional[TrainingJobManager] = None
+executor: Optional[ComputeExecutor] = None
+response_cache = ResponseCache()
+metrics = Metrics()
+profiler = SamplingProfiler()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global data_loader, analyzer, predictor
+    global data_loader, analyzer, predictor, training_jobs, executor
     
     # 启动时加载数据
     print("正在加载数据...")
     data_loader = DataLoader()
     data_loader.load_merged()  # 预加载数据
+    data_loader.data_version  # 预先算出数据版本，请求中只读取不加锁的快照
     analyzer = MovieAnalyzer(data_loader)
     predictor = BoxOfficePredictor(data_loader)
+    data_loader.add_reload_listener(lambda version: response_cache.clear())
+    data_loader.add_change_listener(lambda change: response_cache.clear())
+    executor = ComputeExecutor()
+    add_method_observer(metrics.observe_method)
     print("数据加载完成！")
     
+    # 优先从模型注册表加载；没有可用模型，或模型基于旧数据且未固定版本时后台训练，
+    # 训练完成前预测接口返回 503（旧模型继续服务）
+    training_jobs = TrainingJobManager(predictor)
+    model_version = predictor.load_from_registry()
+    if model_version is not None:
+        print(f"已加载预测模型 {model_version}")
+    stale = (model_version is not None
+             and predictor.model_data_version != data_loader.data_version
+             and predictor.registry.pinned_version() is None)
+    if model_version is None or stale:
+        training_jobs.submit()
+    
     yield
     
     # 关闭时清理
+    training_jobs.shutdown()
+    executor.shutdown()
+    remove_method_observer(metrics.observe_method)
     print("服务关闭")
 
 
@@ -54,11 +95,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
+# 请求耗时与阶段埋点（设置 API_PROFILE_ROUTES 时同时对匹配的请求采样分析）
+app.add_middleware(InstrumentationMiddleware, metrics=metrics,
+                   profiler=profiler if profiler.enabled else None)
+
 
 # ==================== Pydantic 模型 ====================
 
+class TrainingRequest(BaseModel):
+    """训练任务请求"""
+    test_size: float = Field(default=0.2, gt=0.0, lt=1.0)
+    random_state: int = 42
+    # {模型名: {超参数: 值}}，例如超参数搜索得到的 best_params
+    model_params: dict[str, dict] = {}
+
+
 class PredictionRequest(BaseModel):
     """票房预测请求"""
     budget: float
@@ -71,6 +125,25 @@ class PredictionRequest(BaseModel):
     genres: list[str] = []
 
 
+class BatchPredictionRequest(BaseModel):
+    """批量票房预测请求"""
+    movies: list[PredictionRequest] = Field(..., min_length=1, max_length=100_000)
+    model_name: Optional[str] = None
+
+
+# 批量预测每次交给计算线程池的电影数
+BATCH_CHUNK_SIZE = 2000
+
+# 模型未训练时 503 响应 detail 中的 reason（与线程池积压的 503 区分）
+MODEL_NOT_TRAINED = "model_not_trained"
+
+
+class IngestRequest(BaseModel):
+    """增量导入请求（字段与TMDB源CSV相同，按 id / movie_id 覆盖已有记录）"""
+    movies: list[dict] = Field(default=[], max_length=100_000)
+    credits: list[dict] = Field(default=[], max_length=100_000)
+
+
 class PredictionResponse(BaseModel):
     """票房预测响应"""
     predicted_revenue: float
@@ -78,6 +151,49 @@ class PredictionResponse(BaseModel):
     model_used: str
 
 
+# ==================== 计算与响应缓存 ====================
+
+async def compute(key: Optional[tuple], func, *args, stage: str = STAGE_COMPUTE):
+    """
+    在计算线程池中执行CPU密集任务
+    
+    相同 key 的并发请求共享一次计算；线程池积压过多时返回 503。
+    func 的耗时计入当前请求的 stage 阶段，排队时间计入 queue 阶段。
+    """
+    trace = current_trace()
+    if trace is not None:
+        func = traced(trace, stage, func)
+    try:
+        return await executor.run(key, func, *args)
+    except ComputeSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+async def cached_json(request: Request, key: tuple, build) -> Response:
+    """
+    返回按数据版本缓存的JSON响应
+    
+    build 返回 data 字段的内容，只在缓存未命中时在计算线程池中调用；
+    命中时直接返回已编码的字节，If-None-Match 匹配时返回 304。
+    Accept 请求列式格式时按列编码（见 api.columnar），各格式分别缓存。
+    """
+    # 读取不加锁的版本快照：数据加载器的锁可能被导入或惰性构建长时间占用，不能在事件循环中等待
+    version = data_loader.current_version
+    if version is None:
+        version = await compute(None, lambda: data_loader.data_version)
+    media_type = negotiate_format(request)
+    if media_type != FORMAT_JSON:
+        key = key + (media_type,)
+    payload = response_cache.get(key, version)
+    if payload is None:
+        payload = await compute(
+            ("response", version) + key,
+            response_cache.build, key, version, lambda: {"success": True, "data": build()},
+            ENCODERS[media_type], media_type
+        )
+    return payload.to_response(request)
+
+
 # ==================== API 路由 ====================
 
 @app.get("/")
@@ -96,166 +212,360 @@ async def root():
             "companies": "/api/companies",
             "correlations": "/api/correlations",
             "prediction": "/api/prediction",
-            "scatter": "/api/scatter"
+            "scatter": "/api/scatter",
+            "query": "/api/query",
+            "ingest": "/api/data/ingest",
+            "metrics": "/api/metrics"
         }
     }
 
 
 @app.get("/api/overview")
-async def get_overview():
+async def get_overview(request: Request):
     """获取数据集概览"""
     try:
-        summary = data_loader.get_summary_stats()
-        return {
-            "success": True,
-            "data": summary
-        }
+        return await cached_json(request, ("overview",), data_loader.get_summary_stats)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/roi")
-async def get_roi_analysis():
+async def get_roi_analysis(request: Request):
     """获取ROI分析结果"""
     try:
-        roi_data = analyzer.analyze_roi()
-        roi_by_genre = analyzer.analyze_roi_by_genre()
-        roi_by_budget = analyzer.analyze_roi_by_budget_range()
-        
-        return {
-            "success": True,
-            "data": {
-                "overview": roi_data,
-                "by_genre": roi_by_genre,
-                "by_budget_range": roi_by_budget
-            }
-        }
+        return await cached_json(request, ("roi",), lambda: {
+            "overview": analyzer.analyze_roi(),
+            "by_genre": analyzer.analyze_roi_by_genre(),
+            "by_budget_range": analyzer.analyze_roi_by_budget_range()
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/genres")
-async def get_genre_analysis():
+async def get_genre_analysis(request: Request):
     """获取电影类型分析"""
     try:
-        genre_data = analyzer.analyze_genres()
-        return {
-            "success": True,
-            "data": genre_data
-        }
+        return await cached_json(request, ("genres",), analyzer.analyze_genres)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/trends")
-async def get_trends():
+async def get_trends(request: Request):
     """获取时间趋势分析"""
     try:
-        yearly = analyzer.analyze_yearly_trends()
-        monthly = analyzer.analyze_monthly_patterns()
-        
-        return {
-            "success": True,
-            "data": {
-                "yearly": yearly,
-                "monthly": monthly
-            }
-        }
+        return await cached_json(request, ("trends",), lambda: {
+            "yearly": analyzer.analyze_yearly_trends(),
+            "monthly": analyzer.analyze_monthly_patterns()
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/directors")
-async def get_directors(top_n: int = Query(default=20, ge=5, le=50)):
+async def get_directors(
+    request: Request,
+    top_n: int = Query(default=20, ge=5, le=50),
+    sort: str = Query(default="total_revenue", description="排序指标: total_revenue / avg_roi / avg_rating / movie_count"),
+    offset: int = Query(default=0, ge=0, description="跳过的排名数（分页）"),
+    min_count: int = Query(default=2, ge=1, le=1000, description="最少电影数")
+):
     """获取导演分析"""
     try:
-        directors = analyzer.analyze_directors(top_n=top_n)
-        return {
-            "success": True,
-            "data": directors
-        }
+        return await cached_json(
+            request, ("directors", top_n, sort, offset, min_count),
+            lambda: analyzer.analyze_directors(top_n=top_n, sort=sort, offset=offset, min_count=min_count)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/actors")
-async def get_actors(top_n: int = Query(default=20, ge=5, le=50)):
+async def get_actors(
+    request: Request,
+    top_n: int = Query(default=20, ge=5, le=50),
+    sort: str = Query(default="total_revenue", description="排序指标: total_revenue / avg_roi / avg_rating / movie_count"),
+    offset: int = Query(default=0, ge=0, description="跳过的排名数（分页）"),
+    min_count: int = Query(default=3, ge=1, le=1000, description="最少电影数")
+):
     """获取演员分析"""
     try:
-        actors = analyzer.analyze_actors(top_n=top_n)
-        return {
-            "success": True,
-            "data": actors
-        }
+        return await cached_json(
+            request, ("actors", top_n, sort, offset, min_count),
+            lambda: analyzer.analyze_actors(top_n=top_n, sort=sort, offset=offset, min_count=min_count)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/companies")
-async def get_companies(top_n: int = Query(default=20, ge=5, le=50)):
+async def get_companies(
+    request: Request,
+    top_n: int = Query(default=20, ge=5, le=50),
+    sort: str = Query(default="total_revenue", description="排序指标: total_revenue / avg_roi / avg_rating / movie_count"),
+    offset: int = Query(default=0, ge=0, description="跳过的排名数（分页）"),
+    min_count: int = Query(default=5, ge=1, le=1000, description="最少电影数")
+):
     """获取制作公司分析"""
     try:
-        companies = analyzer.analyze_production_companies(top_n=top_n)
-        return {
-            "success": True,
-            "data": companies
-        }
+        return await cached_json(
+            request, ("companies", top_n, sort, offset, min_count),
+            lambda: analyzer.analyze_production_companies(
+                top_n=top_n, sort=sort, offset=offset, min_count=min_count
+            )
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/correlations")
-async def get_correlations():
+async def get_correlations(request: Request):
     """获取相关性分析"""
     try:
-        correlations = analyzer.analyze_correlations()
-        return {
-            "success": True,
-            "data": correlations
-        }
+        return await cached_json(request, ("correlations",), analyzer.analyze_correlations)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/scatter")
 async def get_scatter_data(
+    request: Request,
     x: str = Query(default="budget", description="X轴变量"),
     y: str = Query(default="revenue", description="Y轴变量"),
-    limit: int = Query(default=500, ge=50, le=2000)
+    limit: int = Query(default=500, ge=50, le=2000),
+    mode: str = Query(
+        default="points",
+        description="points: 按Y取前 limit 条完整记录; histogram / hexbin: 分箱计数; sample: 分层代表点"
+    ),
+    resolution: int = Query(default=40, ge=5, le=200, description="分箱 / 分层网格的格数")
 ):
     """获取散点图数据"""
     try:
-        scatter = analyzer.get_scatter_data(x_var=x, y_var=y, limit=limit)
-        return {
-            "success": True,
-            "data": scatter
-        }
+        if mode == "points":
+            return await cached_json(
+                request, ("scatter", x, y, limit),
+                lambda: analyzer.get_scatter_data(x_var=x, y_var=y, limit=limit)
+            )
+        return await cached_json(
+            request, ("scatter", x, y, limit, mode, resolution),
+            lambda: analyzer.get_scatter_density(x_var=x, y_var=y, mode=mode,
+                                                 resolution=resolution, limit=limit)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/prediction/train")
-async def train_prediction_model():
-    """训练票房预测模型"""
+def split_codes(value: Optional[str]) -> Optional[list]:
+    """逗号分隔的参数 -> 列表"""
+    if not value:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()] or None
+
+
+@app.get("/api/query")
+async def query_movies(
+    request: Request,
+    year_min: Optional[int] = Query(default=None, description="上映年份下限（含）"),
+    year_max: Optional[int] = Query(default=None, description="上映年份上限（含）"),
+    budget_min: Optional[float] = Query(default=None, ge=0, description="预算下限（含）"),
+    budget_max: Optional[float] = Query(default=None, ge=0, description="预算上限（含）"),
+    genre: Optional[str] = Query(default=None, description='类型谓词，如 "Action AND NOT Comedy"'),
+    country: Optional[str] = Query(default=None, description="制片国家代码，逗号分隔（任一）"),
+    language: Optional[str] = Query(default=None, description="语言代码，逗号分隔（任一）"),
+    financial_only: bool = Query(default=False, description="只统计有预算和票房数据的电影"),
+    group_by: Optional[str] = Query(
+        default=None, description="分组维度: year / month / budget_range / genre / country / language"
+    ),
+    metrics: str = Query(default="count", description="指标，逗号分隔: count 或 <sum/mean/median/min/max>:<列>"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000, description="最多返回的组数")
+):
+    """按年份、预算、类型、国家和语言切片，按维度分组统计"""
+    filters = {
+        "release_year": [year_min, year_max],
+        "budget": [budget_min, budget_max],
+        "genre": genre,
+        "country": split_codes(country),
+        "language": split_codes(language),
+        "financial_only": financial_only,
+    }
+    metric_list = split_codes(metrics) or ["count"]
+    key = ("query", year_min, year_max, budget_min, budget_max, genre, country, language,
+           financial_only, group_by, tuple(metric_list), limit)
     try:
-        results = predictor.train_models()
-        return {
-            "success": True,
-            "data": results
-        }
+        return await cached_json(request, key, lambda: analyzer.query(
+            filters=filters, group_by=group_by, metrics=metric_list, limit=limit
+        ))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Prometheus 文本格式的指标：请求 / 阶段 / 分析方法耗时直方图，缓存命中率和计算线程池状态"""
+    body = metrics.render(
+        caches={
+            "response": response_cache.stats(),
+            "result": analyzer.result_cache.stats() if analyzer.result_cache is not None else None,
+        },
+        executor=executor.stats(),
+    )
+    return Response(body, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.post("/api/data/ingest")
+async def ingest_data(request: IngestRequest):
+    """追加或更新电影与演职人员记录，返回新的数据版本和变化的行数"""
+    if not request.movies and not request.credits:
+        raise HTTPException(status_code=400, detail="没有需要导入的记录")
+    try:
+        change = await compute(None, data_loader.ingest,
+                               request.movies or None, request.credits or None)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "success": True,
+        "data": {
+            "version": change["version"],
+            "previous_version": change["previous_version"],
+            "appended": change["appended"],
+            "updated": change["updated"],
+        }
+    }
+
+
+@app.post("/api/prediction/train", status_code=202)
+async def train_prediction_model(request: Optional[TrainingRequest] = None):
+    """提交后台训练任务，返回任务信息（已有任务在运行时返回该任务）"""
+    params = request or TrainingRequest()
+    try:
+        make_models(params.random_state, params.model_params)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"超参数无效: {e}")
+    job = training_jobs.submit(test_size=params.test_size, random_state=params.random_state,
+                               model_params=params.model_params)
+    return {
+        "success": True,
+        "data": job
+    }
+
+
+@app.get("/api/prediction/jobs")
+async def list_training_jobs():
+    """最近的训练任务"""
+    return {
+        "success": True,
+        "data": training_jobs.list_jobs()
+    }
+
+
+@app.get("/api/prediction/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """训练任务状态与进度"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"训练任务不存在: {job_id}")
+    return {
+        "success": True,
+        "data": job
+    }
+
+
+def model_not_ready(e: ModelNotTrainedError) -> HTTPException:
+    """
+    模型未就绪时的 503 响应
+    
+    detail 为 {"reason": "model_not_trained", "message": ..., "job": 正在运行的训练任务或 null}，
+    客户端据 reason 与线程池积压的 503 区分，只在模型未训练时提交或等待训练任务。
+    """
+    return HTTPException(status_code=503, detail={
+        "reason": MODEL_NOT_TRAINED,
+        "message": str(e),
+        "job": training_jobs.active_job()
+    }, headers={"Retry-After": "5"})
+
+
+@app.get("/api/prediction/models")
+async def list_model_versions():
+    """注册表中的模型版本"""
+    return {
+        "success": True,
+        "data": {
+            "active": predictor.model_version,
+            "pinned": predictor.registry.pinned_version(),
+            "versions": predictor.registry.list_versions()
+        }
+    }
+
+
+@app.put("/api/prediction/models/pin")
+async def pin_model_version(version: str = Query(..., description="要固定的模型版本")):
+    """固定对外服务的模型版本并立即启用"""
+    if os.environ.get(MODEL_PIN_ENV):
+        raise HTTPException(status_code=409, detail=f"模型版本已由环境变量 {MODEL_PIN_ENV} 固定")
+    if await compute(("load_model", version), predictor.load_from_registry, version) is None:
+        raise HTTPException(status_code=404, detail=f"模型版本不存在或无法加载: {version}")
+    predictor.registry.pin(version)
+    return await list_model_versions()
+
+
+@app.delete("/api/prediction/models/pin")
+async def unpin_model_version():
+    """取消固定，启用最新版本"""
+    if os.environ.get(MODEL_PIN_ENV):
+        raise HTTPException(status_code=409, detail=f"模型版本已由环境变量 {MODEL_PIN_ENV} 固定")
+    predictor.registry.unpin()
+    await compute(("load_model", None), predictor.load_from_registry)
+    return await list_model_versions()
+
+
 @app.get("/api/prediction/insights")
 async def get_prediction_insights():
     """获取预测模型洞察"""
     try:
-        insights = predictor.get_prediction_insights()
+        insights = await compute(("insights",), predictor.get_prediction_insights)
         return {
             "success": True,
             "data": insights
         }
+    except ModelNotTrainedError as e:
+        raise model_not_ready(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -264,7 +574,7 @@ async def get_prediction_insights():
 async def predict_box_office(request: PredictionRequest):
     """预测电影票房"""
     try:
-        prediction = predictor.predict({
+        prediction = await compute(None, predictor.predict, {
             'budget': request.budget,
             'popularity': request.popularity,
             'runtime': request.runtime,
@@ -273,16 +583,50 @@ async def predict_box_office(request: PredictionRequest):
             'release_year': request.release_year,
             'release_month': request.release_month,
             'genres': request.genres
-        })
+        }, stage=STAGE_INFERENCE)
         
         return {
             "success": True,
             "data": prediction
         }
+    except ModelNotTrainedError as e:
+        raise model_not_ready(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/prediction/batch")
+async def batch_predict_box_office(request: BatchPredictionRequest):
+    """
+    批量预测票房
+    
+    以 NDJSON 流式返回，每行一部电影，顺序与请求一致；
+    分块在计算线程池中预测，整个请求使用同一份模型。
+    """
+    try:
+        state = predictor.snapshot()
+    except ModelNotTrainedError as e:
+        raise model_not_ready(e)
+    model_name = request.model_name
+    if model_name is not None and model_name not in state['models']:
+        raise HTTPException(status_code=400, detail=f"未知的模型: {model_name}")
+    
+    movies = [movie.model_dump() for movie in request.movies]
+    
+    async def stream():
+        for start in range(0, len(movies), BATCH_CHUNK_SIZE):
+            chunk = movies[start:start + BATCH_CHUNK_SIZE]
+            results = await compute(None, predictor.batch_predict, chunk, model_name, state,
+                                    stage=STAGE_INFERENCE)
+            with span(STAGE_SERIALIZE):
+                lines = "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+            yield lines
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 def run_server(host: str = "0.0.0.0", port: int = 8000):
     """运行服务器"""
     uvicorn.run(app, host=host, port=port)
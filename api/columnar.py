@@ -0,0 +1,173 @@
+"""
+列式响应格式模块
+把响应中的记录数组（[{...}, {...}]）转为按列存储，按 Accept 请求头协商JSON或二进制编码
+"""
+
+import json
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+from .response_cache import _replace_non_finite, encode_json
+
+
+# 可协商的响应格式
+FORMAT_JSON = "application/json"
+# 列式JSON：记录数组替换为 {"$table": {"length": 行数, "columns": {列名: [值, ...]}}}
+FORMAT_COLUMNAR_JSON = "application/vnd.tmdb.columnar+json"
+# 列式二进制：数值列为小端序的类型化数组，其余内容与列式JSON相同
+FORMAT_COLUMNAR = "application/vnd.tmdb.columnar"
+
+FORMATS = (FORMAT_JSON, FORMAT_COLUMNAR_JSON, FORMAT_COLUMNAR)
+
+# 二进制格式：魔数 + 版本，之后是4字节JSON头长度、JSON头、补齐到8字节边界的数据区
+BINARY_MAGIC = b"TMDC"
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 8
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def negotiate_format(request: Request) -> str:
+    """
+    按 Accept 请求头选择响应格式
+
+    只认列出的两个列式类型（忽略 q 值，先出现的优先），其余情况一律返回JSON。
+    """
+    for item in request.headers.get("accept", "").split(","):
+        media_type = item.split(";")[0].strip().lower()
+        if media_type in (FORMAT_COLUMNAR_JSON, FORMAT_COLUMNAR):
+            return media_type
+    return FORMAT_JSON
+
+
+def _is_records(value: list) -> bool:
+    """非空、每个元素都是键相同的字典的列表"""
+    if not value or not isinstance(value[0], dict):
+        return False
+    keys = value[0].keys()
+    return all(isinstance(item, dict) and item.keys() == keys for item in value)
+
+
+def _plain(value: Any) -> Any:
+    """转为可JSON序列化的值：基本类型、字典和列表直接处理，其余交给 jsonable_encoder"""
+    if type(value) in _PRIMITIVE_TYPES:
+        return value
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return jsonable_encoder(value)
+
+
+def _column(values: list) -> list:
+    if set(map(type, values)) <= _PRIMITIVE_TYPES:
+        return values
+    return [_plain(v) for v in values]
+
+
+def columnarize(value: Any) -> Any:
+    """
+    把内容中所有的记录数组转为列式表（递归处理字典和普通列表），同时转为可JSON序列化的值
+
+    列中的嵌套值（如类型名列表）保持为普通JSON，不再展开。
+    """
+    if type(value) in _PRIMITIVE_TYPES:
+        return value
+    if isinstance(value, dict):
+        return {k: columnarize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if _is_records(value):
+            return {"$table": {
+                "length": len(value),
+                "columns": {key: _column([item[key] for item in value]) for key in value[0]},
+            }}
+        return [columnarize(v) for v in value]
+    return _plain(value)
+
+
+def encode_columnar_json(content: Any) -> bytes:
+    """编码为列式JSON"""
+    return encode_json(columnarize(content))
+
+
+def _numeric_array(column: list) -> Optional[np.ndarray]:
+    """
+    纯数值列转为类型化数组，其他列返回None
+
+    全为整数且在 int32 范围内时为 int32，否则为 float64（None 为 NaN）；
+    布尔值不算数值。
+    """
+    types = set(map(type, column))
+    if not types or not types <= {int, float, type(None)}:
+        return None
+    if types == {int}:
+        array = np.array(column, dtype=np.int64)
+        if len(array) and (array.min() < INT32_MIN or array.max() > INT32_MAX):
+            return array.astype("<f8")
+        return array.astype("<i4")
+    return np.array([np.nan if v is None else v for v in column], dtype="<f8")
+
+
+def encode_columnar_binary(content: Any) -> bytes:
+    """
+    编码为列式二进制
+
+    布局（小端序）:
+    - 4 字节魔数 "TMDC"、1 字节版本、3 字节保留
+    - 4 字节无符号整数: JSON头的字节数
+    - JSON头: 列式JSON文档，其中纯数值列替换为
+      {"$array": "int32" | "float64", "offset": 数据区内的字节偏移, "length": 元素数}
+    - 补齐到 8 字节边界后的数据区，每个数组的起点都按 8 字节对齐，
+      浏览器可以直接在上面创建 Int32Array / Float64Array 视图
+    """
+    buffers = []
+    size = 0
+
+    def pack(value: Any) -> Any:
+        nonlocal size
+        if isinstance(value, dict):
+            table = value.get("$table")
+            if table is not None and len(value) == 1:
+                columns = {}
+                for name, column in table["columns"].items():
+                    array = _numeric_array(column)
+                    if array is None:
+                        columns[name] = pack(column)
+                        continue
+                    columns[name] = {
+                        "$array": "int32" if array.dtype.kind == "i" else "float64",
+                        "offset": size,
+                        "length": len(array),
+                    }
+                    data = array.tobytes()
+                    padding = -len(data) % BINARY_ALIGNMENT
+                    buffers.append(data + b"\0" * padding)
+                    size += len(data) + padding
+                return {"$table": {"length": table["length"], "columns": columns}}
+            return {k: pack(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [pack(v) for v in value]
+        return value
+
+    header = json.dumps(
+        _replace_non_finite(pack(columnarize(content))),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    prefix = BINARY_MAGIC + struct.pack("<B3xI", BINARY_VERSION, len(header)) + header
+    prefix += b"\0" * (-len(prefix) % BINARY_ALIGNMENT)
+    return prefix + b"".join(buffers)
+
+
+ENCODERS = {
+    FORMAT_JSON: encode_json,
+    FORMAT_COLUMNAR_JSON: encode_columnar_json,
+    FORMAT_COLUMNAR: encode_columnar_binary,
+}
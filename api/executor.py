@@ -0,0 +1,93 @@
+"""
+计算任务执行模块
+把CPU密集的分析和训练放到有界线程池中执行，避免阻塞事件循环
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ[name]))
+    except (KeyError, ValueError):
+        return default
+
+
+class ComputeSaturated(Exception):
+    """等待执行的任务已达上限"""
+
+
+class ComputeExecutor:
+    """
+    有界计算执行器
+
+    - 任务在固定大小的线程池中执行（pandas / NumPy / scikit-learn 的计算大多释放GIL）
+    - 相同键的并发请求合并为一次计算，共享结果
+    - 已提交但未完成的任务数超过 max_pending 时拒绝新任务（背压）
+
+    所有状态只在事件循环线程中读写，因此不需要加锁。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or _env_int(
+            "API_COMPUTE_WORKERS", min(4, os.cpu_count() or 1)
+        )
+        self.max_pending = max_pending or _env_int(
+            "API_COMPUTE_MAX_PENDING", self.max_workers * 4
+        )
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                        thread_name_prefix="compute")
+        self._inflight: dict = {}
+        self._pending = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def run(self, key: Optional[tuple], func: Callable, *args) -> Any:
+        """
+        在线程池中执行 func(*args)
+
+        key 不为None时，与正在执行的同键任务合并；
+        等待中的任务过多时抛出 ComputeSaturated。
+        """
+        if key is not None and key in self._inflight:
+            self.coalesced += 1
+            # shield: 单个请求被取消时不影响共享同一结果的其他请求
+            return await asyncio.shield(self._inflight[key])
+
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ComputeSaturated(f"计算任务已满（{self._pending}/{self.max_pending}）")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, func, *args)
+        self._pending += 1
+        self.submitted += 1
+        if key is not None:
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._finish(key, future))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Optional[tuple], future):
+        self._pending -= 1
+        if key is not None and self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        """执行器统计"""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "inflight_keys": len(self._inflight),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """关闭线程池（等待正在执行的任务结束）"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,192 @@
+"""
+指标模块
+请求、请求阶段和分析方法的耗时直方图，缓存与计算线程池统计，以 Prometheus 文本格式输出
+"""
+
+import bisect
+import threading
+import time
+from typing import Optional
+
+from analysis.instrumentation import Trace, use_trace
+from .profiler import SamplingProfiler
+
+
+# 直方图桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 未匹配任何路由的请求使用的路由标签（避免按原始路径产生无限多的标签值）
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """按标签分组的累积直方图（线程安全）"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total)
+                            for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+def _samples(name: str, kind: str, help_text: str, samples: list) -> list:
+    """一组 (标签名, 标签值, 数值) 样本的文本行"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_names, label_values, value in samples:
+        lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+    return lines
+
+
+class Metrics:
+    """
+    API 指标
+
+    - tmdb_api_request_duration_seconds      请求总耗时 (method, route, status)
+    - tmdb_api_stage_duration_seconds        请求各阶段耗时 (route, stage)，阶段见 analysis.instrumentation
+    - tmdb_analysis_method_duration_seconds  带结果缓存的分析方法耗时 (method, cache)
+    """
+
+    def __init__(self):
+        self.requests = Histogram("tmdb_api_request_duration_seconds", "请求总耗时（秒）",
+                                  ("method", "route", "status"))
+        self.stages = Histogram("tmdb_api_stage_duration_seconds",
+                                "请求各阶段耗时（秒，每段时间只计入最内层的阶段）", ("route", "stage"))
+        self.methods = Histogram("tmdb_analysis_method_duration_seconds",
+                                 "分析方法调用耗时（秒，含缓存命中）", ("method", "cache"))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, trace: Trace):
+        self.requests.observe((method, route, str(status)), seconds)
+        for stage, stage_seconds in trace.stages.items():
+            self.stages.observe((route, stage), stage_seconds)
+
+    def observe_method(self, name: str, seconds: float, cache: str):
+        self.methods.observe((name, cache), seconds)
+
+    def render(self, caches: Optional[dict] = None, executor: Optional[dict] = None) -> str:
+        """
+        输出 Prometheus 文本格式
+
+        caches 为 {缓存名: stats()}，executor 为 ComputeExecutor.stats()。
+        """
+        lines = self.requests.render() + self.stages.render() + self.methods.render()
+
+        caches = {name: stats for name, stats in (caches or {}).items() if stats is not None}
+        for field, name, kind, help_text in (
+            ("hits", "tmdb_cache_hits_total", "counter", "缓存命中次数"),
+            ("misses", "tmdb_cache_misses_total", "counter", "缓存未命中次数"),
+            ("evictions", "tmdb_cache_evictions_total", "counter", "缓存淘汰次数"),
+            ("hit_rate", "tmdb_cache_hit_ratio", "gauge", "缓存命中率"),
+            ("entries", "tmdb_cache_entries", "gauge", "缓存条目数"),
+            ("bytes", "tmdb_cache_bytes", "gauge", "缓存占用字节数（估算）"),
+        ):
+            samples = [(("cache",), (cache,), stats[field])
+                       for cache, stats in sorted(caches.items()) if field in stats]
+            if samples:
+                lines += _samples(name, kind, help_text, samples)
+
+        if executor is not None:
+            for field, name, kind, help_text in (
+                ("max_workers", "tmdb_compute_workers", "gauge", "计算线程池大小"),
+                ("pending", "tmdb_compute_pending", "gauge", "已提交未完成的计算任务数"),
+                ("submitted", "tmdb_compute_submitted_total", "counter", "提交的计算任务数"),
+                ("coalesced", "tmdb_compute_coalesced_total", "counter", "合并到进行中任务的请求数"),
+                ("rejected", "tmdb_compute_rejected_total", "counter", "因积压被拒绝的请求数"),
+            ):
+                lines += _samples(name, kind, help_text, [((), (), executor[field])])
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentationMiddleware:
+    """
+    请求埋点中间件（ASGI）
+
+    为每个HTTP请求创建一个 Trace 并设为当前上下文，请求（包括流式响应体）结束后
+    把总耗时和各阶段耗时记入 metrics；响应头 Server-Timing 带上发送响应头时
+    已完成的阶段耗时。匹配分析器配置的请求同时进行采样分析。
+    """
+
+    def __init__(self, app, metrics: Metrics, profiler: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.metrics = metrics
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = ", ".join(f"{stage};dur={seconds * 1000:.2f}"
+                                   for stage, seconds in trace.stages.items())
+                if timing:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode("latin-1"))
+                    ]
+            await send(message)
+
+        session = None
+        if self.profiler is not None and self.profiler.matches(scope["path"]):
+            session = self.profiler.start(trace, scope["method"], scope["path"])
+        try:
+            with use_trace(trace):
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - start
+            route = scope.get("route")
+            route = getattr(route, "path", None) or UNMATCHED_ROUTE
+            self.metrics.observe_request(scope["method"], route, status, seconds, trace)
+            if session is not None:
+                self.profiler.stop(session)
@@ -0,0 +1,140 @@
+"""
+采样分析模块
+按配置的路由对请求进行采样分析，输出可直接生成火焰图的折叠调用栈
+"""
+
+import fnmatch
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from analysis.instrumentation import Trace
+
+
+# 需要采样分析的路由（逗号分隔的路径通配符，如 /api/genres,/api/prediction/*；* 表示全部）
+PROFILE_ROUTES_ENV = "API_PROFILE_ROUTES"
+# 折叠调用栈的输出目录
+PROFILE_DIR_ENV = "API_PROFILE_DIR"
+# 采样间隔（毫秒）
+PROFILE_INTERVAL_ENV = "API_PROFILE_INTERVAL_MS"
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_INTERVAL_MS = 5.0
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = filename[len(path):].lstrip("/\\")
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def fold_stack(frame, root: str) -> str:
+    """把调用栈折叠为 root;最外层;...;最内层 的形式（分号分隔）"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame).replace(";", ":"))
+        frame = frame.f_back
+    return ";".join([root] + labels[::-1])
+
+
+class ProfileSession:
+    """一个请求的采样结果"""
+
+    def __init__(self, trace: Trace, method: str, path: str):
+        self.trace = trace
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.samples: Counter = Counter()
+
+
+class SamplingProfiler:
+    """
+    请求采样分析器（默认关闭）
+
+    设置 API_PROFILE_ROUTES 后，路径匹配的每个请求在执行期间由后台线程按固定间隔
+    读取 sys._current_frames()，只采集正在为该请求执行阶段的线程（计算线程池中的任务，
+    以及事件循环线程上的序列化等），栈底为阶段名。请求结束后把结果以折叠格式
+    （每行 "栈 次数"，flamegraph.pl / speedscope 可直接读取）写入 API_PROFILE_DIR。
+    """
+
+    def __init__(self, routes: Optional[str] = None, output_dir: Optional[str] = None,
+                 interval_ms: Optional[float] = None):
+        if routes is None:
+            routes = os.environ.get(PROFILE_ROUTES_ENV, "")
+        self.patterns = [p.strip() for p in routes.split(",") if p.strip()]
+        self.output_dir = Path(output_dir or os.environ.get(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR)
+        if interval_ms is None:
+            try:
+                interval_ms = float(os.environ.get(PROFILE_INTERVAL_ENV) or DEFAULT_INTERVAL_MS)
+            except ValueError:
+                interval_ms = DEFAULT_INTERVAL_MS
+        self.interval = max(0.0005, interval_ms / 1000)
+        self._sessions: list = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written: list = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.patterns)
+
+    def matches(self, path: str) -> bool:
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in self.patterns)
+
+    def start(self, trace: Trace, method: str, path: str) -> ProfileSession:
+        """开始采样一个请求"""
+        session = ProfileSession(trace, method, path)
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return session
+
+    def stop(self, session: ProfileSession) -> Optional[Path]:
+        """结束采样并写出折叠调用栈，没有采到样本时不写文件"""
+        with self._lock:
+            self._sessions.remove(session)
+            if not self._sessions:
+                self._wakeup.clear()
+        if not session.samples:
+            return None
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", session.path).strip("_") or "root"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started))
+        millis = int(session.started * 1000) % 1000
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{stamp}.{millis:03d}-{session.method}-{slug}.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(session.samples.items()):
+                f.write(f"{stack} {count}\n")
+        self.written.append(path)
+        return path
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions)
+            if not sessions:
+                continue
+            frames = sys._current_frames()
+            for session in sessions:
+                for ident, stage in session.trace.active_threads().items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        session.samples[fold_stack(frame, stage)] += 1
@@ -0,0 +1,172 @@
+"""
+响应缓存模块
+按数据版本缓存已编码的JSON响应体，支持 ETag / 304 和 gzip
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from analysis.instrumentation import STAGE_SERIALIZE, span
+
+
+# 小于该大小的响应不压缩
+GZIP_MIN_BYTES = 1024
+
+
+def _replace_non_finite(value: Any) -> Any:
+    """把 NaN / Infinity 替换为 None（JSON中没有对应的值）"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _replace_non_finite(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_replace_non_finite(v) for v in value]
+    return value
+
+
+def encode_json(content: Any) -> bytes:
+    """编码为紧凑的UTF-8 JSON，NaN / Infinity 输出为 null"""
+    return json.dumps(
+        _replace_non_finite(jsonable_encoder(content)),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _etag_matches(header: Optional[str], etags: tuple) -> bool:
+    """判断 If-None-Match 是否命中（忽略弱校验前缀）"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    """
+    判断 Accept-Encoding 是否接受 gzip
+    
+    按编码和 q 值解析：q=0 表示拒绝；未列出 gzip 时看通配符 *，都未列出时不压缩。
+    """
+    if not header:
+        return False
+    qvalues = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+class CachedPayload:
+    """一份已编码的响应体及其压缩版本"""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+        self._gzip_body: Optional[bytes] = None
+
+    @property
+    def gzip_body(self) -> bytes:
+        """gzip压缩后的响应体（首次访问时压缩）"""
+        if self._gzip_body is None:
+            with span(STAGE_SERIALIZE):
+                self._gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzip_body
+
+    def to_response(self, request: Request) -> Response:
+        """按请求头返回 304、gzip 或原始响应"""
+        accepts_gzip = _accepts_gzip(request.headers.get("accept-encoding"))
+        use_gzip = accepts_gzip and len(self.body) >= GZIP_MIN_BYTES
+        etag = self.gzip_etag if use_gzip else self.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+
+        if _etag_matches(request.headers.get("if-none-match"), (self.etag, self.gzip_etag)):
+            return Response(status_code=304, headers=headers)
+
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzip_body, media_type=self.media_type, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    预序列化响应缓存
+
+    键为 (路由, 参数...)，条目与数据版本绑定；数据版本变化后旧条目视为未命中并被替换。
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, version: str) -> Optional[CachedPayload]:
+        """读取与数据版本匹配的缓存响应体，未命中时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def build(self, key: tuple, version: str, build: Callable[[], Any],
+              encoder: Callable[[Any], bytes] = encode_json,
+              media_type: str = "application/json") -> CachedPayload:
+        """调用 build 生成内容、用 encoder 编码并写入缓存"""
+        content = build()
+        with span(STAGE_SERIALIZE):
+            payload = CachedPayload(encoder(content), media_type)
+        with self._lock:
+            self._entries[key] = (version, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(len(p.body) for _, p in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,90 @@
+"""
+批量预测基准测试
+对比逐部调用 BoxOfficePredictor.predict 与向量化的 batch_predict
+
+用法:
+    python benchmarks/bench_batch_predict.py [--data-dir data/raw] [--sizes 100,1000,10000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis import DataLoader, BoxOfficePredictor
+from benchmarks.synthetic import GENRES, generate_dataset
+
+
+def candidate_movies(n: int, seed: int = 0) -> list:
+    """随机生成待预测的候选电影"""
+    rng = np.random.default_rng(seed)
+    genre_names = [name for _, name in GENRES]
+    movies = []
+    for _ in range(n):
+        k = int(rng.integers(0, 4))
+        movies.append({
+            'budget': float(rng.choice([0.0, rng.uniform(1e5, 3e8)], p=[0.05, 0.95])),
+            'popularity': float(rng.exponential(20)),
+            'runtime': float(rng.normal(110, 20)),
+            'vote_average': float(rng.uniform(3, 9)),
+            'vote_count': int(rng.integers(0, 10000)),
+            'release_year': int(rng.integers(1970, 2025)),
+            'release_month': int(rng.integers(1, 13)),
+            'genres': list(rng.choice(genre_names, size=k, replace=False)),
+        })
+    return movies
+
+
+def bench(predictor: BoxOfficePredictor, model_name: str, n: int, row_limit: int) -> dict:
+    """逐部预测只测量前 row_limit 部后按数量外推"""
+    movies = candidate_movies(n)
+    m = min(n, row_limit)
+
+    start = time.perf_counter()
+    per_row = [predictor.predict(movie, model_name) for movie in movies[:m]]
+    row_seconds = (time.perf_counter() - start) * n / m
+
+    start = time.perf_counter()
+    batch = predictor.batch_predict(movies, model_name)
+    batch_seconds = time.perf_counter() - start
+
+    expected = np.array([r['predicted_revenue'] for r in per_row])
+    actual = np.array([r['predicted_revenue'] for r in batch[:m]])
+    if not np.allclose(expected, actual, rtol=1e-9, atol=1e-6):
+        raise AssertionError(f"{model_name}: 批量预测与逐部预测结果不一致")
+
+    print(f"  {model_name:<18} {n:>7,} 部  逐部 {n / row_seconds:>10,.0f} 部/秒  "
+          f"批量 {n / batch_seconds:>12,.0f} 部/秒  加速 {row_seconds / batch_seconds:7.1f}x")
+    return {'model': model_name, 'rows': n,
+            'row_seconds': row_seconds, 'batch_seconds': batch_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量预测基准测试')
+    parser.add_argument('--data-dir', default='data/raw', help='TMDB原始数据目录')
+    parser.add_argument('--sizes', default='100,1000,10000', help='批量大小（逗号分隔）')
+    parser.add_argument('--row-limit', type=int, default=1000,
+                        help='逐部预测实际测量的最大数量')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir)
+        if not (data_dir / DataLoader.MOVIES_FILE).exists():
+            print(f"未找到 {data_dir / DataLoader.MOVIES_FILE}，使用4800行合成数据代替")
+            data_dir = generate_dataset(tmp, n_movies=4800)['movies'].parent
+        loader = DataLoader(str(data_dir), cache_dir=Path(tmp) / 'cache')
+        predictor = BoxOfficePredictor(loader)
+        predictor.train_models()
+
+    for model_name in predictor.snapshot()['models']:
+        for n in (int(size) for size in args.sizes.split(',')):
+            bench(predictor, model_name, n, args.row_limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+JSON列解析基准测试
+对比旧的逐行 json.loads / ast.literal_eval 方案与 JsonColumnParser 批量解析
+
+用法:
+    python benchmarks/bench_json_parsing.py [--data-dir data/raw] [--rows 500000]
+"""
+
+import argparse
+import ast
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis.json_columns import JsonColumnParser, CAST_PARSER_FIELDS, CREW_PARSER_FIELDS
+from benchmarks.synthetic import generate_dataset
+
+
+def legacy_parse(x):
+    """原 DataLoader._safe_parse_json 实现"""
+    if pd.isna(x):
+        return []
+    if isinstance(x, list):
+        return x
+    try:
+        return json.loads(x.replace("'", '"'))
+    except (json.JSONDecodeError, AttributeError):
+        try:
+            return ast.literal_eval(x)
+        except (ValueError, SyntaxError):
+            return []
+
+
+def legacy_credits(cast: list, crew: list):
+    """旧方案：完整解析为字典后再提取导演和主演"""
+    directors = []
+    for members in map(legacy_parse, crew):
+        directors.append(next((m.get('name') for m in members if m.get('job') == 'Director'), None))
+    top_actors = [[a['name'] for a in members[:3]] for members in map(legacy_parse, cast)]
+    return directors, top_actors
+
+
+def fast_credits(cast: list, crew: list):
+    """新方案：按列提取需要的字段"""
+    crew_parser = JsonColumnParser(CREW_PARSER_FIELDS)
+    cast_parser = JsonColumnParser(CAST_PARSER_FIELDS)
+    directors = [next((name for job, name in members if job == 'Director'), None)
+                 for members in crew_parser.parse(crew)]
+    top_actors = [[name for name, _ in members[:3]] for members in cast_parser.parse(cast)]
+    return directors, top_actors, cast_parser.stats, crew_parser.stats
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench(label: str, cast: list, crew: list, legacy_rows: int) -> dict:
+    """对同一份数据分别计时；旧方案只在前 legacy_rows 行上测量后按行数外推"""
+    n = len(cast)
+    m = min(n, legacy_rows)
+    legacy_time, (legacy_dirs, legacy_actors) = timed(legacy_credits, cast[:m], crew[:m])
+    fast_time, (dirs, actors, cast_stats, crew_stats) = timed(fast_credits, cast, crew)
+
+    if dirs[:m] != legacy_dirs or actors[:m] != legacy_actors:
+        raise AssertionError(f"{label}: 新旧解析结果不一致")
+
+    legacy_total = legacy_time * n / m
+    print(f"\n[{label}] {n:,} 行")
+    print(f"  旧方案: {legacy_total:8.3f}s" + (f" (基于前 {m:,} 行外推)" if m < n else ""))
+    print(f"  新方案: {fast_time:8.3f}s  加速 {legacy_total / fast_time:.1f}x")
+    print(f"  cast: {cast_stats}")
+    print(f"  crew: {crew_stats}")
+    return {'rows': n, 'legacy_seconds': legacy_total, 'fast_seconds': fast_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON列解析基准测试')
+    parser.add_argument('--data-dir', default='data/raw', help='TMDB原始数据目录')
+    parser.add_argument('--rows', type=int, default=500_000, help='合成数据集行数')
+    parser.add_argument('--legacy-rows', type=int, default=20_000,
+                        help='旧方案实际测量的最大行数')
+    args = parser.parse_args()
+
+    credits_path = Path(args.data_dir) / 'tmdb_5000_credits.csv'
+    with tempfile.TemporaryDirectory() as tmp:
+        if not credits_path.exists():
+            print(f"未找到 {credits_path}，使用4800行合成数据代替")
+            credits_path = generate_dataset(tmp, n_movies=4800)['credits']
+        credits = pd.read_csv(credits_path)
+    cast, crew = credits['cast'].tolist(), credits['crew'].tolist()
+    bench('TMDB credits', cast, crew, args.legacy_rows)
+
+    # 合成大数据集：小演职人员表 + 重复引用行字符串，控制内存占用
+    with tempfile.TemporaryDirectory() as tmp:
+        small = pd.read_csv(generate_dataset(tmp, n_movies=5000, seed=1,
+                                             cast_size=8, crew_size=10)['credits'])
+    repeats = -(-args.rows // len(small))
+    big_cast = (small['cast'].tolist() * repeats)[:args.rows]
+    big_crew = (small['crew'].tolist() * repeats)[:args.rows]
+    bench('synthetic', big_cast, big_crew, args.legacy_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+演职人员并行解析基准测试
+对比单进程解析与 ParallelCreditsParser 在不同工作进程数下的耗时
+
+用法:
+    python benchmarks/bench_parallel_credits.py [--rows 200000] [--workers 1,2,4,8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis.parallel_credits import ParallelCreditsParser
+from benchmarks.synthetic import generate_large_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='演职人员并行解析基准测试')
+    parser.add_argument('--rows', type=int, default=200_000, help='合成数据集行数')
+    parser.add_argument('--workers', default='1,2,4,8', help='测量的工作进程数（逗号分隔）')
+    parser.add_argument('--cast-size', type=int, default=20, help='每部电影平均演员数')
+    parser.add_argument('--crew-size', type=int, default=30, help='每部电影平均剧组人数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = generate_large_dataset(tmp, args.rows, cast_size=args.cast_size,
+                                          crew_size=args.crew_size)
+        credits = pd.read_csv(data_dir / 'tmdb_5000_credits.csv', usecols=['cast', 'crew'])
+    cast, crew = credits['cast'].tolist(), credits['crew'].tolist()
+    del credits
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f"{len(cast):,} 行，可用CPU {cpus}")
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        with ParallelCreditsParser(workers) as credits_parser:
+            # 先解析一小段让进程池完成启动，计时不含进程启动和模块导入
+            credits_parser.parse(cast[:50_000], crew[:50_000])
+            start = time.perf_counter()
+            result = credits_parser.parse(cast, crew)
+            seconds = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = (seconds, result)
+        elif (result['director'] != baseline[1]['director']
+              or result['top_actors'] != baseline[1]['top_actors']):
+            raise AssertionError(f"{workers} 个工作进程的解析结果与单进程不一致")
+        print(f"  {workers:2d} 进程: {seconds:8.2f}s  加速 {baseline[0] / seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+单条预测延迟基准测试
+对比旧的 DataFrame 构造方案与编译特征布局后的 BoxOfficePredictor.predict，输出 p50 / p99
+
+用法:
+    python benchmarks/bench_predict_latency.py [--data-dir data/raw] [--requests 2000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis import DataLoader, BoxOfficePredictor
+from analysis.predictor import NUMERIC_FEATURES, LOG_FEATURES
+from benchmarks.bench_batch_predict import candidate_movies
+from benchmarks.synthetic import generate_dataset
+
+
+def legacy_predict(state: dict, movie_data: dict, model_name: str) -> float:
+    """原 BoxOfficePredictor.predict 实现：构造单行DataFrame后标准化并预测"""
+    features = {f: movie_data.get(f, 0) for f in NUMERIC_FEATURES}
+    for f in LOG_FEATURES:
+        features[f'{f}_log'] = np.log1p(features.get(f, 0))
+
+    genres = movie_data.get('genres', [])
+    features['genre_count'] = len(genres)
+    mlb = state['mlb']
+    if mlb is not None:
+        genre_encoded = mlb.transform([genres])
+        for i, g in enumerate(mlb.classes_):
+            features[f'genre_{g}'] = genre_encoded[0][i]
+
+    X = pd.DataFrame([features])
+    for col in state['feature_names']:
+        if col not in X.columns:
+            X[col] = 0
+    X = X[state['feature_names']]
+
+    X_scaled = state['scaler'].transform(X)
+    return float(np.expm1(state['models'][model_name].predict(X_scaled))[0])
+
+
+def latencies(func, movies: list) -> np.ndarray:
+    """逐条调用，返回每次调用的耗时（微秒）"""
+    result = np.empty(len(movies))
+    for i, movie in enumerate(movies):
+        start = time.perf_counter()
+        func(movie)
+        result[i] = time.perf_counter() - start
+    return result * 1e6
+
+
+def report(label: str, samples: np.ndarray):
+    p50, p99 = np.percentile(samples, [50, 99])
+    print(f"    {label:<6} p50 {p50:>10,.1f}µs   p99 {p99:>10,.1f}µs")
+    return {'p50_us': float(p50), 'p99_us': float(p99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='单条预测延迟基准测试')
+    parser.add_argument('--data-dir', default='data/raw', help='TMDB原始数据目录')
+    parser.add_argument('--requests', type=int, default=2000, help='每个模型的预测次数')
+    parser.add_argument('--legacy-requests', type=int, default=300,
+                        help='旧方案的预测次数（旧方案较慢）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir)
+        if not (data_dir / DataLoader.MOVIES_FILE).exists():
+            print(f"未找到 {data_dir / DataLoader.MOVIES_FILE}，使用4800行合成数据代替")
+            data_dir = generate_dataset(tmp, n_movies=4800)['movies'].parent
+        loader = DataLoader(str(data_dir), cache_dir=Path(tmp) / 'cache')
+        predictor = BoxOfficePredictor(loader)
+        predictor.train_models()
+
+    state = predictor.snapshot()
+    movies = candidate_movies(args.requests, seed=1)
+    legacy_movies = movies[:args.legacy_requests]
+
+    for model_name in state['models']:
+        expected = np.array([legacy_predict(state, m, model_name) for m in legacy_movies])
+        actual = np.array([predictor.predict(m, model_name)['predicted_revenue']
+                           for m in legacy_movies])
+        if not np.allclose(expected, actual, rtol=1e-9, atol=1e-6):
+            raise AssertionError(f"{model_name}: 新旧预测结果不一致")
+
+        print(f"\n[{model_name}]")
+        report('旧方案', latencies(lambda m: legacy_predict(state, m, model_name), legacy_movies))
+        report('新方案', latencies(lambda m: predictor.predict(m, model_name), movies))
+
+
+if __name__ == '__main__':
+    main()
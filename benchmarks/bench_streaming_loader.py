@@ -0,0 +1,101 @@
+"""
+流式加载基准测试
+对比一次读入整个CSV与 DataLoader 分块流式加载（chunksize）的耗时和峰值内存
+
+每种模式在独立的子进程中执行 load_merged()（不使用预处理缓存），
+峰值内存取子进程的 ru_maxrss。
+
+用法:
+    python benchmarks/bench_streaming_loader.py [--rows 2000000] [--chunksize 100000]
+                                                [--modes full,streaming] [--data-dir DIR]
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import generate_large_dataset
+
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _measure(data_dir: str, cache_dir: str, chunksize) -> dict:
+    """在子进程中执行：加载合并数据，返回耗时和峰值内存"""
+    from analysis import DataLoader
+
+    baseline = _max_rss_bytes()
+    loader = DataLoader(data_dir, cache_dir=cache_dir, use_cache=False,
+                        use_journal=False, chunksize=chunksize)
+    start = time.perf_counter()
+    merged = loader.load_merged()
+    loader.get_director_ids()
+    seconds = time.perf_counter() - start
+    return {
+        'rows': len(merged),
+        'columns': merged.shape[1],
+        'seconds': seconds,
+        'baseline_rss': baseline,
+        'peak_rss': _max_rss_bytes(),
+    }
+
+
+def measure(data_dir: Path, cache_dir: Path, chunksize) -> dict:
+    """每次测量使用新的进程，峰值内存互不影响"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, str(data_dir), str(cache_dir), chunksize).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式加载基准测试')
+    parser.add_argument('--rows', type=int, default=2_000_000, help='合成数据集行数')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='流式加载每块行数')
+    parser.add_argument('--cast-size', type=int, default=4, help='每部电影平均演员数')
+    parser.add_argument('--crew-size', type=int, default=6, help='每部电影平均剧组人数')
+    parser.add_argument('--modes', default='full,streaming',
+                        help='测量的模式（full / streaming，逗号分隔）')
+    parser.add_argument('--data-dir', help='已生成的数据目录（不指定时生成到临时目录）')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.data_dir:
+            data_dir = Path(args.data_dir)
+        else:
+            start = time.perf_counter()
+            data_dir = generate_large_dataset(Path(tmp) / 'raw', args.rows,
+                                              cast_size=args.cast_size, crew_size=args.crew_size)
+            print(f"已生成 {args.rows:,} 行合成数据 ({time.perf_counter() - start:.1f}s)")
+        sizes = {p.name: p.stat().st_size for p in data_dir.glob('*.csv')}
+        for name, size in sorted(sizes.items()):
+            print(f"  {name}: {size / 2 ** 20:,.0f} MB")
+
+        results = {}
+        for mode in modes:
+            chunksize = args.chunksize if mode == 'streaming' else None
+            results[mode] = result = measure(data_dir, Path(tmp) / f'cache-{mode}', chunksize)
+            print(f"\n[{mode}] {result['rows']:,} 行 × {result['columns']} 列"
+                  + (f"（每块 {chunksize:,} 行）" if chunksize else ''))
+            print(f"  耗时:     {result['seconds']:8.2f}s")
+            print(f"  峰值内存: {result['peak_rss'] / 2 ** 20:8.0f} MB"
+                  f"（导入后基线 {result['baseline_rss'] / 2 ** 20:.0f} MB）")
+
+        if 'full' in results and 'streaming' in results:
+            full, streaming = results['full'], results['streaming']
+            print(f"\n峰值内存降低 {1 - streaming['peak_rss'] / full['peak_rss']:.0%}，"
+                  f"耗时 {streaming['seconds'] / full['seconds']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+"""
+基准测试套件
+在TMDB原始数据和按倍数放大的合成数据上测量数据加载、各项分析、模型训练与预测
+以及API接口的耗时和内存，结果保存为JSON，可与之前的结果对比
+
+每个数据集在独立的子进程中测量：
+- 耗时：先执行一次（first，含首次构建的惰性结构），再重复 --repeat 次取中位数
+- 内存：另外执行一次并用 tracemalloc 记录分配峰值（训练只执行一次，不记录分配峰值）；
+  数据集级别另记子进程的峰值常驻内存（ru_maxrss）
+- API 接口通过进程内的 TestClient 调用（包含应用启动、响应缓存等完整流程）
+
+用法:
+    python benchmarks/bench_suite.py [--data-dir data/raw] [--scales 10,100] [--repeat 5]
+                                     [--quick] [--chunksize N] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import contextlib
+import importlib
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_batch_predict import candidate_movies
+from benchmarks.synthetic import generate_large_dataset
+
+
+# 合成数据集 1× 对应的行数（与TMDB 5000数据集相当）
+BASE_ROWS = 4800
+
+# 结果文件格式版本
+RESULT_FORMAT = 1
+
+# 默认结果目录
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+
+# --quick 使用的模型参数（减少集成模型的树数量，适合大数据集或快速回归检查）
+QUICK_MODEL_PARAMS = {
+    'Random Forest': {'n_estimators': 10},
+    'Gradient Boosting': {'n_estimators': 10},
+}
+
+# 对比时耗时增加超过该比例记为回归
+REGRESSION_THRESHOLD = 1.2
+
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Recorder:
+    """依次执行并记录各项测量"""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, group: str, name: str, func, repeat: bool = True,
+                trace_memory: bool = True, setup=None, **extra) -> object:
+        """
+        测量 func()，返回第一次执行的结果
+
+        setup 不为None时每次执行前调用 setup()，其返回值作为 func 的参数，准备时间不计入。
+        """
+        def call():
+            arg = setup() if setup is not None else None
+            start = time.perf_counter()
+            value = func(arg) if setup is not None else func()
+            return time.perf_counter() - start, value
+
+        first, value = call()
+        seconds = [call()[0] for _ in range(self.repeat if repeat else 0)]
+
+        peak = None
+        if trace_memory:
+            arg = setup() if setup is not None else None
+            tracemalloc.start()
+            try:
+                func(arg) if setup is not None else func()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        record = {
+            'group': group,
+            'name': name,
+            'first': first,
+            'median': statistics.median(seconds) if seconds else first,
+            'min': min(seconds) if seconds else first,
+            'repeat': len(seconds),
+            'peak_alloc': peak,
+            **extra,
+        }
+        self.results.append(record)
+        median = record['median']
+        print(f"    {group:9s} {name:42s} first {first * 1000:9.1f}ms  "
+              f"median {median * 1000:9.1f}ms"
+              + (f"  alloc {peak / 2 ** 20:7.1f}MB" if peak is not None else ''), flush=True)
+        return value
+
+
+def _run_dataset(root: str, options: dict) -> dict:
+    """在子进程中执行：测量一个数据集（root/data/raw）"""
+    os.chdir(root)
+    os.environ.pop('MODEL_REGISTRY_DIR', None)
+    os.environ.pop('MODEL_VERSION', None)
+    # API 启动时创建的 DataLoader 通过环境变量使用同样的加载方式
+    if options['chunksize']:
+        os.environ['DATA_CHUNKSIZE'] = str(options['chunksize'])
+    else:
+        os.environ.pop('DATA_CHUNKSIZE', None)
+
+    from analysis import BoxOfficePredictor, DataLoader, MovieAnalyzer
+
+    raw_dir = Path(root) / 'data' / 'raw'
+    recorder = Recorder(options['repeat'])
+    measure = recorder.measure
+    baseline_rss = _max_rss_bytes()
+
+    # ---------- 数据加载 ----------
+    measure('loader', 'load_merged (no cache)',
+            lambda loader: loader.load_merged(),
+            setup=lambda: DataLoader(str(raw_dir), use_cache=False, use_journal=False))
+    DataLoader(str(raw_dir)).load_merged()
+    measure('loader', 'load_merged (disk cache)',
+            lambda loader: loader.load_merged(),
+            setup=lambda: DataLoader(str(raw_dir)))
+
+    loader = DataLoader(str(raw_dir))
+    df = loader.load_merged()
+    loader.get_director_ids()
+
+    # ---------- 分析（关闭结果缓存，测量实际计算） ----------
+    analyzer = MovieAnalyzer(loader)
+    analyzer.result_cache = None
+    methods = sorted(name for name, _ in inspect.getmembers(analyzer, inspect.ismethod)
+                     if name.startswith('analyze_'))
+    for name in methods + ['get_scatter_data']:
+        measure('analyzer', name, getattr(analyzer, name))
+
+    # ---------- 训练与预测 ----------
+    predictor = BoxOfficePredictor(loader)
+    measure('predictor', 'feature_matrix', lambda p: p.feature_matrix(),
+            setup=lambda: BoxOfficePredictor(loader))
+    measure('predictor', 'train_models',
+            lambda: predictor.train_models(model_params=options['model_params']),
+            repeat=False, trace_memory=False)
+    predictor.save_to_registry()
+
+    movies = candidate_movies(options['batch_size'])
+    measure('predictor', 'predict', lambda: predictor.predict(movies[0]))
+    measure('predictor', f"batch_predict ({options['batch_size']})",
+            lambda: predictor.batch_predict(movies))
+
+    # ---------- API ----------
+    from fastapi.testclient import TestClient
+    api_app = importlib.import_module('api.app')
+
+    api_app.response_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        client = TestClient(api_app.app)
+        client.__enter__()
+        startup = time.perf_counter() - start
+    try:
+        if api_app.training_jobs.active_job() is not None:
+            raise RuntimeError("API 启动时没有加载到注册表中的模型")
+        recorder.results.append({'group': 'api', 'name': 'startup', 'first': startup,
+                                 'median': startup, 'min': startup, 'repeat': 0,
+                                 'peak_alloc': None})
+        print(f"    {'api':9s} {'startup':42s} first {startup * 1000:9.1f}ms", flush=True)
+
+        def request(method: str, url: str, **kwargs):
+            def call():
+                response = client.request(method, url, **kwargs)
+                response.raise_for_status()
+                return len(response.content)
+            return call
+
+        routes = [
+            ('GET', '/api/overview'), ('GET', '/api/roi'), ('GET', '/api/genres'),
+            ('GET', '/api/trends'), ('GET', '/api/directors'), ('GET', '/api/actors'),
+            ('GET', '/api/companies'), ('GET', '/api/correlations'), ('GET', '/api/scatter'),
+            ('GET', '/api/prediction/insights'),
+        ]
+        # first 为首次请求（计算并写入缓存），之后的重复请求命中响应缓存
+        routes += [
+            ('POST', '/api/prediction/predict', {'json': movies[0]}),
+            ('POST', '/api/prediction/batch', {'json': {'movies': movies}}),
+        ]
+        for method, url, *kwargs in routes:
+            name = f'{method} {url}' + (f" ({len(movies)})" if url.endswith('/batch') else '')
+            size = measure('api', name, request(method, url, **(kwargs[0] if kwargs else {})))
+            recorder.results[-1]['bytes'] = size
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.__exit__(None, None, None)
+
+    return {
+        'rows': len(df),
+        'financial_rows': int(df['has_financial_data'].sum()),
+        'file_bytes': {p.name: p.stat().st_size for p in sorted(raw_dir.glob('*.csv'))},
+        'baseline_rss': baseline_rss,
+        'peak_rss': _max_rss_bytes(),
+        'results': recorder.results,
+    }
+
+
+def run_dataset(name: str, prepare, options: dict) -> dict:
+    """准备数据集目录后在新的子进程中测量（各数据集的峰值内存互不影响）"""
+    print(f"\n[{name}]", flush=True)
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        prepare(Path(root) / 'data' / 'raw')
+        print(f"  数据准备 {time.perf_counter() - start:.1f}s", flush=True)
+        context = multiprocessing.get_context('spawn')
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_run_dataset, root, options).result()
+        except BrokenProcessPool as e:
+            # 通常是内存不足被系统终止：记录失败，继续测量其他数据集
+            print(f"  测量进程异常退出（可能内存不足）: {e}", flush=True)
+            return {'name': name, 'error': f'{type(e).__name__}: {e}', 'results': []}
+    print(f"  {result['rows']:,} 行，峰值内存 {result['peak_rss'] / 2 ** 20:.0f}MB", flush=True)
+    return {'name': name, **result}
+
+
+def environment() -> dict:
+    """运行环境信息（对比不同机器上的结果时参考）"""
+    import numpy
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': cpus,
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """按 (数据集, 分组, 名称) 对比中位数耗时，返回变慢超过阈值的项"""
+    previous = {(dataset['name'], r['group'], r['name']): r
+                for dataset in baseline['datasets'] for r in dataset['results']}
+    regressions = []
+    print(f"\n与 {baseline.get('created_at', '?')} 的结果对比（中位数耗时）:")
+    for dataset in current['datasets']:
+        for r in dataset['results']:
+            old = previous.get((dataset['name'], r['group'], r['name']))
+            if old is None or not old['median']:
+                continue
+            ratio = r['median'] / old['median']
+            flag = ''
+            if ratio > threshold:
+                flag = '  <-- 变慢'
+                regressions.append({'dataset': dataset['name'], 'group': r['group'],
+                                    'name': r['name'], 'ratio': ratio})
+            print(f"  {dataset['name']:14s} {r['group']:9s} {r['name']:42s} "
+                  f"{old['median'] * 1000:9.1f}ms -> {r['median'] * 1000:9.1f}ms "
+                  f"({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试套件')
+    parser.add_argument('--data-dir', default='data/raw', help='TMDB原始数据目录（不存在时跳过）')
+    parser.add_argument('--scales', default='10,100',
+                        help=f'合成数据集倍数（1× = {BASE_ROWS} 行，逗号分隔，空字符串表示不测）')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复测量的次数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='批量预测的电影数')
+    parser.add_argument('--cast-size', type=int, default=20, help='合成数据每部电影平均演员数')
+    parser.add_argument('--crew-size', type=int, default=30, help='合成数据每部电影平均剧组人数')
+    parser.add_argument('--chunksize', type=int,
+                        help='使用分块流式加载（DataLoader chunksize），内存不足以一次读入大数据集时使用')
+    parser.add_argument('--quick', action='store_true',
+                        help='训练时减少集成模型的树数量（见 QUICK_MODEL_PARAMS）')
+    parser.add_argument('--output', help='结果JSON文件（默认 benchmarks/results/<时间>.json）')
+    parser.add_argument('--compare', help='与之前的结果JSON对比，变慢超过阈值时返回非零状态')
+    args = parser.parse_args()
+
+    options = {
+        'repeat': args.repeat,
+        'batch_size': args.batch_size,
+        'model_params': QUICK_MODEL_PARAMS if args.quick else {},
+        'chunksize': args.chunksize,
+        'cast_size': args.cast_size,
+        'crew_size': args.crew_size,
+    }
+    datasets = []
+    data_dir = Path(args.data_dir)
+    if all((data_dir / name).exists()
+           for name in ('tmdb_5000_movies.csv', 'tmdb_5000_credits.csv')):
+        datasets.append(('tmdb', lambda raw: shutil.copytree(data_dir, raw)))
+    else:
+        print(f"未找到 {data_dir} 下的TMDB数据，只测量合成数据集")
+    for scale in [int(s) for s in args.scales.split(',') if s.strip()]:
+        datasets.append((f'synthetic-{scale}x',
+                         lambda raw, rows=BASE_ROWS * scale: generate_large_dataset(
+                             raw, rows, cast_size=args.cast_size, crew_size=args.crew_size)))
+
+    created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    report = {
+        'format': RESULT_FORMAT,
+        'created_at': created_at,
+        'environment': environment(),
+        'options': options,
+        'datasets': [run_dataset(name, prepare, options) for name, prepare in datasets],
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{created_at.replace(':', '').replace('-', '')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"\n{len(regressions)} 项变慢超过 {REGRESSION_THRESHOLD:.1f}x")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,49 @@ export interface ApiResponse<T> {
   data: T;
 }
 
+/** 带 HTTP 状态码的 API 错误；detail 为响应体中的 detail 字段，retryAfter 为 Retry-After 秒数 */
+export class ApiError extends Error {
+  constructor(
+    public status: number,
+    message: string,
+    public detail: unknown = null,
+    public retryAfter: number | null = null,
+  ) {
+    super(message);
+    this.name = 'ApiError';
+  }
+}
+
+/** 模型未训练时 503 响应的 detail（线程池积压的 503 的 detail 为字符串） */
+export interface ModelNotTrainedDetail {
+  reason: 'model_not_trained';
+  message: string;
+  job: TrainingJob | null;
+}
+
+/** 是否为模型未训练的 503（而不是服务端繁忙） */
+export function isModelNotTrained(e: unknown): e is ApiError & { detail: ModelNotTrainedDetail } {
+  return e instanceof ApiError && e.status === 503
+    && (e.detail as ModelNotTrainedDetail | null)?.reason === 'model_not_trained';
+}
+
+/** 由失败的响应构造 ApiError（响应体不是 JSON 时 detail 为 null） */
+async function apiError(response: Response): Promise<ApiError> {
+  let detail: unknown = null;
+  try {
+    detail = (await response.json()).detail ?? null;
+  } catch {
+    // 忽略非 JSON 响应体
+  }
+  const retryAfter = Number(response.headers.get('retry-after'));
+  return new ApiError(
+    response.status,
+    `API Error: ${response.status} ${response.statusText}`,
+    detail,
+    Number.isFinite(retryAfter) && retryAfter > 0 ? retryAfter : null,
+  );
+}
+
 async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T> {
   const response = await fetch(`${API_BASE_URL}${endpoint}`, {
     ...options,
@@ -20,7 +63,7 @@ async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T>
   });
   
   if (!response.ok) {
-    throw new Error(`API Error: ${response.status} ${response.statusText}`);
+    throw await apiError(response);
   }
   
   const result: ApiResponse<T> = await response.json();
@@ -32,6 +75,88 @@ async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T>
   return result.data;
 }
 
+// ==================== 列式响应 ====================
+
+/** 列式二进制响应的媒体类型（数值列为类型化数组，见 api/columnar.py） */
+const COLUMNAR_MEDIA_TYPE = 'application/vnd.tmdb.columnar';
+const COLUMNAR_MAGIC = 'TMDC';
+const COLUMNAR_VERSION = 1;
+
+/** 列式表中一列：数值列为类型化数组（float64 列中的 null 为 NaN），其他列为普通数组 */
+export type ColumnOf<V> = [NonNullable<V>] extends [number] ? Float64Array | Int32Array : V[];
+
+export interface ColumnTable<R> {
+  length: number;
+  columns: { [K in keyof R]: ColumnOf<R[K]> };
+}
+
+/** 把响应类型中的记录数组换成列式表（空数组仍为 []） */
+export type Columnar<T> = T extends Array<infer R>
+  ? R extends unknown[] ? Columnar<R>[] : R extends object ? ColumnTable<R> | never[] : R[]
+  : T extends object ? { [K in keyof T]: Columnar<T[K]> } : T;
+
+/**
+ * 解码列式二进制响应
+ * 
+ * 数值列直接在响应的 ArrayBuffer 上创建类型化数组视图（服务端按 8 字节对齐、小端序写入），
+ * 不复制数据。
+ */
+export function decodeColumnar(buffer: ArrayBuffer): unknown {
+  const bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== COLUMNAR_MAGIC || bytes[4] !== COLUMNAR_VERSION) {
+    throw new Error('Invalid columnar response');
+  }
+  const headerLength = new DataView(buffer).getUint32(8, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(12, 12 + headerLength)));
+  const dataStart = Math.ceil((12 + headerLength) / 8) * 8;
+  
+  const revive = (value: unknown): unknown => {
+    if (Array.isArray(value)) return value.map(revive);
+    if (value === null || typeof value !== 'object') return value;
+    const node = value as Record<string, unknown>;
+    if ('$table' in node) return revive(node.$table);
+    if ('$array' in node) {
+      const { $array, offset, length } = node as { $array: string; offset: number; length: number };
+      return $array === 'int32'
+        ? new Int32Array(buffer, dataStart + offset, length)
+        : new Float64Array(buffer, dataStart + offset, length);
+    }
+    return Object.fromEntries(Object.entries(node).map(([key, v]) => [key, revive(v)]));
+  };
+  return revive(header);
+}
+
+/** 以列式二进制格式请求（通过 Accept 协商），返回解码后的 data */
+async function fetchColumnar<T>(endpoint: string): Promise<Columnar<T>> {
+  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+    headers: { Accept: COLUMNAR_MEDIA_TYPE },
+  });
+  
+  if (!response.ok) {
+    throw await apiError(response);
+  }
+  if (!response.headers.get('content-type')?.startsWith(COLUMNAR_MEDIA_TYPE)) {
+    throw new Error('API did not return a columnar response');
+  }
+  
+  const result = decodeColumnar(await response.arrayBuffer()) as ApiResponse<Columnar<T>>;
+  
+  if (!result.success) {
+    throw new Error('API returned unsuccessful response');
+  }
+  
+  return result.data;
+}
+
+/** 列式表还原为记录数组（给按行取数据的组件使用） */
+export function tableRows<R>(table: ColumnTable<R> | never[]): R[] {
+  if (Array.isArray(table)) return [];
+  const entries = Object.entries(table.columns) as Array<[string, ArrayLike<unknown>]>;
+  return Array.from({ length: table.length }, (_, i) =>
+    Object.fromEntries(entries.map(([key, column]) => [key, column[i]])) as R
+  );
+}
+
 // ==================== API 类型定义 ====================
 
 export interface OverviewStats {
@@ -143,6 +268,25 @@ export interface PersonStats {
   avg_roi: number;
 }
 
+/** 排行的排序指标（降序） */
+export type RankingSort = 'total_revenue' | 'avg_roi' | 'avg_rating' | 'movie_count';
+
+export interface RankingOptions {
+  sort?: RankingSort;
+  /** 跳过的排名数（分页） */
+  offset?: number;
+  /** 最少电影数（不传时使用服务端默认：导演2、演员3、公司5） */
+  minCount?: number;
+}
+
+function rankingQuery(topN: number, { sort, offset, minCount }: RankingOptions): string {
+  const params = new URLSearchParams({ top_n: String(topN) });
+  if (sort) params.set('sort', sort);
+  if (offset) params.set('offset', String(offset));
+  if (minCount !== undefined) params.set('min_count', String(minCount));
+  return params.toString();
+}
+
 export interface CorrelationData {
   top_correlations: Array<{ var1: string; var2: string; correlation: number }>;
   correlation_matrix: Record<string, Record<string, number>>;
@@ -158,6 +302,43 @@ export interface ScatterPoint {
   vote_average: number;
 }
 
+export type ScatterMode = 'histogram' | 'hexbin' | 'sample';
+
+export interface ScatterAxisInfo {
+  name: string;
+  scale: 'linear' | 'log';
+  /** 原始单位的取值范围（没有有效点时为 null） */
+  domain: [number, number] | null;
+}
+
+export interface ScatterSamplePoint {
+  x: number;
+  y: number;
+  title: string;
+  release_year: number | null;
+  vote_average: number;
+  /** 该点代表的电影数 */
+  weight: number;
+}
+
+export interface ScatterDensity {
+  mode: ScatterMode;
+  resolution: number;
+  total: number;
+  excluded: number;
+  x: ScatterAxisInfo;
+  y: ScatterAxisInfo;
+  /** histogram: [列, 行, 数量]；hexbin: [中心x, 中心y, 数量] */
+  bins?: [number, number, number][];
+  /** histogram 的格边界（原始单位） */
+  x_edges?: number[];
+  y_edges?: number[];
+  /** hexbin 的网格间距（变换空间，对数坐标时以数量级为单位） */
+  hex_size?: { dx: number; dy: number };
+  /** sample 的代表点 */
+  points?: ScatterSamplePoint[];
+}
+
 export interface ModelComparison {
   [modelName: string]: {
     rmse: number;
@@ -181,6 +362,41 @@ export interface PredictionInsights {
   all_features: FeatureImportance[];
 }
 
+export type TrainingJobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
+export interface TrainingModelProgress {
+  status: 'pending' | 'fitting' | 'cross_validating' | 'done';
+  folds_done: number;
+  folds_total: number;
+  fold_scores: (number | null)[];
+  metrics?: ModelComparison[string];
+}
+
+export interface TrainingJob {
+  id: string;
+  status: TrainingJobStatus;
+  params: { test_size: number; random_state: number; model_params: Record<string, Record<string, unknown>> };
+  data_version: string | null;
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+  progress: {
+    completed_steps: number;
+    total_steps: number;
+    percent: number;
+    current_model: string | null;
+    models: Record<string, TrainingModelProgress>;
+  };
+  result: {
+    model_comparison: ModelComparison;
+    best_model: string;
+    feature_count: number;
+    training_samples: number;
+    test_samples: number;
+  } | null;
+  error: string | null;
+}
+
 export interface PredictionRequest {
   budget: number;
   popularity?: number;
@@ -214,14 +430,20 @@ export const api = {
   /** 获取时间趋势 */
   getTrends: () => fetchApi<TrendsData>('/api/trends'),
   
-  /** 获取导演分析 */
-  getDirectors: (topN = 20) => fetchApi<PersonStats[]>(`/api/directors?top_n=${topN}`),
+  /** 获取时间趋势（列式，数值列为类型化数组） */
+  getTrendsColumns: () => fetchColumnar<TrendsData>('/api/trends'),
+  
+  /** 获取导演排行 */
+  getDirectors: (topN = 20, options: RankingOptions = {}) =>
+    fetchApi<PersonStats[]>(`/api/directors?${rankingQuery(topN, options)}`),
   
-  /** 获取演员分析 */
-  getActors: (topN = 20) => fetchApi<PersonStats[]>(`/api/actors?top_n=${topN}`),
+  /** 获取演员排行 */
+  getActors: (topN = 20, options: RankingOptions = {}) =>
+    fetchApi<PersonStats[]>(`/api/actors?${rankingQuery(topN, options)}`),
   
-  /** 获取制作公司分析 */
-  getCompanies: (topN = 20) => fetchApi<PersonStats[]>(`/api/companies?top_n=${topN}`),
+  /** 获取制作公司排行 */
+  getCompanies: (topN = 20, options: RankingOptions = {}) =>
+    fetchApi<PersonStats[]>(`/api/companies?${rankingQuery(topN, options)}`),
   
   /** 获取相关性分析 */
   getCorrelations: () => fetchApi<CorrelationData>('/api/correlations'),
@@ -230,8 +452,23 @@ export const api = {
   getScatter: (x = 'budget', y = 'revenue', limit = 500) => 
     fetchApi<ScatterPoint[]>(`/api/scatter?x=${x}&y=${y}&limit=${limit}`),
   
-  /** 训练预测模型 */
-  trainModel: () => fetchApi<{ model_comparison: ModelComparison; best_model: string }>('/api/prediction/train'),
+  /** 获取散点图数据（列式） */
+  getScatterColumns: (x = 'budget', y = 'revenue', limit = 500) =>
+    fetchColumnar<ScatterPoint[]>(`/api/scatter?x=${x}&y=${y}&limit=${limit}`),
+  
+  /** 获取降采样的散点图数据（分箱计数或分层代表点，结果大小与数据量无关） */
+  getScatterDensity: (x = 'budget', y = 'revenue', mode: ScatterMode = 'hexbin', resolution = 40, limit = 1000) =>
+    fetchApi<ScatterDensity>(`/api/scatter?x=${x}&y=${y}&mode=${mode}&resolution=${resolution}&limit=${limit}`),
+  
+  /** 获取降采样的散点图数据（列式，sample 模式的代表点为列式表） */
+  getScatterDensityColumns: (x = 'budget', y = 'revenue', mode: ScatterMode = 'sample', resolution = 40, limit = 1000) =>
+    fetchColumnar<ScatterDensity>(`/api/scatter?x=${x}&y=${y}&mode=${mode}&resolution=${resolution}&limit=${limit}`),
+  
+  /** 提交后台训练任务（已有任务在运行时返回该任务） */
+  trainModel: () => fetchApi<TrainingJob>('/api/prediction/train', { method: 'POST' }),
+  
+  /** 获取训练任务状态 */
+  getTrainingJob: (jobId: string) => fetchApi<TrainingJob>(`/api/prediction/jobs/${jobId}`),
   
   /** 获取预测洞察 */
   getPredictionInsights: () => fetchApi<PredictionInsights>('/api/prediction/insights'),